@@ -0,0 +1,53 @@
+"""adicionar_vendas_diarias
+
+Revision ID: 3b7d2e91c4a5
+Revises: 2025_08_09_0000
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7d2e91c4a5'
+down_revision: Union[str, Sequence[str], None] = '2025_08_09_0000'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rollup diário de vendas (dia × cliente × produto).
+    # Após aplicar, popular com: python reconstruir_vendas_diarias.py
+    op.create_table('vendas_diarias',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('data', sa.Date(), nullable=False),
+    sa.Column('cliente_id', sa.Integer(), nullable=True),
+    sa.Column('produto_id', sa.Integer(), nullable=False),
+    sa.Column('vendas', sa.Integer(), nullable=False),
+    sa.Column('itens', sa.Integer(), nullable=False),
+    sa.Column('quantidade', sa.DECIMAL(precision=14, scale=3), nullable=False),
+    sa.Column('valor_total', sa.DECIMAL(precision=14, scale=2), nullable=False),
+    sa.Column('valor_pendente', sa.DECIMAL(precision=14, scale=2), nullable=False),
+    sa.Column('custo_total', sa.DECIMAL(precision=14, scale=2), nullable=False),
+    sa.Column('lucro_bruto', sa.DECIMAL(precision=14, scale=2), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['cliente_id'], ['clientes.id'], ),
+    sa.ForeignKeyConstraint(['produto_id'], ['produtos.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('data', 'cliente_id', 'produto_id', name='uq_vendas_diarias_data_cliente_produto')
+    )
+    op.create_index(op.f('ix_vendas_diarias_id'), 'vendas_diarias', ['id'], unique=False)
+    op.create_index('ix_vendas_diarias_cliente_data', 'vendas_diarias', ['cliente_id', 'data'], unique=False)
+    op.create_index('ix_vendas_diarias_produto_data', 'vendas_diarias', ['produto_id', 'data'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_vendas_diarias_produto_data', table_name='vendas_diarias')
+    op.drop_index('ix_vendas_diarias_cliente_data', table_name='vendas_diarias')
+    op.drop_index(op.f('ix_vendas_diarias_id'), table_name='vendas_diarias')
+    op.drop_table('vendas_diarias')
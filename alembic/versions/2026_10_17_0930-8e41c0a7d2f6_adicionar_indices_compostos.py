@@ -0,0 +1,58 @@
+"""adicionar_indices_compostos
+
+Revision ID: 8e41c0a7d2f6
+Revises: 3b7d2e91c4a5
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e41c0a7d2f6'
+down_revision: Union[str, Sequence[str], None] = '3b7d2e91c4a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (nome, tabela, colunas) - mesmos índices declarados em app/models
+INDICES = [
+    # Listagens e dashboards por período, cliente e situação de pagamento
+    ('ix_vendas_data_venda', 'vendas', ['data_venda']),
+    ('ix_vendas_cliente_data', 'vendas', ['cliente_id', 'data_venda']),
+    ('ix_vendas_situacao_data', 'vendas', ['situacao_pagamento', 'data_venda']),
+    ('ix_vendas_cliente_situacao_data', 'vendas', ['cliente_id', 'situacao_pagamento', 'data_venda']),
+    # Itens por venda e agregações por produto
+    ('ix_itens_venda_venda_id', 'itens_venda', ['venda_id']),
+    ('ix_itens_venda_produto_venda', 'itens_venda', ['produto_id', 'venda_id']),
+    # Listagem de entradas por período/produto
+    ('ix_entradas_estoque_data_entrada', 'entradas_estoque', ['data_entrada']),
+    ('ix_entradas_estoque_produto_data', 'entradas_estoque', ['produto_id', 'data_entrada']),
+    ('ix_inventarios_produto_id', 'inventarios', ['produto_id']),
+    # Camadas FIFO abertas de um produto em ordem de entrada
+    ('ix_estoque_fifo_produto_finalizado_data', 'estoque_fifo', ['produto_id', 'finalizado', 'data_entrada']),
+    ('ix_estoque_fifo_entrada_estoque_id', 'estoque_fifo', ['entrada_estoque_id']),
+    # Fluxo de caixa por período/produto e limpeza por venda/entrada
+    ('ix_movimentacoes_caixa_data', 'movimentacoes_caixa', ['data_movimentacao']),
+    ('ix_movimentacoes_caixa_produto_data', 'movimentacoes_caixa', ['produto_id', 'data_movimentacao']),
+    ('ix_movimentacoes_caixa_venda_id', 'movimentacoes_caixa', ['venda_id']),
+    ('ix_movimentacoes_caixa_entrada_tipo', 'movimentacoes_caixa', ['entrada_estoque_id', 'tipo_movimentacao']),
+    # Lucro bruto por venda e por período
+    ('ix_lucros_brutos_venda_id', 'lucros_brutos', ['venda_id']),
+    ('ix_lucros_brutos_data_calculo', 'lucros_brutos', ['data_calculo']),
+    ('ix_lucros_brutos_produto_data', 'lucros_brutos', ['produto_id', 'data_calculo']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for nome, tabela, colunas in INDICES:
+        op.create_index(nome, tabela, colunas, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for nome, tabela, _ in reversed(INDICES):
+        op.drop_index(nome, table_name=tabela)
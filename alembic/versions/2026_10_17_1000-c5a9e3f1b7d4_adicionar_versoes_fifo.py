@@ -0,0 +1,35 @@
+"""adicionar_versoes_fifo
+
+Revision ID: c5a9e3f1b7d4
+Revises: 8e41c0a7d2f6
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a9e3f1b7d4'
+down_revision: Union[str, Sequence[str], None] = '8e41c0a7d2f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Contador de versão usado para invalidar o cache de camadas FIFO entre workers
+    op.create_table('versoes_fifo',
+    sa.Column('produto_id', sa.Integer(), nullable=False),
+    sa.Column('versao', sa.Integer(), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['produto_id'], ['produtos.id'], ),
+    sa.PrimaryKeyConstraint('produto_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('versoes_fifo')
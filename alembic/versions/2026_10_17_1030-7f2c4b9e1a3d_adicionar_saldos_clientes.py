@@ -0,0 +1,61 @@
+"""adicionar_saldos_clientes
+
+Revision ID: 7f2c4b9e1a3d
+Revises: c5a9e3f1b7d4
+Create Date: 2026-10-17 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f2c4b9e1a3d'
+down_revision: Union[str, Sequence[str], None] = 'c5a9e3f1b7d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Saldo pendente por cliente, mantido junto com as vendas
+    op.create_table('saldos_clientes',
+    sa.Column('cliente_id', sa.Integer(), nullable=False),
+    sa.Column('valor_pendente', sa.DECIMAL(precision=14, scale=2), nullable=False),
+    sa.Column('vendas_pendentes', sa.Integer(), nullable=False),
+    sa.Column('custo_pendente', sa.DECIMAL(precision=14, scale=2), nullable=False),
+    sa.Column('lucro_bruto_pendente', sa.DECIMAL(precision=14, scale=2), nullable=False),
+    sa.Column('venda_pendente_mais_antiga', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('venda_pendente_mais_recente', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('atualizado_em', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['cliente_id'], ['clientes.id'], ),
+    sa.PrimaryKeyConstraint('cliente_id')
+    )
+    op.create_index('ix_saldos_clientes_mais_antiga', 'saldos_clientes', ['venda_pendente_mais_antiga'], unique=False)
+
+    # Preenche a partir das vendas pendentes (como SaldoClienteService.reconstruir).
+    # vendas.custo_total só existe a partir da próxima revisão: o custo vem dos itens
+    op.execute(
+        'INSERT INTO saldos_clientes ('
+        ' cliente_id, valor_pendente, vendas_pendentes, custo_pendente, lucro_bruto_pendente,'
+        ' venda_pendente_mais_antiga, venda_pendente_mais_recente'
+        ') SELECT vendas.cliente_id, SUM(vendas.total_venda), COUNT(vendas.id),'
+        ' COALESCE(SUM(custos.custo), 0), COALESCE(SUM(vendas.lucro_bruto_total), 0),'
+        ' MIN(vendas.data_venda), MAX(vendas.data_venda)'
+        ' FROM vendas LEFT JOIN ('
+        '  SELECT itens_venda.venda_id, ROUND(SUM(itens_venda.custo * itens_venda.quantidade), 2) AS custo'
+        '  FROM itens_venda JOIN vendas ON vendas.id = itens_venda.venda_id'
+        "  WHERE vendas.situacao_pagamento = 'PENDENTE'"
+        '  GROUP BY itens_venda.venda_id'
+        ' ) AS custos ON custos.venda_id = vendas.id'
+        " WHERE vendas.cliente_id IS NOT NULL AND vendas.situacao_pagamento = 'PENDENTE'"
+        ' GROUP BY vendas.cliente_id'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_saldos_clientes_mais_antiga', table_name='saldos_clientes')
+    op.drop_table('saldos_clientes')
@@ -0,0 +1,46 @@
+"""adicionar_custo_total_vendas
+
+Revision ID: a4d8e2b6c0f1
+Revises: 7f2c4b9e1a3d
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d8e2b6c0f1'
+down_revision: Union[str, Sequence[str], None] = '7f2c4b9e1a3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Vendas atualizadas por comando no preenchimento (faixas de id)
+TAMANHO_LOTE = 5000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('vendas', sa.Column('custo_total', sa.DECIMAL(precision=10, scale=2), nullable=True))
+
+    # Preenche as vendas existentes em faixas de id, para não travar a tabela inteira
+    conexao = op.get_bind()
+    menor_id, maior_id = conexao.execute(sa.text('SELECT MIN(id), MAX(id) FROM vendas')).one()
+    if menor_id is None:
+        return
+
+    atualizar = sa.text(
+        'UPDATE vendas SET custo_total = ('
+        ' SELECT COALESCE(SUM(itens_venda.custo * itens_venda.quantidade), 0)'
+        ' FROM itens_venda WHERE itens_venda.venda_id = vendas.id'
+        ') WHERE vendas.id BETWEEN :inicio AND :fim'
+    )
+    for inicio in range(menor_id, maior_id + 1, TAMANHO_LOTE):
+        conexao.execute(atualizar, {"inicio": inicio, "fim": inicio + TAMANHO_LOTE - 1})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('vendas', 'custo_total')
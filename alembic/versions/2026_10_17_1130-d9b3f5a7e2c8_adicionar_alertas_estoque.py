@@ -0,0 +1,47 @@
+"""adicionar_alertas_estoque
+
+Revision ID: d9b3f5a7e2c8
+Revises: a4d8e2b6c0f1
+Create Date: 2026-10-17 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9b3f5a7e2c8'
+down_revision: Union[str, Sequence[str], None] = 'a4d8e2b6c0f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Produtos em alerta de estoque, mantidos a cada alteração de inventário
+    op.create_table('alertas_estoque',
+    sa.Column('produto_id', sa.Integer(), nullable=False),
+    sa.Column('quantidade_atual', sa.DECIMAL(precision=10, scale=3), nullable=True),
+    sa.Column('estoque_minimo', sa.DECIMAL(precision=10, scale=2), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['produto_id'], ['produtos.id'], ),
+    sa.PrimaryKeyConstraint('produto_id')
+    )
+
+    # Preenche como AlertaEstoqueService.atualizar: produtos sem inventário ou
+    # abaixo do mínimo, considerando o primeiro inventário (menor id) do produto
+    op.execute(
+        'INSERT INTO alertas_estoque (produto_id, quantidade_atual, estoque_minimo)'
+        ' SELECT produtos.id, inventarios.quantidade_atual, produtos.estoque_minimo'
+        ' FROM produtos LEFT JOIN inventarios ON inventarios.id = ('
+        '  SELECT MIN(primeiro.id) FROM inventarios AS primeiro WHERE primeiro.produto_id = produtos.id'
+        ' )'
+        ' WHERE inventarios.id IS NULL OR inventarios.quantidade_atual < produtos.estoque_minimo'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('alertas_estoque')
@@ -0,0 +1,95 @@
+"""adicionar_busca_clientes_produtos
+
+Revision ID: e1c7a3f9b5d2
+Revises: d9b3f5a7e2c8
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+import re
+import unicodedata
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1c7a3f9b5d2'
+down_revision: Union[str, Sequence[str], None] = 'd9b3f5a7e2c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Registros lidos e atualizados por vez no preenchimento
+TAMANHO_LOTE = 5000
+
+_NAO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+_NAO_DIGITO = re.compile(r"\D+")
+
+
+# Cópias de app.utils.texto na data desta revisão: a migração não deve mudar
+# de comportamento se a normalização da aplicação mudar depois
+def normalizar_texto(*partes: Optional[str]) -> str:
+    """'José  Açougue', 'Ltda.' -> 'jose acougue ltda'"""
+    texto = " ".join(parte for parte in partes if parte)
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(caractere for caractere in texto if not unicodedata.combining(caractere))
+    return _NAO_ALFANUMERICO.sub(" ", texto.lower()).strip()
+
+
+def somente_digitos(texto: Optional[str]) -> str:
+    """'12.345.678/0001-90' -> '12345678000190'"""
+    return _NAO_DIGITO.sub("", texto or "")
+
+
+def _preencher(conexao, consulta: str, atualizar: str, valores) -> None:
+    """Preenche as colunas de busca em faixas de id (a normalização é feita em Python)"""
+    ultimo_id = 0
+    while True:
+        linhas = conexao.execute(sa.text(consulta), {"ultimo_id": ultimo_id, "limite": TAMANHO_LOTE}).all()
+        if not linhas:
+            return
+        conexao.execute(sa.text(atualizar), [valores(linha) for linha in linhas])
+        ultimo_id = linhas[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('clientes', sa.Column('nome_busca', sa.String(length=201), nullable=True))
+    op.add_column('clientes', sa.Column('cpf_ou_cnpj_digitos', sa.String(length=14), nullable=True))
+    op.add_column('produtos', sa.Column('nome_busca', sa.String(length=100), nullable=True))
+
+    conexao = op.get_bind()
+    _preencher(
+        conexao,
+        'SELECT id, nome, nome_fantasia, cpf_ou_cnpj FROM clientes WHERE id > :ultimo_id ORDER BY id LIMIT :limite',
+        'UPDATE clientes SET nome_busca = :nome_busca, cpf_ou_cnpj_digitos = :digitos WHERE id = :id',
+        lambda linha: {"id": linha[0], "nome_busca": normalizar_texto(linha[1], linha[2]), "digitos": somente_digitos(linha[3])}
+    )
+    _preencher(
+        conexao,
+        'SELECT id, nome FROM produtos WHERE id > :ultimo_id ORDER BY id LIMIT :limite',
+        'UPDATE produtos SET nome_busca = :nome_busca WHERE id = :id',
+        lambda linha: {"id": linha[0], "nome_busca": normalizar_texto(linha[1])}
+    )
+
+    # B-tree nos dígitos: atende a busca por prefixo (LIKE '123%')
+    op.create_index('ix_clientes_cpf_ou_cnpj_digitos', 'clientes', ['cpf_ou_cnpj_digitos'], unique=False)
+
+    if conexao.dialect.name == 'mysql':
+        # A lista de stopwords padrão do InnoDB descarta todo ngram que contém
+        # uma delas ("a", "de", "com"...): desligada para os índices criados aqui
+        conexao.execute(sa.text('SET SESSION innodb_ft_enable_stopword = OFF'))
+    op.create_index('ix_clientes_nome_busca', 'clientes', ['nome_busca'], unique=False,
+                    mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+    op.create_index('ix_produtos_nome_busca', 'produtos', ['nome_busca'], unique=False,
+                    mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_produtos_nome_busca', table_name='produtos')
+    op.drop_index('ix_clientes_nome_busca', table_name='clientes')
+    op.drop_index('ix_clientes_cpf_ou_cnpj_digitos', table_name='clientes')
+    op.drop_column('produtos', 'nome_busca')
+    op.drop_column('clientes', 'cpf_ou_cnpj_digitos')
+    op.drop_column('clientes', 'nome_busca')
@@ -2,7 +2,8 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.database import get_db
@@ -16,12 +17,14 @@ from typing import Optional
 router = APIRouter()
 
 @router.post("/login", response_model=dict)
-async def login(login_data: Login, db: Session = Depends(get_db)):
+async def login(login_data: Login, db: AsyncSession = Depends(get_db)):
     """Login endpoint"""
     # Buscar usuário por email ou cpf/cnpj
-    user = db.query(Usuario).filter(
-        (Usuario.email == login_data.login) | (Usuario.cpf_ou_cnpj == login_data.login)
-    ).first()
+    user = await db.scalar(
+        select(Usuario).where(
+            (Usuario.email == login_data.login) | (Usuario.cpf_ou_cnpj == login_data.login)
+        ).limit(1)
+    )
     
     if not user or not verify_password(login_data.senha, user.senha_hash):
         raise HTTPException(
@@ -1,72 +1,96 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
 from app.core.deps import get_current_user, get_current_admin_user
 from app.models.cliente import Cliente
 from app.models.usuario import Usuario
 from app.schemas.cliente import Cliente as ClienteSchema, ClienteCreate, ClienteUpdate
+from app.services.autocomplete import autocomplete_clientes
+from app.services.busca import BuscaService
+from app.utils.cache_respostas import invalidar_cache
+from app.utils.paginacao import contar, pagina_por_cursor, paginacao_cursor, paginacao_offset
 
 router = APIRouter()
 
+# Ordem estável para a paginação por cursor
+ORDEM_CLIENTES = [(Cliente.id, False)]
+
 @router.get("/", response_model=dict)
 async def listar_clientes(
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
     limit: int = Query(20, ge=1, le=100, description="Número de registros por página"),
-    nome: Optional[str] = Query(None, description="Filtrar por nome"),
-    cpf_ou_cnpj: Optional[str] = Query(None, description="Filtrar por CPF/CNPJ"),
+    nome: Optional[str] = Query(None, description="Filtrar por nome ou nome fantasia (trechos, sem diferenciar acentos)"),
+    cpf_ou_cnpj: Optional[str] = Query(None, description="Filtrar por CPF/CNPJ (início dos dígitos, com ou sem pontuação)"),
     ativo: Optional[bool] = Query(None, description="Filtrar por status ativo"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (vazio inicia a paginação por cursor)"),
+    incluir_total: bool = Query(True, description="Calcular o total exato de registros (em modo cursor, só na primeira página)"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Listar clientes com filtros e paginação"""
-    query = db.query(Cliente)
+    query = select(Cliente)
     
-    # Apply filters
+    # Apply filters (índices de busca, ver app/services/busca.py)
     if nome:
-        query = query.filter(
-            or_(
-                Cliente.nome.ilike(f"%{nome}%"),
-                Cliente.nome_fantasia.ilike(f"%{nome}%")
-            )
-        )
+        query = query.where(await db.run_sync(lambda sessao: BuscaService(sessao).filtro_clientes(nome)))
     
     if cpf_ou_cnpj:
-        query = query.filter(Cliente.cpf_ou_cnpj.ilike(f"%{cpf_ou_cnpj}%"))
+        query = query.where(BuscaService.filtro_documento(cpf_ou_cnpj))
     
     if ativo is not None:
-        query = query.filter(Cliente.ativo == ativo)
-    
-    # Get total count
-    total = query.count()
-    
-    # Apply pagination
-    clientes = query.offset(skip).limit(limit).all()
+        query = query.where(Cliente.ativo == ativo)
+    
+    if cursor is not None:
+        # Paginação por cursor (keyset)
+        total = await contar(db, query) if incluir_total and not cursor else None
+        clientes, proximo_cursor = await pagina_por_cursor(db, query, ORDEM_CLIENTES, cursor, limit)
+        paginacao = paginacao_cursor(limit, proximo_cursor, total)
+    else:
+        # Get total count
+        total = await contar(db, query) if incluir_total else None
+        
+        # Apply pagination
+        clientes = (await db.scalars(query.offset(skip).limit(limit))).all()
+        paginacao = paginacao_offset(skip, limit, total)
     
     return {
         "data": {
             "items": [ClienteSchema.from_orm(cliente) for cliente in clientes],
-            "paginacao": {
-                "pagina": (skip // limit) + 1,
-                "itensPorPagina": limit,
-                "totalItens": total,
-                "totalPaginas": (total + limit - 1) // limit
-            }
+            "paginacao": paginacao
         },
         "message": "Clientes listados com sucesso",
         "success": True
     }
 
+@router.get("/autocomplete", response_model=dict)
+async def sugerir_clientes(
+    nome: str = Query(..., min_length=1, description="Início do nome ou de uma palavra do nome/nome fantasia"),
+    limit: int = Query(10, ge=1, le=50, description="Número máximo de sugestões"),
+    incluir_inativos: bool = Query(False, description="Incluir clientes inativos"),
+    current_user: Usuario = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Sugestões de clientes durante a digitação (índice em memória, sem consulta ao banco)"""
+    if not autocomplete_clientes.carregado:
+        await db.run_sync(autocomplete_clientes.carregar)
+    
+    return {
+        "data": autocomplete_clientes.buscar(nome, limit, incluir_inativos),
+        "message": "Sugestões de clientes obtidas com sucesso",
+        "success": True
+    }
+
 @router.get("/{cliente_id}", response_model=dict)
 async def obter_cliente(
     cliente_id: int,
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Obter cliente por ID"""
-    cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+    cliente = await db.get(Cliente, cliente_id)
     if not cliente:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -83,13 +107,13 @@ async def obter_cliente(
 async def criar_cliente(
     cliente_data: ClienteCreate,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Criar novo cliente (apenas administradores)"""
     # Check if CPF/CNPJ already exists
-    existing_cliente = db.query(Cliente).filter(
-        Cliente.cpf_ou_cnpj == cliente_data.cpf_ou_cnpj
-    ).first()
+    existing_cliente = await db.scalar(
+        select(Cliente).where(Cliente.cpf_ou_cnpj == cliente_data.cpf_ou_cnpj).limit(1)
+    )
     
     if existing_cliente:
         raise HTTPException(
@@ -100,8 +124,10 @@ async def criar_cliente(
     # Create new cliente
     db_cliente = Cliente(**cliente_data.dict())
     db.add(db_cliente)
-    db.commit()
-    db.refresh(db_cliente)
+    await db.commit()
+    await invalidar_cache("clientes")
+    await db.refresh(db_cliente)
+    autocomplete_clientes.atualizar(db_cliente)
     
     return {
         "data": ClienteSchema.from_orm(db_cliente),
@@ -114,10 +140,10 @@ async def atualizar_cliente(
     cliente_id: int,
     cliente_data: ClienteUpdate,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Atualizar cliente (apenas administradores)"""
-    cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+    cliente = await db.get(Cliente, cliente_id)
     if not cliente:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -126,10 +152,12 @@ async def atualizar_cliente(
     
     # Check if new CPF/CNPJ already exists (if provided)
     if cliente_data.cpf_ou_cnpj and cliente_data.cpf_ou_cnpj != cliente.cpf_ou_cnpj:
-        existing_cliente = db.query(Cliente).filter(
-            Cliente.cpf_ou_cnpj == cliente_data.cpf_ou_cnpj,
-            Cliente.id != cliente_id
-        ).first()
+        existing_cliente = await db.scalar(
+            select(Cliente).where(
+                Cliente.cpf_ou_cnpj == cliente_data.cpf_ou_cnpj,
+                Cliente.id != cliente_id
+            ).limit(1)
+        )
         
         if existing_cliente:
             raise HTTPException(
@@ -142,8 +170,10 @@ async def atualizar_cliente(
     for field, value in update_data.items():
         setattr(cliente, field, value)
     
-    db.commit()
-    db.refresh(cliente)
+    await db.commit()
+    await invalidar_cache("clientes")
+    await db.refresh(cliente)
+    autocomplete_clientes.atualizar(cliente)
     
     return {
         "data": ClienteSchema.from_orm(cliente),
@@ -155,18 +185,20 @@ async def atualizar_cliente(
 async def excluir_cliente(
     cliente_id: int,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Excluir cliente (apenas administradores)"""
-    cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+    cliente = await db.get(Cliente, cliente_id)
     if not cliente:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cliente não encontrado"
         )
     
-    db.delete(cliente)
-    db.commit()
+    await db.delete(cliente)
+    await db.commit()
+    await invalidar_cache("clientes")
+    autocomplete_clientes.remover(cliente_id)
     
     return {
         "message": "Cliente excluído com sucesso",
@@ -1,28 +1,55 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, and_, func
+import asyncio
+import json
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import bindparam, case, desc, and_, delete, func, insert, select, update
 from decimal import Decimal
 from datetime import datetime, date
 
-from app.core.database import get_db
-from app.core.deps import get_current_user, get_current_admin_user
-from app.models.estoque import EntradaEstoque, Inventario
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, get_db
+from app.core.deps import get_current_user, get_current_admin_user, get_current_user_stream
+from app.models.estoque import EntradaEstoque, Inventario, MovimentacaoCaixa
+from app.models.carregamento import ENTRADA_COM_PRODUTO, INVENTARIO_COM_PRODUTO
+from app.models.cliente import Cliente
 from app.models.produto import Produto
 from app.models.usuario import Usuario
 from app.schemas.estoque import (
     EntradaEstoque as EntradaEstoqueSchema,
     EntradaEstoqueCreate,
+    EntradaEstoqueLoteCreate,
     Inventario as InventarioSchema,
     InventarioUpdate,
     EstoqueConsulta,
     FluxoCaixa,
     RelatorioRentabilidade
 )
+from app.services.agregacao_vendas import inicio_periodo
+from app.services.alertas_estoque import AlertaEstoqueService, notificador_alertas
 from app.services.fluxo_caixa import FluxoCaixaService
+from app.services.fifo_ledger import fifo_ledger
+from app.utils.cache_respostas import cache_resposta, invalidar_cache
+from app.utils.exportacao import FormatoExportacao, linhas_do_banco, resposta_exportacao
+from app.utils.paginacao import contar, ordem, pagina_por_cursor, paginacao_cursor, paginacao_offset
 
 router = APIRouter()
 
+# Ordem estável para a paginação por cursor
+ORDEM_ENTRADAS = [(EntradaEstoque.data_entrada, True), (EntradaEstoque.id, True)]
+ORDEM_MOVIMENTACOES = [(MovimentacaoCaixa.data_movimentacao, True), (MovimentacaoCaixa.id, True)]
+
+async def _carregar_entrada(db: AsyncSession, entrada_id: int) -> Optional[EntradaEstoque]:
+    """Busca a entrada com o produto pronto para serialização"""
+    return await db.scalar(
+        select(EntradaEstoque)
+        .options(*ENTRADA_COM_PRODUTO)
+        .where(EntradaEstoque.id == entrada_id)
+        .execution_options(populate_existing=True)
+    )
+
 @router.get("/entradas", response_model=dict)
 async def listar_entradas_estoque(
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
@@ -30,37 +57,46 @@ async def listar_entradas_estoque(
     produto_id: Optional[int] = Query(None, description="Filtrar por produto"),
     data_inicio: Optional[date] = Query(None, description="Data de início"),
     data_fim: Optional[date] = Query(None, description="Data de fim"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (vazio inicia a paginação por cursor)"),
+    incluir_total: bool = Query(True, description="Calcular o total exato de registros (em modo cursor, só na primeira página)"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Listar entradas de estoque com filtros e paginação"""
-    query = db.query(EntradaEstoque).options(joinedload(EntradaEstoque.produto))
+    query = select(EntradaEstoque)
     
     # Apply filters
     if produto_id:
-        query = query.filter(EntradaEstoque.produto_id == produto_id)
+        query = query.where(EntradaEstoque.produto_id == produto_id)
     
     if data_inicio:
-        query = query.filter(EntradaEstoque.data_entrada >= data_inicio)
+        query = query.where(EntradaEstoque.data_entrada >= data_inicio)
     
     if data_fim:
-        query = query.filter(EntradaEstoque.data_entrada <= data_fim)
+        query = query.where(EntradaEstoque.data_entrada <= data_fim)
     
-    # Get total count
-    total = query.count()
-    
-    # Apply pagination and order by date
-    entradas = query.order_by(desc(EntradaEstoque.data_entrada)).offset(skip).limit(limit).all()
+    if cursor is not None:
+        # Paginação por cursor (keyset) sobre (data_entrada, id)
+        total = await contar(db, query) if incluir_total and not cursor else None
+        entradas, proximo_cursor = await pagina_por_cursor(
+            db, query.options(*ENTRADA_COM_PRODUTO), ORDEM_ENTRADAS, cursor, limit
+        )
+        paginacao = paginacao_cursor(limit, proximo_cursor, total)
+    else:
+        # Get total count
+        total = await contar(db, query) if incluir_total else None
+        
+        # Apply pagination and order by date
+        entradas = (await db.scalars(
+            query.options(*ENTRADA_COM_PRODUTO)
+            .order_by(desc(EntradaEstoque.data_entrada)).offset(skip).limit(limit)
+        )).all()
+        paginacao = paginacao_offset(skip, limit, total)
     
     return {
         "data": {
             "items": [EntradaEstoqueSchema.from_orm(entrada) for entrada in entradas],
-            "paginacao": {
-                "pagina": (skip // limit) + 1,
-                "itensPorPagina": limit,
-                "totalItens": total,
-                "totalPaginas": (total + limit - 1) // limit
-            }
+            "paginacao": paginacao
         },
         "message": "Entradas de estoque listadas com sucesso",
         "success": True
@@ -70,11 +106,11 @@ async def listar_entradas_estoque(
 async def criar_entrada_estoque(
     entrada_data: EntradaEstoqueCreate,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Criar nova entrada de estoque (apenas administradores)"""
     # Verify product exists
-    produto = db.query(Produto).filter(Produto.id == entrada_data.produto_id).first()
+    produto = await db.get(Produto, entrada_data.produto_id)
     if not produto:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -94,7 +130,9 @@ async def criar_entrada_estoque(
     db.add(db_entrada)
     
     # Update or create inventory record
-    inventario = db.query(Inventario).filter(Inventario.produto_id == entrada_data.produto_id).first()
+    inventario = await db.scalar(
+        select(Inventario).where(Inventario.produto_id == entrada_data.produto_id).limit(1)
+    )
     if inventario:
         inventario.quantidade_atual += entrada_data.quantidade
         inventario.data_ultima_atualizacao = datetime.utcnow()
@@ -108,12 +146,14 @@ async def criar_entrada_estoque(
         )
         db.add(inventario)
     
-    db.commit()
-    db.refresh(db_entrada)
+    await db.run_sync(lambda sessao: AlertaEstoqueService(sessao).atualizar([entrada_data.produto_id]))
+    await db.commit()
+    await invalidar_cache("estoque")
+    await db.refresh(db_entrada)
     
     # Registrar no fluxo de caixa FIFO
-    fluxo_service = FluxoCaixaService(db)
-    fluxo_service.registrar_entrada_estoque(db_entrada)
+    await db.run_sync(lambda sessao: FluxoCaixaService(sessao).registrar_entrada_estoque(db_entrada))
+    db_entrada = await _carregar_entrada(db, db_entrada.id)
     
     return {
         "data": EntradaEstoqueSchema.from_orm(db_entrada),
@@ -121,17 +161,121 @@ async def criar_entrada_estoque(
         "success": True
     }
 
+@router.post("/entradas/lote", response_model=dict)
+async def criar_entradas_estoque_lote(
+    lote: EntradaEstoqueLoteCreate,
+    current_user: Usuario = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Registrar uma entrega com vários produtos em uma única transação (apenas administradores)"""
+    # Verify all products exist (uma única consulta IN)
+    produto_ids = {item.produto_id for item in lote.itens}
+    existentes = set(await db.scalars(select(Produto.id).where(Produto.id.in_(produto_ids))))
+    for item in lote.itens:
+        if item.produto_id not in existentes:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Produto com ID {item.produto_id} não encontrado"
+            )
+    
+    # Create entradas
+    entradas = [
+        EntradaEstoque(
+            produto_id=item.produto_id,
+            quantidade=item.quantidade,
+            tipo_medida=item.tipo_medida,
+            preco_custo=item.preco_custo,
+            valor_total=item.preco_custo * item.quantidade,
+            fornecedor=item.fornecedor or lote.fornecedor,
+            observacoes=item.observacoes or lote.observacoes
+        )
+        for item in lote.itens
+    ]
+    db.add_all(entradas)
+    await db.flush()
+    
+    # Update or create inventory records: uma leitura, um UPDATE e um INSERT em lote
+    totais = {}
+    for item in lote.itens:
+        total = totais.setdefault(item.produto_id, {
+            "quantidade": Decimal('0'),
+            "tipo_medida": item.tipo_medida,
+            "valor_unitario": item.preco_custo,
+            "valor_total": Decimal('0')
+        })
+        total["quantidade"] += item.quantidade
+        total["valor_total"] += item.preco_custo * item.quantidade
+    
+    inventarios = {}
+    for produto_id, inventario_id in await db.execute(
+        select(Inventario.produto_id, Inventario.id)
+        .where(Inventario.produto_id.in_(produto_ids))
+        .order_by(Inventario.id)
+    ):
+        inventarios.setdefault(produto_id, inventario_id)
+    
+    tabela = Inventario.__table__
+    if inventarios:
+        await db.execute(
+            update(tabela)
+            .where(tabela.c.id == bindparam("inventario_id"))
+            .values(
+                quantidade_atual=tabela.c.quantidade_atual + bindparam("quantidade"),
+                data_ultima_atualizacao=datetime.utcnow()
+            ),
+            [
+                {"inventario_id": inventario_id, "quantidade": totais[produto_id]["quantidade"]}
+                for produto_id, inventario_id in inventarios.items()
+            ]
+        )
+    novos = [
+        {
+            "produto_id": produto_id,
+            "quantidade_atual": total["quantidade"],
+            "tipo_medida": total["tipo_medida"],
+            "valor_unitario": total["valor_unitario"],
+            "valor_total": total["valor_total"]
+        }
+        for produto_id, total in totais.items()
+        if produto_id not in inventarios
+    ]
+    if novos:
+        await db.execute(insert(Inventario), novos)
+    
+    # Recarregar as entradas uma vez (data gerada pelo banco e produto) e registrar no FIFO
+    entradas = (await db.scalars(
+        select(EntradaEstoque)
+        .options(*ENTRADA_COM_PRODUTO)
+        .where(EntradaEstoque.id.in_([entrada.id for entrada in entradas]))
+        .order_by(EntradaEstoque.id)
+        .execution_options(populate_existing=True)
+    )).all()
+    await db.run_sync(lambda sessao: FluxoCaixaService(sessao).registrar_entradas_estoque(entradas))
+    await db.run_sync(lambda sessao: AlertaEstoqueService(sessao).atualizar(produto_ids))
+    await db.commit()
+    await invalidar_cache("estoque")
+    
+    return {
+        "data": {
+            "items": [EntradaEstoqueSchema.from_orm(entrada) for entrada in entradas],
+            "quantidade_entradas": len(entradas),
+            "valor_total": sum(entrada.valor_total for entrada in entradas)
+        },
+        "message": f"{len(entradas)} entradas de estoque criadas com sucesso",
+        "success": True
+    }
+
 @router.delete("/entradas/{entrada_id}", response_model=dict)
 async def deletar_entrada_estoque(
     entrada_id: int,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Deletar entrada de estoque (apenas administradores)"""
     from app.models.estoque import EstoqueFifo
     
     # Buscar a entrada
-    entrada = db.query(EntradaEstoque).filter(EntradaEstoque.id == entrada_id).first()
+    entrada = await _carregar_entrada(db, entrada_id)
     if not entrada:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -140,12 +284,14 @@ async def deletar_entrada_estoque(
     
     # Verificar se existem registros FIFO relacionados que foram usados em vendas
     # Como não temos quantidade_inicial no FIFO, vamos usar a quantidade da entrada original
-    fifo_usados = db.query(EstoqueFifo).join(EntradaEstoque).filter(
-        and_(
-            EstoqueFifo.entrada_estoque_id == entrada_id,
-            EstoqueFifo.quantidade_restante < EntradaEstoque.quantidade
-        )
-    ).first()
+    fifo_usados = await db.scalar(
+        select(EstoqueFifo).join(EntradaEstoque).where(
+            and_(
+                EstoqueFifo.entrada_estoque_id == entrada_id,
+                EstoqueFifo.quantidade_restante < EntradaEstoque.quantidade
+            )
+        ).limit(1)
+    )
     
     if fifo_usados:
         raise HTTPException(
@@ -154,7 +300,9 @@ async def deletar_entrada_estoque(
         )
     
     # Verificar inventário atual
-    inventario = db.query(Inventario).filter(Inventario.produto_id == entrada.produto_id).first()
+    inventario = await db.scalar(
+        select(Inventario).where(Inventario.produto_id == entrada.produto_id).limit(1)
+    )
     if not inventario:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -169,7 +317,11 @@ async def deletar_entrada_estoque(
         )
     
     # Remover registros FIFO não utilizados
-    db.query(EstoqueFifo).filter(EstoqueFifo.entrada_estoque_id == entrada_id).delete()
+    fifo_ids = (await db.scalars(
+        select(EstoqueFifo.id).where(EstoqueFifo.entrada_estoque_id == entrada_id)
+    )).all()
+    await db.execute(delete(EstoqueFifo).where(EstoqueFifo.entrada_estoque_id == entrada_id))
+    await db.run_sync(lambda sessao: fifo_ledger.remover_entrada(sessao, entrada.produto_id, fifo_ids))
     
     # Atualizar inventário
     inventario.quantidade_atual -= entrada.quantidade
@@ -177,34 +329,40 @@ async def deletar_entrada_estoque(
     
     # Se inventário ficar zerado e não há outras entradas, remover registro
     if inventario.quantidade_atual == 0:
-        outras_entradas = db.query(EntradaEstoque).filter(
-            and_(
-                EntradaEstoque.produto_id == entrada.produto_id,
-                EntradaEstoque.id != entrada_id
-            )
-        ).first()
+        outras_entradas = await db.scalar(
+            select(EntradaEstoque.id).where(
+                and_(
+                    EntradaEstoque.produto_id == entrada.produto_id,
+                    EntradaEstoque.id != entrada_id
+                )
+            ).limit(1)
+        )
         
         if not outras_entradas:
-            db.delete(inventario)
+            await db.delete(inventario)
     
     # Remover movimentação de caixa
     from app.models.estoque import MovimentacaoCaixa, TipoMovimentacao
-    movimentacao = db.query(MovimentacaoCaixa).filter(
-        and_(
-            MovimentacaoCaixa.entrada_estoque_id == entrada_id,
-            MovimentacaoCaixa.tipo_movimentacao == TipoMovimentacao.ENTRADA
-        )
-    ).first()
+    movimentacao = await db.scalar(
+        select(MovimentacaoCaixa).where(
+            and_(
+                MovimentacaoCaixa.entrada_estoque_id == entrada_id,
+                MovimentacaoCaixa.tipo_movimentacao == TipoMovimentacao.ENTRADA
+            )
+        ).limit(1)
+    )
     
     if movimentacao:
-        db.delete(movimentacao)
+        await db.delete(movimentacao)
     
     # Salvar dados da entrada para resposta
     entrada_data = EntradaEstoqueSchema.from_orm(entrada)
     
     # Deletar a entrada
-    db.delete(entrada)
-    db.commit()
+    await db.delete(entrada)
+    await db.run_sync(lambda sessao: AlertaEstoqueService(sessao).atualizar([entrada.produto_id]))
+    await db.commit()
+    await invalidar_cache("estoque")
     
     return {
         "data": {
@@ -223,49 +381,69 @@ async def deletar_entrada_estoque(
 @router.get("/entradas/deletaveis", response_model=dict)
 async def listar_entradas_deletaveis(
     produto_id: Optional[int] = Query(None, description="Filtrar por produto"),
+    skip: int = Query(0, ge=0, description="Número de registros para pular"),
+    limit: int = Query(100, ge=1, le=1000, description="Número de registros por página"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (vazio inicia a paginação por cursor)"),
+    incluir_total: bool = Query(True, description="Calcular o total exato de registros (em modo cursor, só na primeira página)"),
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Listar entradas que podem ser deletadas (não utilizadas em vendas)"""
     from app.models.estoque import EstoqueFifo
     
-    # Buscar entradas que não foram utilizadas em vendas
-    query = db.query(EntradaEstoque).options(joinedload(EntradaEstoque.produto))
+    # Uma consulta: cada entrada com a contagem dos seus registros FIFO; entradas
+    # com alguma camada já consumida (restante < quantidade) ficam de fora no HAVING
+    camadas_consumidas = func.sum(case(
+        (EstoqueFifo.quantidade_restante < EntradaEstoque.quantidade, 1),
+        else_=0
+    ))
+    query = select(
+        EntradaEstoque,
+        func.count(EstoqueFifo.id).label("registros_fifo")
+    ).outerjoin(
+        EstoqueFifo, EstoqueFifo.entrada_estoque_id == EntradaEstoque.id
+    ).group_by(EntradaEstoque.id).having(
+        func.coalesce(camadas_consumidas, 0) == 0
+    )
     
     if produto_id:
-        query = query.filter(EntradaEstoque.produto_id == produto_id)
-    
-    # Subquery para entradas que têm FIFO utilizado (quantidade_restante < quantidade da entrada)
-    subquery_fifo_utilizado = db.query(EstoqueFifo.entrada_estoque_id).join(EntradaEstoque).filter(
-        EstoqueFifo.quantidade_restante < EntradaEstoque.quantidade
-    ).subquery()
-    
-    entradas_deletaveis = query.filter(
-        ~EntradaEstoque.id.in_(subquery_fifo_utilizado)
-    ).order_by(desc(EntradaEstoque.data_entrada)).all()
+        query = query.where(EntradaEstoque.produto_id == produto_id)
+    
+    # Produto em consulta IN separada: um JOIN traria colunas fora do GROUP BY
+    carregar_produto = selectinload(EntradaEstoque.produto)
+    if cursor is not None:
+        total = await contar(db, query) if incluir_total and not cursor else None
+        linhas, proximo_cursor = await pagina_por_cursor(
+            db, query.options(carregar_produto), ORDEM_ENTRADAS, cursor, limit
+        )
+        paginacao = paginacao_cursor(limit, proximo_cursor, total)
+    else:
+        total = await contar(db, query) if incluir_total else None
+        linhas = (await db.execute(
+            query.options(carregar_produto)
+            .order_by(*ordem(ORDEM_ENTRADAS)).offset(skip).limit(limit)
+        )).all()
+        paginacao = paginacao_offset(skip, limit, total)
     
     # Adicionar informações de status para cada entrada
     resultado = []
-    for entrada in entradas_deletaveis:
-        # Verificar se tem registros FIFO
-        fifo_count = db.query(EstoqueFifo).filter(
-            EstoqueFifo.entrada_estoque_id == entrada.id
-        ).count()
-        
+    for entrada, registros_fifo in linhas:
         entrada_dict = EntradaEstoqueSchema.from_orm(entrada).dict()
         entrada_dict['status_exclusao'] = {
             'pode_deletar': True,
-            'tem_fifo': fifo_count > 0,
+            'tem_fifo': registros_fifo > 0,
             'motivo': 'Entrada não utilizada em vendas'
         }
         resultado.append(entrada_dict)
     
+    quantidade = total if total is not None else len(resultado)
     return {
         "data": {
             "entradas_deletaveis": resultado,
-            "total": len(resultado)
+            "total": quantidade,
+            "paginacao": paginacao
         },
-        "message": f"{len(resultado)} entradas podem ser deletadas",
+        "message": f"{quantidade} entradas podem ser deletadas",
         "success": True
     }
 
@@ -273,15 +451,13 @@ async def listar_entradas_deletaveis(
 async def verificar_status_exclusao(
     entrada_id: int,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Verificar se uma entrada pode ser deletada e por quê"""
     from app.models.estoque import EstoqueFifo
     
     # Buscar a entrada
-    entrada = db.query(EntradaEstoque).options(joinedload(EntradaEstoque.produto)).filter(
-        EntradaEstoque.id == entrada_id
-    ).first()
+    entrada = await _carregar_entrada(db, entrada_id)
     
     if not entrada:
         raise HTTPException(
@@ -290,16 +466,17 @@ async def verificar_status_exclusao(
         )
     
     # Verificar registros FIFO
-    fifo_records = db.query(EstoqueFifo).filter(EstoqueFifo.entrada_estoque_id == entrada_id).all()
+    fifo_records = (await db.scalars(
+        select(EstoqueFifo).where(EstoqueFifo.entrada_estoque_id == entrada_id)
+    )).all()
     
     pode_deletar = True
     motivos_bloqueio = []
     detalhes_fifo = []
     
     for fifo in fifo_records:
-        # Buscar a entrada original para comparar quantidade
-        entrada_original = db.query(EntradaEstoque).filter(EntradaEstoque.id == fifo.entrada_estoque_id).first()
-        quantidade_inicial = entrada_original.quantidade if entrada_original else fifo.quantidade_restante
+        # Todos os registros pertencem a esta entrada: a quantidade inicial é a dela
+        quantidade_inicial = entrada.quantidade
         quantidade_usada = quantidade_inicial - fifo.quantidade_restante
         
         detalhes_fifo.append({
@@ -314,7 +491,9 @@ async def verificar_status_exclusao(
             motivos_bloqueio.append(f"Quantidade {quantidade_usada} já foi utilizada em vendas")
     
     # Verificar inventário
-    inventario = db.query(Inventario).filter(Inventario.produto_id == entrada.produto_id).first()
+    inventario = await db.scalar(
+        select(Inventario).where(Inventario.produto_id == entrada.produto_id).limit(1)
+    )
     
     status_inventario = {
         "quantidade_atual": inventario.quantidade_atual if inventario else 0,
@@ -350,26 +529,26 @@ async def listar_inventario(
     produto_id: Optional[int] = Query(None, description="Filtrar por produto"),
     estoque_baixo: Optional[bool] = Query(False, description="Mostrar apenas produtos com estoque baixo"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Listar inventário atual com filtros e paginação"""
-    query = db.query(Inventario).options(joinedload(Inventario.produto))
+    query = select(Inventario).options(*INVENTARIO_COM_PRODUTO)
 
     # Apply filters
     if produto_id:
-        query = query.filter(Inventario.produto_id == produto_id)
+        query = query.where(Inventario.produto_id == produto_id)
 
     if estoque_baixo:
         # Só faz join uma vez!
-        query = query.join(Produto).filter(
+        query = query.join(Produto).where(
             Inventario.quantidade_atual < Produto.estoque_minimo
         )
-        inventarios = query.order_by(Produto.nome).offset(skip).limit(limit).all()
+        inventarios = (await db.scalars(query.order_by(Produto.nome).offset(skip).limit(limit))).all()
     else:
-        inventarios = query.join(Produto).order_by(Produto.nome).offset(skip).limit(limit).all()
+        inventarios = (await db.scalars(query.join(Produto).order_by(Produto.nome).offset(skip).limit(limit))).all()
 
     # Get total count
-    total = query.count()
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
 
     return {
         "data": {
@@ -390,13 +569,11 @@ async def atualizar_inventario(
     produto_id: int,
     inventario_data: InventarioUpdate,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Atualizar quantidade de inventário manualmente (apenas administradores) e recalcular valor_total pelo FIFO"""
-    from app.models.estoque import EstoqueFifo
-
     # Verifica se o produto existe
-    produto = db.query(Produto).filter(Produto.id == produto_id).first()
+    produto = await db.get(Produto, produto_id)
     if not produto:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -404,7 +581,9 @@ async def atualizar_inventario(
         )
     
     # Busca ou cria o inventário
-    inventario = db.query(Inventario).filter(Inventario.produto_id == produto_id).first()
+    inventario = await db.scalar(
+        select(Inventario).where(Inventario.produto_id == produto_id).limit(1)
+    )
     if not inventario:
         inventario = Inventario(produto_id=produto_id)
         db.add(inventario)
@@ -414,26 +593,20 @@ async def atualizar_inventario(
     inventario.observacoes = inventario_data.observacoes
     inventario.data_ultima_atualizacao = datetime.utcnow()
 
-    # Recalcula valor_total pelo FIFO
-    entradas_fifo = db.query(EstoqueFifo).filter(
-        EstoqueFifo.produto_id == produto_id,
-        EstoqueFifo.quantidade_restante > 0
-    ).order_by(EstoqueFifo.id).all()
-
-    quantidade_restante = inventario.quantidade_atual
-    valor_total = 0
-
-    for entrada in entradas_fifo:
-        usar = min(entrada.quantidade_restante, quantidade_restante)
-        valor_total += Decimal(usar) * Decimal(entrada.preco_custo_unitario)
-        quantidade_restante -= usar
-        if quantidade_restante <= 0:
-            break
-
-    inventario.valor_total = valor_total
+    # Recalcula valor_total pelo FIFO (camadas em cache)
+    inventario.valor_total = await db.run_sync(
+        lambda sessao: fifo_ledger.valor_estoque(sessao, produto_id, inventario.quantidade_atual)
+    )
+    await db.run_sync(lambda sessao: AlertaEstoqueService(sessao).atualizar([produto_id]))
 
-    db.commit()
-    db.refresh(inventario)
+    await db.commit()
+    await invalidar_cache("estoque")
+    inventario = await db.scalar(
+        select(Inventario)
+        .options(*INVENTARIO_COM_PRODUTO)
+        .where(Inventario.produto_id == produto_id)
+        .execution_options(populate_existing=True)
+    )
     
     return {
         "data": InventarioSchema.from_orm(inventario),
@@ -445,11 +618,11 @@ async def atualizar_inventario(
 async def consultar_estoque_produto(
     produto_id: int,
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Consultar estoque de um produto específico"""
     # Verify product exists
-    produto = db.query(Produto).filter(Produto.id == produto_id).first()
+    produto = await db.get(Produto, produto_id)
     if not produto:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -457,21 +630,27 @@ async def consultar_estoque_produto(
         )
     
     # Get inventory
-    inventario = db.query(Inventario).filter(Inventario.produto_id == produto_id).first()
+    inventario = await db.scalar(
+        select(Inventario).where(Inventario.produto_id == produto_id).limit(1)
+    )
     
     # Get recent entries (last 10)
-    entradas_recentes = db.query(EntradaEstoque).filter(
-        EntradaEstoque.produto_id == produto_id
-    ).order_by(desc(EntradaEstoque.data_entrada)).limit(10).all()
+    entradas_recentes = (await db.scalars(
+        select(EntradaEstoque).options(*ENTRADA_COM_PRODUTO).where(
+            EntradaEstoque.produto_id == produto_id
+        ).order_by(desc(EntradaEstoque.data_entrada)).limit(10)
+    )).all()
     
     # Calculate total entries in the last 30 days
     thirty_days_ago = datetime.utcnow().date().replace(day=1)  # Beginning of month
-    total_entradas_mes = db.query(func.sum(EntradaEstoque.quantidade)).filter(
-        and_(
-            EntradaEstoque.produto_id == produto_id,
-            EntradaEstoque.data_entrada >= thirty_days_ago
+    total_entradas_mes = await db.scalar(
+        select(func.sum(EntradaEstoque.quantidade)).where(
+            and_(
+                EntradaEstoque.produto_id == produto_id,
+                EntradaEstoque.data_entrada >= thirty_days_ago
+            )
         )
-    ).scalar() or 0
+    ) or 0
     
     consulta = EstoqueConsulta(
         produto=produto,
@@ -489,46 +668,40 @@ async def consultar_estoque_produto(
         "success": True
     }
 
+@router.get("/custo-fifo/{produto_id}", response_model=dict)
+async def cotar_custo_fifo(
+    produto_id: int,
+    quantidade: Decimal = Query(..., gt=0, description="Quantidade a cotar"),
+    current_user: Usuario = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Cotar o custo FIFO de uma quantidade sem consumir estoque"""
+    custo_total = await db.run_sync(lambda sessao: FluxoCaixaService(sessao).cotar_custo(produto_id, quantidade))
+    
+    return {
+        "data": {
+            "produto_id": produto_id,
+            "quantidade": quantidade,
+            "custo_total": custo_total,
+            "custo_unitario": (custo_total / quantidade).quantize(Decimal('0.01'))
+        },
+        "message": "Custo FIFO cotado com sucesso",
+        "success": True
+    }
+
 @router.get("/alertas", response_model=dict)
+@cache_resposta("estoque", "produtos")
 async def obter_alertas_estoque(
+    request: Request,
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Obter produtos com estoque baixo"""
-    # Get products with low stock
-    produtos_estoque_baixo = db.query(Inventario).options(
-        joinedload(Inventario.produto)
-    ).join(Produto).filter(
-        Inventario.quantidade_atual < Produto.estoque_minimo
-    ).all()
-    
-    # Get products with no inventory record (assumed zero stock)
-    produtos_sem_inventario = db.query(Produto).outerjoin(Inventario).filter(
-        Inventario.id == None
-    ).all()
-    
-    alertas = {
-        "produtos_estoque_baixo": [
-            {
-                "produto": inventario.produto.nome,
-                "produto_id": inventario.produto_id,
-                "quantidade_atual": inventario.quantidade_atual,
-                "estoque_minimo": inventario.produto.estoque_minimo
-            }
-            for inventario in produtos_estoque_baixo
-        ],
-        "produtos_sem_estoque": [
-            {
-                "produto": produto.nome,
-                "produto_id": produto.id,
-                "estoque_minimo": produto.estoque_minimo
-            }
-            for produto in produtos_sem_inventario
-        ]
-    }
-    
+    """Obter produtos com estoque baixo (lidos de alertas_estoque)"""
+    alertas = await db.run_sync(lambda sessao: AlertaEstoqueService(sessao).listar())
+    return _resposta_alertas(alertas)
+
+def _resposta_alertas(alertas: dict) -> dict:
     total_alertas = len(alertas["produtos_estoque_baixo"]) + len(alertas["produtos_sem_estoque"])
-    
     return {
         "data": alertas,
         "total_alertas": total_alertas,
@@ -536,32 +709,119 @@ async def obter_alertas_estoque(
         "success": True
     }
 
+async def _eventos_alertas(request: Request):
+    """Envia os alertas ao conectar e a cada mudança.
+
+    Alterações neste processo acordam o stream na hora; as feitas em outros
+    workers são percebidas na releitura periódica (que também serve de keep-alive).
+    """
+    evento = notificador_alertas.assinar()
+    ultimo = None
+    try:
+        while not await request.is_disconnected():
+            async with AsyncSessionLocal() as sessao:
+                alertas = await sessao.run_sync(lambda s: AlertaEstoqueService(s).listar())
+            dados = json.dumps(_resposta_alertas(alertas), default=str, ensure_ascii=False)
+            if dados != ultimo:
+                ultimo = dados
+                yield f"event: alertas\ndata: {dados}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            try:
+                await asyncio.wait_for(evento.wait(), timeout=settings.ALERTAS_STREAM_INTERVALO_SEGUNDOS)
+            except asyncio.TimeoutError:
+                pass
+            evento.clear()
+    finally:
+        notificador_alertas.cancelar(evento)
+
+@router.get("/alertas/stream")
+async def stream_alertas_estoque(
+    request: Request,
+    current_user: Usuario = Depends(get_current_user_stream)
+):
+    """
+    Alertas de estoque via Server-Sent Events (evento `alertas`, mesmo JSON de GET /alertas)
+    
+    Um novo evento é enviado sempre que os alertas mudam, em vez de a tela
+    consultar /alertas periodicamente. Aceita o header Authorization ou o
+    parâmetro `token`, já que o EventSource do navegador não envia headers
+    (`new EventSource("/api/estoque/alertas/stream?token=<jwt>")`).
+    """
+    return StreamingResponse(
+        _eventos_alertas(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/fluxo-caixa", response_model=dict)
 async def obter_fluxo_caixa(
     produto_id: Optional[int] = Query(None, description="Filtrar por produto"),
     data_inicio: Optional[date] = Query(None, description="Data de início"),
     data_fim: Optional[date] = Query(None, description="Data de fim"),
+    skip: int = Query(0, ge=0, description="Movimentações para pular"),
+    limit: int = Query(100, ge=1, le=1000, description="Movimentações por página"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página de movimentações (vazio inicia a paginação por cursor)"),
+    formato: Optional[FormatoExportacao] = Query(None, alias="format", description="Exportar as movimentações em csv, xlsx ou ndjson (streaming) em vez de JSON"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Obter relatório de fluxo de caixa com controle FIFO"""
-    fluxo_service = FluxoCaixaService(db)
-    
+    """Obter relatório de fluxo de caixa com controle FIFO
+
+    Os totais cobrem todo o filtro; `movimentacoes` é uma página, das mais
+    recentes para as mais antigas. Por padrão vêm só as 100 primeiras
+    (`limit` até 1000); `paginacao.totalItens` tem o total do filtro. Para as
+    demais, use `skip` (com `paginacao.totalPaginas`) ou `cursor` ("" na
+    primeira página, depois `paginacao.proximoCursor`, até `temMais` ser
+    falso). Para receber todas de uma vez, use `format` (exportação em streaming).
+    """
     # Converter dates para datetime se necessário
     data_inicio_dt = datetime.combine(data_inicio, datetime.min.time()) if data_inicio else None
     data_fim_dt = datetime.combine(data_fim, datetime.max.time()) if data_fim else None
+    filtros = FluxoCaixaService.filtros_movimentacoes(produto_id, data_inicio_dt, data_fim_dt)
+    
+    if formato:
+        # Movimentações lidas do banco em streaming, mais recentes primeiro
+        consulta = select(
+            MovimentacaoCaixa.id,
+            MovimentacaoCaixa.data_movimentacao,
+            MovimentacaoCaixa.produto_id,
+            Produto.nome,
+            MovimentacaoCaixa.tipo_movimentacao,
+            MovimentacaoCaixa.quantidade,
+            MovimentacaoCaixa.preco_unitario,
+            MovimentacaoCaixa.valor_total,
+            MovimentacaoCaixa.venda_id,
+            MovimentacaoCaixa.entrada_estoque_id,
+            MovimentacaoCaixa.observacoes
+        ).join(
+            Produto, Produto.id == MovimentacaoCaixa.produto_id
+        ).where(*filtros).order_by(*ordem(ORDEM_MOVIMENTACOES))
+        return resposta_exportacao(
+            formato,
+            "fluxo_caixa",
+            ["id", "data", "produto_id", "produto", "tipo", "quantidade", "preco_unitario",
+             "valor_total", "venda_id", "entrada_estoque_id", "observacoes"],
+            linhas_do_banco(consulta, tuple)
+        )
     
-    relatorio = fluxo_service.obter_relatorio_fluxo_caixa(
+    relatorio = await db.run_sync(lambda sessao: FluxoCaixaService(sessao).obter_relatorio_fluxo_caixa(
         produto_id=produto_id,
         data_inicio=data_inicio_dt,
         data_fim=data_fim_dt
-    )
-    
-    movimentacoes_ordenadas = sorted(
-        relatorio["movimentacoes"],
-        key=lambda mov: mov.data_movimentacao,
-        reverse=True
-    )
+    ))
+    
+    # Página de movimentações ordenada no banco; o total já veio com os agregados
+    query = select(MovimentacaoCaixa).where(*filtros)
+    total = relatorio["quantidade_movimentacoes"]
+    if cursor is not None:
+        movimentacoes, proximo_cursor = await pagina_por_cursor(db, query, ORDEM_MOVIMENTACOES, cursor, limit)
+        paginacao = paginacao_cursor(limit, proximo_cursor, total)
+    else:
+        movimentacoes = (await db.scalars(
+            query.order_by(*ordem(ORDEM_MOVIMENTACOES)).offset(skip).limit(limit)
+        )).all()
+        paginacao = paginacao_offset(skip, limit, total)
 
     return {
         "data": {
@@ -582,8 +842,9 @@ async def obter_fluxo_caixa(
                     "data": mov.data_movimentacao,
                     "observacoes": mov.observacoes
                 }
-                for mov in movimentacoes_ordenadas
-            ]
+                for mov in movimentacoes
+            ],
+            "paginacao": paginacao
         },
         "message": "Relatório de fluxo de caixa gerado com sucesso",
         "success": True
@@ -593,57 +854,78 @@ async def obter_fluxo_caixa(
 async def obter_rentabilidade(
     data_inicio: date = Query(..., description="Data de início (obrigatório)"),
     data_fim: date = Query(..., description="Data de fim (obrigatório)"),
+    periodo: Optional[Literal["dia", "semana", "mes"]] = Query(None, description="Agrupar também por dia, semana ou mês"),
+    por_cliente: bool = Query(False, description="Agrupar também por cliente"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Obter relatório de rentabilidade por período (novo modelo, só vendas)"""
-    from app.models.venda import ItemVenda, Venda
-
-    data_inicio_dt = datetime.combine(data_inicio, datetime.min.time())
-    data_fim_dt = datetime.combine(data_fim, datetime.max.time())
-
-    # Buscar itens de venda do período
-    itens = db.query(ItemVenda).join(Venda).filter(
-        Venda.data_venda >= data_inicio_dt,
-        Venda.data_venda <= data_fim_dt
-    ).all()
-
-    # Agrupar por produto
-    produtos_rentabilidade = {}
-    for item in itens:
-        produto_id = item.produto_id
-        if produto_id not in produtos_rentabilidade:
-            produto = db.query(Produto).filter(Produto.id == produto_id).first()
-            produtos_rentabilidade[produto_id] = {
-                "produto": {
-                    "id": produto.id,
-                    "nome": produto.nome,
-                    "descricao": produto.descricao
-                },
-                "quantidade_vendida": Decimal('0'),
-                "receita_total": Decimal('0'),
-                "custo_total": Decimal('0'),
-                "lucro_bruto": Decimal('0'),
-                "vendas": 0
-            }
-        dados = produtos_rentabilidade[produto_id]
-        dados["quantidade_vendida"] += item.quantidade
-        dados["receita_total"] += item.valor_total_produto
-        dados["custo_total"] += item.custo * item.quantidade
-        dados["lucro_bruto"] += item.lucro_bruto
-        dados["vendas"] += 1
+    """Obter relatório de rentabilidade por período (novo modelo, só vendas)
+
+    Uma única consulta GROUP BY sobre o rollup diário; cada linha de `produtos`
+    traz também `periodo` (início do dia/semana/mês) e/ou `cliente` quando
+    esses agrupamentos são pedidos.
+    """
+    from app.models.venda import VendaDiaria
+
+    colunas = [Produto.id, Produto.nome, Produto.descricao]
+    agrupamento = []
+    if periodo:
+        inicio = inicio_periodo(VendaDiaria.data, periodo).label('periodo')
+        colunas.append(inicio)
+        agrupamento.append(inicio)
+    if por_cliente:
+        colunas += [VendaDiaria.cliente_id, Cliente.nome.label('cliente_nome')]
+        agrupamento += [VendaDiaria.cliente_id, Cliente.nome]
+
+    query = select(
+        *colunas,
+        func.sum(VendaDiaria.quantidade).label('quantidade_vendida'),
+        func.sum(VendaDiaria.valor_total).label('receita_total'),
+        func.sum(VendaDiaria.custo_total).label('custo_total'),
+        func.sum(VendaDiaria.lucro_bruto).label('lucro_bruto'),
+        func.sum(VendaDiaria.itens).label('vendas')
+    ).join(
+        VendaDiaria, VendaDiaria.produto_id == Produto.id
+    ).where(
+        VendaDiaria.data >= data_inicio,
+        VendaDiaria.data <= data_fim
+    ).group_by(*agrupamento, Produto.id, Produto.nome, Produto.descricao)
+    if por_cliente:
+        query = query.outerjoin(Cliente, Cliente.id == VendaDiaria.cliente_id)
+    if agrupamento:
+        query = query.order_by(*agrupamento, Produto.id)
+
+    produtos_rentabilidade = []
+    for linha in (await db.execute(query)).all():
+        dados = {
+            "produto": {
+                "id": linha.id,
+                "nome": linha.nome,
+                "descricao": linha.descricao
+            },
+            "quantidade_vendida": linha.quantidade_vendida or Decimal('0'),
+            "receita_total": linha.receita_total or Decimal('0'),
+            "custo_total": linha.custo_total or Decimal('0'),
+            "lucro_bruto": linha.lucro_bruto or Decimal('0'),
+            "vendas": int(linha.vendas or 0)
+        }
+        if periodo:
+            dados["periodo"] = linha.periodo
+        if por_cliente:
+            dados["cliente"] = {"id": linha.cliente_id, "nome": linha.cliente_nome} if linha.cliente_id else None
+        produtos_rentabilidade.append(dados)
 
     # Calcular margens
-    for dados in produtos_rentabilidade.values():
+    for dados in produtos_rentabilidade:
         if dados["receita_total"] > 0:
             dados["margem_bruta"] = (dados["lucro_bruto"] / dados["receita_total"]) * 100
         else:
             dados["margem_bruta"] = Decimal('0')
 
     # Totais gerais
-    total_vendas = sum(p["receita_total"] for p in produtos_rentabilidade.values())
-    total_custos = sum(p["custo_total"] for p in produtos_rentabilidade.values())
-    lucro_bruto_total = sum(p["lucro_bruto"] for p in produtos_rentabilidade.values())
+    total_vendas = sum(p["receita_total"] for p in produtos_rentabilidade)
+    total_custos = sum(p["custo_total"] for p in produtos_rentabilidade)
+    lucro_bruto_total = sum(p["lucro_bruto"] for p in produtos_rentabilidade)
     margem_bruta_geral = (lucro_bruto_total / total_vendas * 100) if total_vendas > 0 else Decimal('0')
 
     return {
@@ -657,9 +939,9 @@ async def obter_rentabilidade(
                 "total_custos": total_custos,
                 "lucro_bruto_total": lucro_bruto_total,
                 "margem_bruta_geral": margem_bruta_geral,
-                "produtos_vendidos": len(produtos_rentabilidade)
+                "produtos_vendidos": len({p["produto"]["id"] for p in produtos_rentabilidade})
             },
-            "produtos": list(produtos_rentabilidade.values())
+            "produtos": produtos_rentabilidade
         },
         "message": "Relatório de rentabilidade gerado com sucesso",
         "success": True
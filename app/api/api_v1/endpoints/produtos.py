@@ -2,64 +2,97 @@ import os
 from fastapi.responses import FileResponse
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.core.deps import get_current_user, get_current_admin_user
 from app.models.produto import Produto
 from app.models.usuario import Usuario
-from app.schemas.produto import Produto as ProdutoSchema, ProdutoCreate, ProdutoUpdate
-from app.utils.upload import process_and_upload_image, delete_image_from_gdrive
+from app.schemas.produto import Produto as ProdutoSchema, ProdutoCreate, ProdutoUpdate, ProdutoUsoRequest
+from app.services.alertas_estoque import AlertaEstoqueService
+from app.services.autocomplete import autocomplete_produtos
+from app.services.busca import BuscaService
+from app.services.fifo_ledger import fifo_ledger
+from app.services.uso_referencial import UsoReferencialService
+from app.utils.upload import process_and_upload_image, delete_image_from_gdrive, save_upload_file
+from app.utils.paginacao import contar, pagina_por_cursor, paginacao_cursor, paginacao_offset
+from app.utils.cache_respostas import invalidar_cache
 
 PASTA_IMAGENS = "public"
 router = APIRouter()
 
+# Ordem estável para a paginação por cursor
+ORDEM_PRODUTOS = [(Produto.id, False)]
+
 @router.get("/", response_model=dict)
 async def listar_produtos(
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
     limit: int = Query(20, ge=1, le=100, description="Número de registros por página"),
-    nome: Optional[str] = Query(None, description="Filtrar por nome"),
+    nome: Optional[str] = Query(None, description="Filtrar por nome (trechos, sem diferenciar acentos)"),
     ativo: Optional[bool] = Query(None, description="Filtrar por status ativo"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (vazio inicia a paginação por cursor)"),
+    incluir_total: bool = Query(True, description="Calcular o total exato de registros (em modo cursor, só na primeira página)"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Listar produtos com filtros e paginação"""
-    query = db.query(Produto)
+    query = select(Produto)
     
-    # Filtrar por nome
+    # Filtrar por nome (índices de busca, ver app/services/busca.py)
     if nome:
-        query = query.filter(Produto.nome.ilike(f"%{nome}%"))
+        query = query.where(await db.run_sync(lambda sessao: BuscaService(sessao).filtro_produtos(nome)))
     
     if ativo is not None:
-        query = query.filter(Produto.ativo == ativo)
-    
-    # Get total count
-    total = query.count()
+        query = query.where(Produto.ativo == ativo)
     
-    # Apply pagination
-    produtos = query.offset(skip).limit(limit).all()
+    if cursor is not None:
+        # Paginação por cursor (keyset)
+        total = await contar(db, query) if incluir_total and not cursor else None
+        produtos, proximo_cursor = await pagina_por_cursor(db, query, ORDEM_PRODUTOS, cursor, limit)
+        paginacao = paginacao_cursor(limit, proximo_cursor, total)
+    else:
+        # Get total count
+        total = await contar(db, query) if incluir_total else None
+        
+        # Apply pagination
+        produtos = (await db.scalars(query.offset(skip).limit(limit))).all()
+        paginacao = paginacao_offset(skip, limit, total)
     
     return {
         "data": {
             "items": [ProdutoSchema.from_orm(produto) for produto in produtos],
-            "paginacao": {
-                "pagina": (skip // limit) + 1,
-                "itensPorPagina": limit,
-                "totalItens": total,
-                "totalPaginas": (total + limit - 1) // limit
-            }
+            "paginacao": paginacao
         },
         "message": "Produtos listados com sucesso",
         "success": True
     }
 
+@router.get("/autocomplete", response_model=dict)
+async def sugerir_produtos(
+    nome: str = Query(..., min_length=1, description="Início do nome ou de uma palavra do nome"),
+    limit: int = Query(10, ge=1, le=50, description="Número máximo de sugestões"),
+    incluir_inativos: bool = Query(False, description="Incluir produtos inativos"),
+    current_user: Usuario = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Sugestões de produtos durante a digitação (índice em memória, sem consulta ao banco)"""
+    if not autocomplete_produtos.carregado:
+        await db.run_sync(autocomplete_produtos.carregar)
+    
+    return {
+        "data": autocomplete_produtos.buscar(nome, limit, incluir_inativos),
+        "message": "Sugestões de produtos obtidas com sucesso",
+        "success": True
+    }
+
 @router.get("/{produto_id}", response_model=dict)
 async def obter_produto(
     produto_id: int,
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Obter produto por ID"""
-    produto = db.query(Produto).filter(Produto.id == produto_id).first()
+    produto = await db.get(Produto, produto_id)
     if not produto:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -76,13 +109,13 @@ async def obter_produto(
 async def criar_produto(
     produto: ProdutoCreate,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Criar novo produto (apenas administradores)"""
     # Check if produto already exists by nome
-    existing_produto = db.query(Produto).filter(
-        Produto.nome.ilike(produto.nome)
-    ).first()
+    existing_produto = await db.scalar(
+        select(Produto).where(Produto.nome.ilike(produto.nome)).limit(1)
+    )
     
     if existing_produto:
         raise HTTPException(
@@ -101,8 +134,13 @@ async def criar_produto(
         imagem=getattr(produto, 'imagem', None)
     )
     db.add(db_produto)
-    db.commit()
-    db.refresh(db_produto)
+    await db.flush()
+    # Produto novo ainda não tem inventário: entra nos alertas
+    await db.run_sync(lambda sessao: AlertaEstoqueService(sessao).atualizar([db_produto.id]))
+    await db.commit()
+    await invalidar_cache("produtos")
+    await db.refresh(db_produto)
+    autocomplete_produtos.atualizar(db_produto)
     
     return {
         "data": ProdutoSchema.from_orm(db_produto),
@@ -115,10 +153,10 @@ async def atualizar_produto(
     produto_id: int,
     produto_update: ProdutoUpdate,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Atualizar produto (apenas administradores)"""
-    produto = db.query(Produto).filter(Produto.id == produto_id).first()
+    produto = await db.get(Produto, produto_id)
     if not produto:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -127,10 +165,12 @@ async def atualizar_produto(
     
     # Check if new nome already exists (if provided)
     if produto_update.nome and produto_update.nome != produto.nome:
-        existing_produto = db.query(Produto).filter(
-            Produto.nome.ilike(produto_update.nome),
-            Produto.id != produto_id
-        ).first()
+        existing_produto = await db.scalar(
+            select(Produto).where(
+                Produto.nome.ilike(produto_update.nome),
+                Produto.id != produto_id
+            ).limit(1)
+        )
         
         if existing_produto:
             raise HTTPException(
@@ -143,8 +183,12 @@ async def atualizar_produto(
     for field, value in update_data.items():
         setattr(produto, field, value)
     
-    db.commit()
-    db.refresh(produto)
+    if "estoque_minimo" in update_data:
+        await db.run_sync(lambda sessao: AlertaEstoqueService(sessao).atualizar([produto_id]))
+    await db.commit()
+    await invalidar_cache("produtos")
+    await db.refresh(produto)
+    autocomplete_produtos.atualizar(produto)
     
     return {
         "data": ProdutoSchema.from_orm(produto),
@@ -157,10 +201,10 @@ async def atualizar_imagem_produto(
     produto_id: int,
     imagem_url: str,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Atualizar apenas a URL da imagem do produto (apenas administradores)"""
-    produto = db.query(Produto).filter(Produto.id == produto_id).first()
+    produto = await db.get(Produto, produto_id)
     if not produto:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -168,8 +212,8 @@ async def atualizar_imagem_produto(
         )
     # Atualiza a URL da imagem
     produto.imagem = imagem_url
-    db.commit()
-    db.refresh(produto)
+    await db.commit()
+    await db.refresh(produto)
     return {
         "data": ProdutoSchema.from_orm(produto),
         "message": "Imagem do produto atualizada com sucesso",
@@ -180,51 +224,19 @@ async def atualizar_imagem_produto(
 async def excluir_produto(
     produto_id: int,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Excluir produto (apenas administradores)"""
-    from app.models.estoque import EntradaEstoque, Inventario, EstoqueFifo, MovimentacaoCaixa, LucroBruto
-    from app.models.venda import ItemVenda
-    
-    produto = db.query(Produto).filter(Produto.id == produto_id).first()
+    produto = await db.get(Produto, produto_id)
     if not produto:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Produto não encontrado"
         )
     
-    # Verificar se o produto possui dependências
-    dependencies = []
-    
-    # Verificar entradas de estoque
-    entradas_count = db.query(EntradaEstoque).filter(EntradaEstoque.produto_id == produto_id).count()
-    if entradas_count > 0:
-        dependencies.append(f"entradas de estoque ({entradas_count})")
-    
-    # Verificar itens de venda
-    itens_venda_count = db.query(ItemVenda).filter(ItemVenda.produto_id == produto_id).count()
-    if itens_venda_count > 0:
-        dependencies.append(f"itens de venda ({itens_venda_count})")
-    
-    # Verificar inventário
-    inventario_count = db.query(Inventario).filter(Inventario.produto_id == produto_id).count()
-    if inventario_count > 0:
-        dependencies.append(f"registros de inventário ({inventario_count})")
-    
-    # Verificar estoque FIFO
-    fifo_count = db.query(EstoqueFifo).filter(EstoqueFifo.produto_id == produto_id).count()
-    if fifo_count > 0:
-        dependencies.append(f"registros FIFO ({fifo_count})")
-    
-    # Verificar movimentações de caixa
-    movimentacoes_count = db.query(MovimentacaoCaixa).filter(MovimentacaoCaixa.produto_id == produto_id).count()
-    if movimentacoes_count > 0:
-        dependencies.append(f"movimentações de caixa ({movimentacoes_count})")
-    
-    # Verificar lucros brutos
-    lucros_count = db.query(LucroBruto).filter(LucroBruto.produto_id == produto_id).count()
-    if lucros_count > 0:
-        dependencies.append(f"registros de lucro ({lucros_count})")
+    # Verificar se o produto possui dependências (uma consulta para todas as tabelas)
+    usos = await db.run_sync(lambda sessao: UsoReferencialService(sessao).usos_produtos([produto_id]))
+    dependencies = usos[produto_id]
     
     # Se houver dependências, retornar erro informativo
     if dependencies:
@@ -236,16 +248,58 @@ async def excluir_produto(
     
     # Delete image from Google Drive if exists
     if produto.imagem:
-        delete_image_from_gdrive(produto.imagem)
+        await delete_image_from_gdrive(produto.imagem)
     
-    db.delete(produto)
-    db.commit()
+    await db.run_sync(lambda sessao: AlertaEstoqueService(sessao).remover_produto(produto_id))
+    await db.run_sync(lambda sessao: fifo_ledger.remover_produto(sessao, produto_id))
+    await db.delete(produto)
+    await db.commit()
+    await invalidar_cache("produtos")
+    autocomplete_produtos.remover(produto_id)
     
     return {
         "message": "Produto excluído com sucesso",
         "success": True
     }
 
+@router.post("/usage", response_model=dict)
+async def verificar_uso_produtos(
+    dados: ProdutoUsoRequest,
+    current_user: Usuario = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Verificar em lote se produtos são referenciados (e onde)
+    
+    Usado na limpeza do catálogo: uma consulta responde para todos os IDs
+    quais podem ser excluídos e, para os demais, quais registros impedem.
+    """
+    existentes = set(await db.scalars(select(Produto.id).where(Produto.id.in_(dados.ids))))
+    usos = await db.run_sync(lambda sessao: UsoReferencialService(sessao).usos_produtos(existentes))
+    
+    produtos = [
+        {
+            "produto_id": produto_id,
+            "em_uso": bool(usos[produto_id]),
+            "referencias": usos[produto_id]
+        }
+        for produto_id in sorted(existentes)
+    ]
+    nao_encontrados = sorted(set(dados.ids) - existentes)
+    
+    return {
+        "data": {
+            "produtos": produtos,
+            "nao_encontrados": nao_encontrados,
+            "resumo": {
+                "em_uso": sum(1 for produto in produtos if produto["em_uso"]),
+                "livres": sum(1 for produto in produtos if not produto["em_uso"])
+            }
+        },
+        "message": f"Uso verificado para {len(produtos)} produtos",
+        "success": True
+    }
+
 @router.post("/imagem/", response_model=dict)
 async def upload_imagem_produto(
     produto_id: int = Form(...),
@@ -259,8 +313,10 @@ async def upload_imagem_produto(
     if not os.path.exists(PASTA_IMAGENS):
         os.makedirs(PASTA_IMAGENS)
     caminho = os.path.join(PASTA_IMAGENS, f"{produto_id}{extensao}")
-    with open(caminho, "wb") as buffer:
-        buffer.write(await file.read())
+    # Grava em blocos num arquivo temporário; a imagem anterior só é trocada com o envio completo
+    temporario = f"{caminho}.parcial"
+    await save_upload_file(file, temporario)
+    os.replace(temporario, caminho)
     return {
         "message": "Imagem enviada com sucesso",
         "filename": f"{produto_id}{extensao}",
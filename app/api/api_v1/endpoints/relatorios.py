@@ -1,17 +1,20 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, desc, case, text
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, desc, case, extract, select
 from decimal import Decimal
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 
 from app.core.database import get_db
 from app.core.deps import get_current_user, get_current_admin_user
-from app.models.venda import Venda, ItemVenda
+from app.models.venda import Venda, ItemVenda, VendaDiaria, SaldoCliente
+from app.models.carregamento import VENDA_COM_ITENS
 from app.core.enums import SituacaoPedido, SituacaoPagamento
 from app.models.cliente import Cliente
 from app.models.produto import Produto
 from app.models.usuario import Usuario
+from app.utils.cache_respostas import cache_resposta
+from app.utils.exportacao import FormatoExportacao, linhas_do_banco, resposta_exportacao
 
 router = APIRouter()
 
@@ -19,96 +22,117 @@ router = APIRouter()
 async def pagamentos_pendentes_por_cliente(
     cliente_id: Optional[int] = Query(None, description="Filtrar por cliente específico"),
     ordenar_por: str = Query("valor_desc", description="Ordenar por: valor_desc, valor_asc, data_desc, data_asc"),
+    incluir_vendas: bool = Query(True, description="Incluir as vendas de cada cliente (false: só os saldos)"),
+    formato: Optional[FormatoExportacao] = Query(None, alias="format", description="Exportar em csv, xlsx ou ndjson (streaming) em vez de JSON"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     📋 Relatório de Pagamentos Pendentes por Cliente
     
     Mostra todas as vendas que ainda não foram pagas, agrupadas por cliente
     com totais e detalhes de cada venda pendente.
+    
+    Os totais vêm de `saldos_clientes`, mantida junto com as vendas; com
+    `incluir_vendas=false` o relatório não consulta a tabela de vendas.
     """
     
-    # Query base para vendas pendentes
-    query = db.query(Venda).filter(
-        Venda.situacao_pagamento == SituacaoPagamento.PENDENTE
-    )
+    # Filtros base para vendas pendentes
+    filtros = [Venda.situacao_pagamento == SituacaoPagamento.PENDENTE]
     
     # Filtrar por cliente se especificado
     if cliente_id:
-        cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+        cliente = await db.get(Cliente, cliente_id)
         if not cliente:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Cliente não encontrado"
             )
-        query = query.filter(Venda.cliente_id == cliente_id)
+        filtros.append(Venda.cliente_id == cliente_id)
     
     # Aplicar ordenação
-    if ordenar_por == "valor_desc":
-        query = query.order_by(desc(Venda.total_venda))
-    elif ordenar_por == "valor_asc":
-        query = query.order_by(Venda.total_venda)
-    elif ordenar_por == "data_desc":
-        query = query.order_by(desc(Venda.data_venda))
-    elif ordenar_por == "data_asc":
-        query = query.order_by(Venda.data_venda)
+    ordenacao = {
+        "valor_desc": [desc(Venda.total_venda)],
+        "valor_asc": [Venda.total_venda],
+        "data_desc": [desc(Venda.data_venda)],
+        "data_asc": [Venda.data_venda]
+    }.get(ordenar_por, [])
+    
+    if formato:
+        # Uma linha por venda pendente, lida do banco em streaming
+        consulta = select(
+            Venda.id, Venda.data_venda, Cliente.id, Cliente.nome, Cliente.nome_fantasia,
+            Venda.total_venda, Venda.lucro_bruto_total, Venda.custo_total, Venda.observacoes
+        ).outerjoin(Cliente, Cliente.id == Venda.cliente_id).where(*filtros).order_by(*ordenacao)
+        agora = datetime.now()
+        return resposta_exportacao(
+            formato,
+            "pagamentos_pendentes",
+            ["venda_id", "data_venda", "cliente_id", "cliente", "nome_fantasia", "total_venda",
+             "lucro_bruto_total", "custo_total", "observacoes", "dias_pendente"],
+            linhas_do_banco(consulta, lambda linha: (
+                *linha[:9],
+                (agora - linha.data_venda).days
+            ))
+        )
     
-    vendas_pendentes = query.all()
+    # Totais por cliente direto de saldos_clientes (uma linha por cliente)
+    filtros_saldo = [SaldoCliente.vendas_pendentes > 0]
+    if cliente_id:
+        filtros_saldo.append(SaldoCliente.cliente_id == cliente_id)
+    saldos = (await db.execute(
+        select(SaldoCliente, Cliente)
+        .join(Cliente, Cliente.id == SaldoCliente.cliente_id)
+        .where(*filtros_saldo)
+        .order_by(desc(SaldoCliente.valor_pendente), SaldoCliente.cliente_id)
+    )).all()
     
-    # Agrupar por cliente
     clientes_pendentes = {}
-    total_geral_pendente = Decimal('0.00')
-    
-    for venda in vendas_pendentes:
-        cliente_id = venda.cliente_id
-        if cliente_id not in clientes_pendentes:
-            clientes_pendentes[cliente_id] = {
-                "cliente": {
-                    "id": venda.cliente.id,
-                    "nome": venda.cliente.nome,
-                    "nome_fantasia": venda.cliente.nome_fantasia,
-                    "email": venda.cliente.email,
-                    "telefone1": venda.cliente.telefone1
-                },
-                "vendas_pendentes": [],
-                "total_pendente": Decimal('0.00'),
-                "quantidade_vendas": 0,
-                "lucro_bruto_total": Decimal('0.00'),
-                "custo_total": Decimal('0.00')
-            }
-        clientes_pendentes[cliente_id]["vendas_pendentes"].append({
-            "id": venda.id,
-            "data_venda": venda.data_venda,
-            "total_venda": float(venda.total_venda),
-            "lucro_bruto_total": float(getattr(venda, 'lucro_bruto_total', 0) or 0),
-            "custo_total": float(sum([item.custo * item.quantidade for item in venda.itens]) if hasattr(venda, 'itens') else 0),
-            "observacoes": venda.observacoes,
-            "dias_pendente": (datetime.now() - venda.data_venda).days
-        })
-        clientes_pendentes[cliente_id]["total_pendente"] += venda.total_venda
-        clientes_pendentes[cliente_id]["quantidade_vendas"] += 1
-        clientes_pendentes[cliente_id]["lucro_bruto_total"] += getattr(venda, 'lucro_bruto_total', 0) or 0
-        clientes_pendentes[cliente_id]["custo_total"] += sum([item.custo * item.quantidade for item in venda.itens]) if hasattr(venda, 'itens') else 0
-        total_geral_pendente += venda.total_venda
+    for saldo, cliente in saldos:
+        clientes_pendentes[cliente.id] = {
+            "cliente": {
+                "id": cliente.id,
+                "nome": cliente.nome,
+                "nome_fantasia": cliente.nome_fantasia,
+                "email": cliente.email,
+                "telefone1": cliente.telefone1
+            },
+            "vendas_pendentes": [],
+            "total_pendente": float(saldo.valor_pendente),
+            "quantidade_vendas": saldo.vendas_pendentes,
+            "lucro_bruto_total": float(saldo.lucro_bruto_pendente),
+            "custo_total": float(saldo.custo_pendente)
+        }
+    
+    if incluir_vendas and clientes_pendentes:
+        # Detalhe das vendas em uma consulta de colunas, sem carregar itens
+        agora = datetime.now()
+        vendas_pendentes = await db.execute(
+            select(
+                Venda.id, Venda.cliente_id, Venda.data_venda, Venda.total_venda,
+                Venda.lucro_bruto_total, Venda.custo_total, Venda.observacoes
+            ).where(*filtros, Venda.cliente_id.in_(list(clientes_pendentes))).order_by(*ordenacao)
+        )
+        for venda in vendas_pendentes:
+            clientes_pendentes[venda.cliente_id]["vendas_pendentes"].append({
+                "id": venda.id,
+                "data_venda": venda.data_venda,
+                "total_venda": float(venda.total_venda),
+                "lucro_bruto_total": float(venda.lucro_bruto_total or 0),
+                "custo_total": float(venda.custo_total or 0),
+                "observacoes": venda.observacoes,
+                "dias_pendente": (agora - venda.data_venda).days
+            })
     
-    # Converter para lista e ordenar por total pendente
     resultado = list(clientes_pendentes.values())
-    resultado.sort(key=lambda x: x["total_pendente"], reverse=True)
-    
-    # Converter Decimal para float para serialização
-    for cliente in resultado:
-        cliente["total_pendente"] = float(cliente["total_pendente"])
-        cliente["lucro_bruto_total"] = float(cliente["lucro_bruto_total"])
-        cliente["custo_total"] = float(cliente["custo_total"])
     
     return {
         "data": {
             "clientes": resultado,
             "resumo": {
-                "total_geral_pendente": float(total_geral_pendente),
+                "total_geral_pendente": sum(cliente["total_pendente"] for cliente in resultado),
                 "quantidade_clientes": len(resultado),
-                "quantidade_vendas_pendentes": len(vendas_pendentes)
+                "quantidade_vendas_pendentes": sum(cliente["quantidade_vendas"] for cliente in resultado)
             }
         },
         "message": "Relatório de pagamentos pendentes gerado com sucesso",
@@ -123,8 +147,9 @@ async def historico_vendas_cliente(
     situacao_pagamento: Optional[SituacaoPagamento] = Query(None, description="Filtrar por situação do pagamento"),
     skip: int = Query(0, ge=0, description="Registros para pular"),
     limit: int = Query(50, ge=1, le=100, description="Registros por página"),
+    formato: Optional[FormatoExportacao] = Query(None, alias="format", description="Exportar em csv, xlsx ou ndjson (streaming) em vez de JSON; exporta todas as vendas, sem paginação"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     📈 Histórico Completo de Vendas por Cliente
@@ -134,48 +159,60 @@ async def historico_vendas_cliente(
     """
     
     # Verificar se cliente existe
-    cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+    cliente = await db.get(Cliente, cliente_id)
     if not cliente:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cliente não encontrado"
         )
     
-    # Query base
-    query = db.query(Venda).filter(Venda.cliente_id == cliente_id)
+    # Filtros base
+    filtros = [Venda.cliente_id == cliente_id]
     
     # Aplicar filtros de data
     if data_inicio:
-        query = query.filter(Venda.data_venda >= data_inicio)
+        filtros.append(Venda.data_venda >= data_inicio)
     if data_fim:
-        query = query.filter(Venda.data_venda <= data_fim)
+        filtros.append(Venda.data_venda <= data_fim)
     
     # Filtrar por situação de pagamento
     if situacao_pagamento:
-        query = query.filter(Venda.situacao_pagamento == situacao_pagamento)
+        filtros.append(Venda.situacao_pagamento == situacao_pagamento)
+    
+    if formato:
+        quantidade_itens = select(func.count(ItemVenda.id)).where(
+            ItemVenda.venda_id == Venda.id
+        ).correlate(Venda).scalar_subquery()
+        consulta = select(
+            Venda.id, Venda.data_venda, Venda.total_venda, Venda.situacao_pagamento,
+            Venda.observacoes, quantidade_itens
+        ).where(*filtros).order_by(desc(Venda.data_venda), desc(Venda.id))
+        return resposta_exportacao(
+            formato,
+            f"historico_vendas_cliente_{cliente_id}",
+            ["venda_id", "data_venda", "total_venda", "situacao_pagamento", "observacoes", "quantidade_itens"],
+            linhas_do_banco(consulta, tuple)
+        )
     
     # Contar total antes da paginação
-    total_vendas = query.count()
+    total_vendas = await db.scalar(select(func.count(Venda.id)).where(*filtros))
     
     # Aplicar paginação e ordenação
-    vendas = query.order_by(desc(Venda.data_venda)).offset(skip).limit(limit).all()
+    vendas = (await db.scalars(
+        select(Venda).options(*VENDA_COM_ITENS).where(*filtros)
+        .order_by(desc(Venda.data_venda)).offset(skip).limit(limit)
+    )).all()
     
     # Calcular estatísticas
-    query_stats = db.query(Venda).filter(Venda.cliente_id == cliente_id)
-    if data_inicio:
-        query_stats = query_stats.filter(Venda.data_venda >= data_inicio)
-    if data_fim:
-        query_stats = query_stats.filter(Venda.data_venda <= data_fim)
-    if situacao_pagamento:
-        query_stats = query_stats.filter(Venda.situacao_pagamento == situacao_pagamento)
-    
-    estatisticas = query_stats.with_entities(
-        func.sum(Venda.total_venda).label('total_vendido'),
-        func.avg(Venda.total_venda).label('ticket_medio'),
-        func.count(Venda.id).label('quantidade_vendas'),
-        func.sum(case((Venda.situacao_pagamento == SituacaoPagamento.PENDENTE, Venda.total_venda), else_=0)).label('total_pendente'),
-        func.sum(case((Venda.situacao_pagamento == SituacaoPagamento.PAGO, Venda.total_venda), else_=0)).label('total_pago')
-    ).first()
+    estatisticas = (await db.execute(
+        select(
+            func.sum(Venda.total_venda).label('total_vendido'),
+            func.avg(Venda.total_venda).label('ticket_medio'),
+            func.count(Venda.id).label('quantidade_vendas'),
+            func.sum(case((Venda.situacao_pagamento == SituacaoPagamento.PENDENTE, Venda.total_venda), else_=0)).label('total_pendente'),
+            func.sum(case((Venda.situacao_pagamento == SituacaoPagamento.PAGO, Venda.total_venda), else_=0)).label('total_pago')
+        ).where(*filtros)
+    )).first()
     
     # Formatar vendas para resposta (sem separação)
     vendas_formatadas = []
@@ -218,10 +255,12 @@ async def historico_vendas_cliente(
     }
 
 @router.get("/resumo-financeiro/{cliente_id}", response_model=dict)
+@cache_resposta("vendas", "clientes", "produtos")
 async def resumo_financeiro_cliente(
+    request: Request,
     cliente_id: int,
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     💰 Resumo Financeiro Completo por Cliente
@@ -234,54 +273,74 @@ async def resumo_financeiro_cliente(
     """
     
     # Verificar se cliente existe
-    cliente = db.query(Cliente).filter(Cliente.id == cliente_id).first()
+    cliente = await db.get(Cliente, cliente_id)
     if not cliente:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cliente não encontrado"
         )
     
-    # Estatísticas gerais
-    stats_gerais = db.query(
-        func.sum(Venda.total_venda).label('total_historico'),
-        func.avg(Venda.total_venda).label('ticket_medio'),
-        func.count(Venda.id).label('total_vendas'),
-        func.sum(case((Venda.situacao_pagamento == SituacaoPagamento.PENDENTE, Venda.total_venda), else_=0)).label('total_pendente'),
-        func.sum(case((Venda.situacao_pagamento == SituacaoPagamento.PAGO, Venda.total_venda), else_=0)).label('total_pago'),
-        func.min(Venda.data_venda).label('primeira_compra'),
-        func.max(Venda.data_venda).label('ultima_compra')
-    ).filter(Venda.cliente_id == cliente_id).first()
+    # Estatísticas gerais (rollup diário)
+    stats_gerais = (await db.execute(
+        select(
+            func.sum(VendaDiaria.valor_total).label('total_historico'),
+            func.sum(VendaDiaria.vendas).label('total_vendas'),
+            func.sum(VendaDiaria.valor_pendente).label('total_pendente')
+        ).where(VendaDiaria.cliente_id == cliente_id)
+    )).first()
+    total_historico = stats_gerais.total_historico or Decimal('0')
+    total_vendas = int(stats_gerais.total_vendas or 0)
+    total_pendente = stats_gerais.total_pendente or Decimal('0')
+    
+    # Primeira e última compra (min/max pelo índice de cliente + data)
+    datas_compra = (await db.execute(
+        select(
+            func.min(Venda.data_venda).label('primeira_compra'),
+            func.max(Venda.data_venda).label('ultima_compra')
+        ).where(Venda.cliente_id == cliente_id)
+    )).first()
     
     # Produtos mais comprados
-    produtos_mais_comprados = db.query(
-        Produto.nome,
-        func.sum(ItemVenda.quantidade).label('quantidade_total'),
-        func.sum(ItemVenda.valor_total_produto).label('valor_total'),
-        func.count(ItemVenda.id).label('vezes_comprado')
-    ).join(ItemVenda, Produto.id == ItemVenda.produto_id)\
-     .join(Venda, ItemVenda.venda_id == Venda.id)\
-     .filter(Venda.cliente_id == cliente_id)\
-     .group_by(Produto.id, Produto.nome)\
-     .order_by(desc(func.sum(ItemVenda.valor_total_produto)))\
-     .limit(10).all()
+    produtos_mais_comprados = (await db.execute(
+        select(
+            Produto.nome,
+            func.sum(VendaDiaria.quantidade).label('quantidade_total'),
+            func.sum(VendaDiaria.valor_total).label('valor_total'),
+            func.sum(VendaDiaria.itens).label('vezes_comprado')
+        ).join(VendaDiaria, Produto.id == VendaDiaria.produto_id)
+        .where(VendaDiaria.cliente_id == cliente_id)
+        .group_by(Produto.id, Produto.nome)
+        .order_by(desc(func.sum(VendaDiaria.valor_total)))
+        .limit(10)
+    )).all()
     
     # Evolução mensal (últimos 12 meses)
-    evolucao_mensal = db.query(
-        func.date_format(Venda.data_venda, '%Y-%m').label('mes'),
-        func.sum(Venda.total_venda).label('total_mes'),
-        func.count(Venda.id).label('vendas_mes')
-    ).filter(Venda.cliente_id == cliente_id)\
-     .filter(Venda.data_venda >= func.date_sub(func.now(), text('INTERVAL 12 MONTH')))\
-     .group_by(func.date_format(Venda.data_venda, '%Y-%m'))\
-     .order_by(func.date_format(Venda.data_venda, '%Y-%m')).all()
+    hoje = date.today()
+    indice_inicio = hoje.year * 12 + hoje.month - 1 - 11
+    inicio_evolucao = date(indice_inicio // 12, indice_inicio % 12 + 1, 1)
+    ano_col = extract('year', VendaDiaria.data).label('ano')
+    mes_col = extract('month', VendaDiaria.data).label('mes')
+    evolucao_mensal = (await db.execute(
+        select(
+            ano_col,
+            mes_col,
+            func.sum(VendaDiaria.valor_total).label('total_mes'),
+            func.sum(VendaDiaria.vendas).label('vendas_mes')
+        ).where(VendaDiaria.cliente_id == cliente_id)
+        .where(VendaDiaria.data >= inicio_evolucao)
+        .group_by(ano_col, mes_col)
+        .order_by(ano_col, mes_col)
+    )).all()
     
     # Últimas vendas não pagas
-    vendas_pendentes = db.query(Venda).filter(
-        and_(
-            Venda.cliente_id == cliente_id,
-            Venda.situacao_pagamento == SituacaoPagamento.PENDENTE
-        )
-    ).order_by(desc(Venda.data_venda)).limit(5).all()
+    vendas_pendentes = (await db.scalars(
+        select(Venda).where(
+            and_(
+                Venda.cliente_id == cliente_id,
+                Venda.situacao_pagamento == SituacaoPagamento.PENDENTE
+            )
+        ).order_by(desc(Venda.data_venda)).limit(5)
+    )).all()
     
     return {
         "data": {
@@ -294,29 +353,29 @@ async def resumo_financeiro_cliente(
                 "ativo": cliente.ativo
             },
             "estatisticas_gerais": {
-                "total_historico": float(stats_gerais.total_historico or 0),
-                "ticket_medio": float(stats_gerais.ticket_medio or 0),
-                "total_vendas": stats_gerais.total_vendas or 0,
-                "total_pendente": float(stats_gerais.total_pendente or 0),
-                "total_pago": float(stats_gerais.total_pago or 0),
-                "primeira_compra": stats_gerais.primeira_compra,
-                "ultima_compra": stats_gerais.ultima_compra,
-                "percentual_inadimplencia": float((stats_gerais.total_pendente or 0) / (stats_gerais.total_historico or 1) * 100)
+                "total_historico": float(total_historico),
+                "ticket_medio": float(total_historico / total_vendas) if total_vendas else 0.0,
+                "total_vendas": total_vendas,
+                "total_pendente": float(total_pendente),
+                "total_pago": float(total_historico - total_pendente),
+                "primeira_compra": datas_compra.primeira_compra,
+                "ultima_compra": datas_compra.ultima_compra,
+                "percentual_inadimplencia": float(total_pendente / (total_historico or 1) * 100)
             },
             "produtos_favoritos": [
                 {
                     "nome": produto.nome,
                     "quantidade_total": float(produto.quantidade_total),
                     "valor_total": float(produto.valor_total),
-                    "vezes_comprado": produto.vezes_comprado
+                    "vezes_comprado": int(produto.vezes_comprado or 0)
                 }
                 for produto in produtos_mais_comprados
             ],
             "evolucao_mensal": [
                 {
-                    "mes": evolucao.mes,
+                    "mes": f"{int(evolucao.ano):04d}-{int(evolucao.mes):02d}",
                     "total_vendido": float(evolucao.total_mes),
-                    "quantidade_vendas": evolucao.vendas_mes
+                    "quantidade_vendas": int(evolucao.vendas_mes or 0)
                 }
                 for evolucao in evolucao_mensal
             ],
@@ -336,11 +395,14 @@ async def resumo_financeiro_cliente(
     }
 
 @router.get("/dashboard-vendas", response_model=dict)
+@cache_resposta("vendas", "clientes", "produtos")
 async def dashboard_vendas_periodo(
+    request: Request,
     data_inicio: Optional[date] = Query(None, description="Data inicial (YYYY-MM-DD)"),
     data_fim: Optional[date] = Query(None, description="Data final (YYYY-MM-DD)"),
+    formato: Optional[FormatoExportacao] = Query(None, alias="format", description="Exportar em csv, xlsx ou ndjson (streaming) com a série diária do período em vez de JSON"),
     current_user: Usuario = Depends(get_current_admin_user),  # Só admin pode ver dashboard geral
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     📊 Dashboard Geral de Vendas por Período
@@ -353,56 +415,71 @@ async def dashboard_vendas_periodo(
     - Indicadores de inadimplência
     """
     
-    # Query base com filtros de data
-    query_base = db.query(Venda)
+    # KPIs principais a partir do rollup diário (dias inclusivos)
+    filtros_periodo = []
     if data_inicio:
-        query_base = query_base.filter(Venda.data_venda >= data_inicio)
+        filtros_periodo.append(VendaDiaria.data >= data_inicio)
     if data_fim:
-        query_base = query_base.filter(Venda.data_venda <= data_fim)
+        filtros_periodo.append(VendaDiaria.data <= data_fim)
+    
+    if formato:
+        # Série diária do rollup: uma linha por dia do período
+        consulta = select(
+            VendaDiaria.data,
+            func.sum(VendaDiaria.vendas),
+            func.sum(VendaDiaria.itens),
+            func.sum(VendaDiaria.valor_total),
+            func.sum(VendaDiaria.valor_pendente),
+            func.sum(VendaDiaria.custo_total),
+            func.sum(VendaDiaria.lucro_bruto)
+        ).where(*filtros_periodo).group_by(VendaDiaria.data).order_by(VendaDiaria.data)
+        return resposta_exportacao(
+            formato,
+            "dashboard_vendas",
+            ["data", "vendas", "itens", "valor_total", "valor_pendente", "custo_total", "lucro_bruto"],
+            linhas_do_banco(consulta, tuple)
+        )
     
-    # KPIs principais (sem separação)
-    kpis = query_base.with_entities(
-        func.sum(Venda.total_venda).label('faturamento_total'),
-        func.avg(Venda.total_venda).label('ticket_medio'),
-        func.count(Venda.id).label('total_vendas'),
-        func.sum(case((Venda.situacao_pagamento == SituacaoPagamento.PAGO, Venda.total_venda), else_=0)).label('total_pago'),
-        func.sum(case((Venda.situacao_pagamento == SituacaoPagamento.PENDENTE, Venda.total_venda), else_=0)).label('total_pendente')
-    ).first()
+    kpis = (await db.execute(
+        select(
+            func.sum(VendaDiaria.valor_total).label('faturamento_total'),
+            func.sum(VendaDiaria.vendas).label('total_vendas'),
+            func.sum(VendaDiaria.valor_pendente).label('total_pendente')
+        ).where(*filtros_periodo)
+    )).first()
+    faturamento_total = kpis.faturamento_total or Decimal('0')
+    total_vendas = int(kpis.total_vendas or 0)
+    total_pendente = kpis.total_pendente or Decimal('0')
     
     # Top 10 clientes por faturamento
-    top_clientes = db.query(
-        Cliente.nome,
-        Cliente.nome_fantasia,
-        func.sum(Venda.total_venda).label('total_comprado'),
-        func.count(Venda.id).label('quantidade_compras'),
-        func.sum(case((Venda.situacao_pagamento == SituacaoPagamento.PENDENTE, Venda.total_venda), else_=0)).label('pendente')
-    ).join(Venda, Cliente.id == Venda.cliente_id)
-    
-    if data_inicio:
-        top_clientes = top_clientes.filter(Venda.data_venda >= data_inicio)
-    if data_fim:
-        top_clientes = top_clientes.filter(Venda.data_venda <= data_fim)
-        
-    top_clientes = top_clientes.group_by(Cliente.id, Cliente.nome, Cliente.nome_fantasia)\
-                              .order_by(desc(func.sum(Venda.total_venda)))\
-                              .limit(10).all()
+    top_clientes = (await db.execute(
+        select(
+            Cliente.nome,
+            Cliente.nome_fantasia,
+            func.sum(VendaDiaria.valor_total).label('total_comprado'),
+            func.sum(VendaDiaria.vendas).label('quantidade_compras'),
+            func.sum(VendaDiaria.valor_pendente).label('pendente')
+        ).select_from(VendaDiaria)
+        .join(Cliente, Cliente.id == VendaDiaria.cliente_id)
+        .where(*filtros_periodo)
+        .group_by(Cliente.id, Cliente.nome, Cliente.nome_fantasia)
+        .order_by(desc(func.sum(VendaDiaria.valor_total)))
+        .limit(10)
+    )).all()
     
     # Top 10 produtos mais vendidos
-    top_produtos = db.query(
-        Produto.nome,
-        func.sum(ItemVenda.quantidade).label('quantidade_vendida'),
-        func.sum(ItemVenda.valor_total_produto).label('faturamento_produto')
-    ).join(ItemVenda, Produto.id == ItemVenda.produto_id)\
-     .join(Venda, ItemVenda.venda_id == Venda.id)
-    
-    if data_inicio:
-        top_produtos = top_produtos.filter(Venda.data_venda >= data_inicio)
-    if data_fim:
-        top_produtos = top_produtos.filter(Venda.data_venda <= data_fim)
-        
-    top_produtos = top_produtos.group_by(Produto.id, Produto.nome)\
-                              .order_by(desc(func.sum(ItemVenda.valor_total_produto)))\
-                              .limit(10).all()
+    top_produtos = (await db.execute(
+        select(
+            Produto.nome,
+            func.sum(VendaDiaria.quantidade).label('quantidade_vendida'),
+            func.sum(VendaDiaria.valor_total).label('faturamento_produto')
+        ).select_from(VendaDiaria)
+        .join(Produto, Produto.id == VendaDiaria.produto_id)
+        .where(*filtros_periodo)
+        .group_by(Produto.id, Produto.nome)
+        .order_by(desc(func.sum(VendaDiaria.valor_total)))
+        .limit(10)
+    )).all()
     
     # Performance de funcionários removida (sem separação)
     
@@ -414,19 +491,19 @@ async def dashboard_vendas_periodo(
                 "gerado_em": datetime.now()
             },
             "kpis": {
-                "faturamento_total": float(kpis.faturamento_total or 0),
-                "ticket_medio": float(kpis.ticket_medio or 0),
-                "total_vendas": kpis.total_vendas or 0,
-                "total_pago": float(kpis.total_pago or 0),
-                "total_pendente": float(kpis.total_pendente or 0),
-                "taxa_inadimplencia": float((kpis.total_pendente or 0) / (kpis.faturamento_total or 1) * 100)
+                "faturamento_total": float(faturamento_total),
+                "ticket_medio": float(faturamento_total / total_vendas) if total_vendas else 0.0,
+                "total_vendas": total_vendas,
+                "total_pago": float(faturamento_total - total_pendente),
+                "total_pendente": float(total_pendente),
+                "taxa_inadimplencia": float(total_pendente / (faturamento_total or 1) * 100)
             },
             "top_clientes": [
                 {
                     "nome": cliente.nome,
                     "nome_fantasia": cliente.nome_fantasia,
                     "total_comprado": float(cliente.total_comprado),
-                    "quantidade_compras": cliente.quantidade_compras,
+                    "quantidade_compras": int(cliente.quantidade_compras or 0),
                     "valor_pendente": float(cliente.pendente)
                 }
                 for cliente in top_clientes
@@ -449,52 +526,70 @@ async def clientes_inadimplentes(
     dias_minimo: int = Query(30, description="Mínimo de dias em atraso"),
     valor_minimo: Optional[float] = Query(None, description="Valor mínimo em débito"),
     ordenar_por: str = Query("valor_desc", description="Ordenar por: valor_desc, valor_asc, dias_desc, dias_asc"),
+    formato: Optional[FormatoExportacao] = Query(None, alias="format", description="Exportar em csv, xlsx ou ndjson (streaming) em vez de JSON"),
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     🚨 Relatório de Clientes Inadimplentes
     
     Lista clientes com pagamentos em atraso, ordenados por critérios específicos.
     Útil para ações de cobrança e controle de crédito.
+    
+    Considera apenas as vendas pendentes há mais de `dias_minimo` dias (total,
+    quantidade e datas são das vendas em atraso). `saldos_clientes` restringe a
+    busca aos clientes cuja venda pendente mais antiga já passou do limite.
     """
     
-    # Buscar vendas pendentes há mais de X dias - usar text() para MySQL
-    data_limite = func.date_sub(func.now(), text(f'INTERVAL {dias_minimo} DAY'))
+    data_limite = datetime.now() - timedelta(days=dias_minimo)
+    total_devido = func.sum(Venda.total_venda)
+    venda_mais_antiga = func.min(Venda.data_venda)
     
-    query = db.query(
+    query = select(
         Cliente.id,
         Cliente.nome,
         Cliente.nome_fantasia,
         Cliente.email,
         Cliente.telefone1,
-        func.sum(Venda.total_venda).label('total_devido'),
+        total_devido.label('total_devido'),
         func.count(Venda.id).label('vendas_pendentes'),
-        func.min(Venda.data_venda).label('venda_mais_antiga'),
+        venda_mais_antiga.label('venda_mais_antiga'),
         func.max(Venda.data_venda).label('venda_mais_recente')
-    ).join(Venda, Cliente.id == Venda.cliente_id)\
-     .filter(
-        and_(
-            Venda.situacao_pagamento == SituacaoPagamento.PENDENTE,
-            Venda.data_venda <= data_limite
-        )
-    ).group_by(Cliente.id, Cliente.nome, Cliente.nome_fantasia, Cliente.email, Cliente.telefone1)
+    ).select_from(SaldoCliente)\
+     .join(Cliente, Cliente.id == SaldoCliente.cliente_id)\
+     .join(Venda, and_(
+        Venda.cliente_id == SaldoCliente.cliente_id,
+        Venda.situacao_pagamento == SituacaoPagamento.PENDENTE,
+        Venda.data_venda <= data_limite
+    ))\
+     .where(SaldoCliente.venda_pendente_mais_antiga <= data_limite)\
+     .group_by(Cliente.id, Cliente.nome, Cliente.nome_fantasia, Cliente.email, Cliente.telefone1)
     
     # Filtrar por valor mínimo se especificado
     if valor_minimo:
-        query = query.having(func.sum(Venda.total_venda) >= valor_minimo)
+        query = query.having(total_devido >= valor_minimo)
     
     # Aplicar ordenação
     if ordenar_por == "valor_desc":
-        query = query.order_by(desc(func.sum(Venda.total_venda)))
+        query = query.order_by(desc(total_devido))
     elif ordenar_por == "valor_asc":
-        query = query.order_by(func.sum(Venda.total_venda))
+        query = query.order_by(total_devido)
     elif ordenar_por == "dias_desc":
-        query = query.order_by(func.min(Venda.data_venda))
+        query = query.order_by(venda_mais_antiga)
     elif ordenar_por == "dias_asc":
-        query = query.order_by(desc(func.min(Venda.data_venda)))
+        query = query.order_by(desc(venda_mais_antiga))
+    
+    if formato:
+        hoje = datetime.now().date()
+        return resposta_exportacao(
+            formato,
+            "clientes_inadimplentes",
+            ["cliente_id", "nome", "nome_fantasia", "email", "telefone1", "total_devido",
+             "vendas_pendentes", "venda_mais_antiga", "venda_mais_recente", "dias_atraso_maximo"],
+            linhas_do_banco(query, lambda linha: (*linha, (hoje - linha.venda_mais_antiga.date()).days))
+        )
     
-    inadimplentes = query.all()
+    inadimplentes = (await db.execute(query)).all()
     
     # Formatar resultado
     resultado = []
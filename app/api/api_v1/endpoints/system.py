@@ -3,6 +3,9 @@ Endpoint para informações do sistema e timezone
 """
 
 from fastapi import APIRouter
+from app.core.config import settings
+from app.core.database import async_engine, engine
+from app.core.pool_metrics import metricas_async, metricas_sync
 from app.utils.timezone import get_brazil_timezone_info, now_brazil, now_utc
 
 router = APIRouter()
@@ -29,3 +32,23 @@ async def health_check():
         "service": "Sistema Vendas CEASA",
         "timestamp_brazil": now_brazil().isoformat()
     }
+
+@router.get("/pool")
+async def pool_metrics():
+    """
+    Métricas dos pools de conexão (espera no checkout, conexões em uso e overflow)
+    """
+    return {
+        "configuracao": {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pre_ping": settings.DB_POOL_PRE_PING
+        },
+        "engines": [
+            metricas_async.resumo(async_engine.pool),
+            metricas_sync.resumo(engine.pool)
+        ],
+        "timestamp_brazil": now_brazil().isoformat()
+    }
@@ -2,12 +2,13 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.database import get_db
 from app.core.security import verify_password, create_access_token, get_password_hash
-from app.core.deps import get_current_user, get_current_admin_user
+from app.core.deps import get_current_user, get_current_admin_user, invalidar_usuario_cache
 from app.models.usuario import Usuario
 from app.schemas.usuario import Login, LoginResponse, Usuario as UsuarioSchema, UsuarioBase, TipoUsuario, FuncionarioCreate
 from typing import Optional
@@ -18,12 +19,12 @@ router = APIRouter()
 #endpoint para verificar se existe administrador cadastrado sem token
 @router.get("/administradores", response_model=dict)
 async def verificar_administrador(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Verifica se existe um administrador cadastrado"""
-    administrador = db.query(Usuario).filter(
-        (Usuario.tipo == TipoUsuario.ADMINISTRADOR)
-    ).first()
+    administrador = await db.scalar(
+        select(Usuario).where(Usuario.tipo == TipoUsuario.ADMINISTRADOR).limit(1)
+    )
     if not administrador:
         return {
             "data": None,
@@ -43,13 +44,13 @@ async def verificar_administrador(
 @router.post("/administradores", response_model=dict)
 async def criar_administrador(
     administrador: UsuarioBase,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Cria um novo administrador (máximo de 2)"""
     # Verifica se já existem dois administradores
-    total_admins = db.query(Usuario).filter(
-        Usuario.tipo == TipoUsuario.ADMINISTRADOR
-    ).count()
+    total_admins = await db.scalar(
+        select(func.count(Usuario.id)).where(Usuario.tipo == TipoUsuario.ADMINISTRADOR)
+    )
     if total_admins >= 2:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -69,8 +70,8 @@ async def criar_administrador(
     )
 
     db.add(novo_usuario)
-    db.commit()
-    db.refresh(novo_usuario)
+    await db.commit()
+    await db.refresh(novo_usuario)
 
     return {
         "data": {
@@ -87,11 +88,13 @@ async def criar_administrador(
 #endpoint para listar usuarios
 @router.get("/funcionarios", response_model=dict)
 async def listar_funcionarios(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(get_current_admin_user)
 ):
     """Lista todos os funcionários"""
-    funcionarios = db.query(Usuario).filter(Usuario.tipo == TipoUsuario.FUNCIONARIO).all()
+    funcionarios = (await db.scalars(
+        select(Usuario).where(Usuario.tipo == TipoUsuario.FUNCIONARIO)
+    )).all()
     return {
     "data": [UsuarioSchema.from_orm(f) for f in funcionarios],
     "message": "Funcionários listados com sucesso",
@@ -101,14 +104,14 @@ async def listar_funcionarios(
 @router.post("/funcionarios", response_model=dict)
 async def criar_funcionario(
     funcionario: FuncionarioCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(get_current_admin_user)
 ):
     """Cria um novo funcionário"""
     # Verifica se já existe um usuário com o mesmo CPF/CNPJ
-    usuario_existente = db.query(Usuario).filter(
-        (Usuario.cpf_ou_cnpj == funcionario.cpf_ou_cnpj)
-    ).first()
+    usuario_existente = await db.scalar(
+        select(Usuario).where(Usuario.cpf_ou_cnpj == funcionario.cpf_ou_cnpj).limit(1)
+    )
     if usuario_existente:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -133,8 +136,8 @@ async def criar_funcionario(
     )
 
     db.add(novo_usuario)
-    db.commit()
-    db.refresh(novo_usuario)
+    await db.commit()
+    await db.refresh(novo_usuario)
 
     return {
         "data": {
@@ -153,7 +156,7 @@ async def criar_funcionario(
 async def alterar_senha_funcionario(
     funcionario_id: int,
     nova_senha: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
 ):
     """Altera a senha de um funcionário (apenas o próprio funcionário pode alterar)"""
@@ -163,7 +166,9 @@ async def alterar_senha_funcionario(
             detail="Você só pode alterar sua própria senha"
         )
 
-    funcionario = db.query(Usuario).filter(Usuario.id == funcionario_id, Usuario.tipo == TipoUsuario.FUNCIONARIO).first()
+    funcionario = await db.scalar(
+        select(Usuario).where(Usuario.id == funcionario_id, Usuario.tipo == TipoUsuario.FUNCIONARIO)
+    )
     if not funcionario:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -171,7 +176,8 @@ async def alterar_senha_funcionario(
         )
 
     funcionario.senha_hash = get_password_hash(nova_senha)
-    db.commit()
+    await db.commit()
+    invalidar_usuario_cache(funcionario.email)
 
     return {
         "data": {
@@ -188,11 +194,13 @@ async def alterar_senha_funcionario(
 async def alterar_senha_administrador(
     admin_id: int,
     nova_senha: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(get_current_admin_user)
 ):
     """Altera a senha de um administrador"""
-    administrador = db.query(Usuario).filter(Usuario.id == admin_id, Usuario.tipo == TipoUsuario.ADMINISTRADOR).first()
+    administrador = await db.scalar(
+        select(Usuario).where(Usuario.id == admin_id, Usuario.tipo == TipoUsuario.ADMINISTRADOR)
+    )
     if not administrador:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -200,7 +208,8 @@ async def alterar_senha_administrador(
         )
 
     administrador.senha_hash = get_password_hash(nova_senha)
-    db.commit()
+    await db.commit()
+    invalidar_usuario_cache(administrador.email)
 
     return {
         "data": {
@@ -219,12 +228,12 @@ async def alterar_senha_administrador(
 async def alterar_nome_funcionario(
     funcionario_id: int,
     novo_nome: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     #o funcionario tambem pode alterar seu proprio nome
     current_user: Usuario = Depends(get_current_user)
 ):
     """Altera o nome de um funcionário"""
-    funcionario = db.query(Usuario).filter(Usuario.id == funcionario_id).first()
+    funcionario = await db.get(Usuario, funcionario_id)
     if not funcionario:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -232,7 +241,8 @@ async def alterar_nome_funcionario(
         )
 
     funcionario.nome = novo_nome
-    db.commit()
+    await db.commit()
+    invalidar_usuario_cache(funcionario.email)
 
     return {
         "data": {
@@ -251,11 +261,11 @@ async def alterar_nome_funcionario(
 async def atualizar_ativo_funcionario(
     funcionario_id: int,
     ativo: bool,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(get_current_admin_user)
 ):
     """Atualiza a coluna ativo de um funcionário"""
-    funcionario = db.query(Usuario).filter(Usuario.id == funcionario_id).first()
+    funcionario = await db.get(Usuario, funcionario_id)
     if not funcionario:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -263,7 +273,8 @@ async def atualizar_ativo_funcionario(
         )
 
     funcionario.ativo = ativo
-    db.commit()
+    await db.commit()
+    invalidar_usuario_cache(funcionario.email)
 
     return {
         "data": {
@@ -281,19 +292,20 @@ async def atualizar_ativo_funcionario(
 @router.delete("/funcionarios/{funcionario_id}", response_model=dict)
 async def deletar_funcionario(
     funcionario_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Usuario = Depends(get_current_admin_user)
 ):
     """Deleta um funcionário"""
-    funcionario = db.query(Usuario).filter(Usuario.id == funcionario_id).first()
+    funcionario = await db.get(Usuario, funcionario_id)
     if not funcionario:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Funcionário não encontrado"
         )
 
-    db.delete(funcionario)
-    db.commit()
+    await db.delete(funcionario)
+    await db.commit()
+    invalidar_usuario_cache(funcionario.email)
 
     return {
         "data": {
@@ -1,18 +1,35 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
-from sqlalchemy.orm import Session
-from decimal import Decimal
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query, Body
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
+from decimal import Decimal, ROUND_HALF_UP
 
 from datetime import datetime, timedelta
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.deps import get_current_user, get_current_admin_user
 from app.models.venda import Venda, ItemVenda
+from app.models.carregamento import LUCRO_COM_PRODUTO, VENDA_COM_ITENS, VENDA_COMPLETA
 from app.core.enums import SituacaoPedido, SituacaoPagamento
  
 from app.models.cliente import Cliente
 from app.models.produto import Produto
 from app.models.usuario import Usuario
 from app.utils.timezone import now_brazil
+from app.utils.cache_respostas import cache_resposta, invalidar_cache
+from app.utils.paginacao import contar, pagina_por_cursor, paginacao_cursor, paginacao_offset
+from app.services.agregacao_vendas import AgregacaoVendasService
+from app.services.importacao_vendas import (
+    ErroImportacao,
+    ImportacaoVendasService,
+    ler_linhas,
+    registros_csv,
+    registros_ndjson
+)
+from app.services.saldo_cliente import SaldoClienteService
+from app.services.vendas_diarias import VendasDiariasService
 from app.schemas.venda import (
     Venda as VendaSchema,
     VendaCreate
@@ -21,6 +38,20 @@ from app.schemas.venda import (
 #utcnow
 router = APIRouter()
 
+CENTAVOS = Decimal('0.01')
+
+# Ordem estável para a paginação por cursor
+ORDEM_VENDAS = [(Venda.data_venda, True), (Venda.id, True)]
+
+async def _carregar_venda(db: AsyncSession, venda_id: int) -> Optional[Venda]:
+    """Busca a venda com cliente e itens prontos para serialização"""
+    return await db.scalar(
+        select(Venda)
+        .options(*VENDA_COMPLETA)
+        .where(Venda.id == venda_id)
+        .execution_options(populate_existing=True)
+    )
+
 @router.get("/", response_model=dict)
 async def listar_vendas(
     skip: int = Query(0, ge=0, description="Número de registros para pular"),
@@ -28,53 +59,61 @@ async def listar_vendas(
     cliente_id: Optional[int] = Query(None, description="Filtrar por cliente"),
     situacao_pedido: Optional[SituacaoPedido] = Query(None, description="Filtrar por situação do pedido"),
     situacao_pagamento: Optional[SituacaoPagamento] = Query(None, description="Filtrar por situação do pagamento"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (vazio inicia a paginação por cursor)"),
+    incluir_total: bool = Query(True, description="Calcular o total exato de registros (em modo cursor, só na primeira página)"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Listar vendas com filtros e paginação"""
-    query = db.query(Venda)
+    query = select(Venda)
     
     # Apply filters
     if cliente_id:
-        query = query.filter(Venda.cliente_id == cliente_id)
+        query = query.where(Venda.cliente_id == cliente_id)
     
     if situacao_pedido:
-        query = query.filter(Venda.situacao_pedido == situacao_pedido)
+        query = query.where(Venda.situacao_pedido == situacao_pedido)
     
     if situacao_pagamento:
-        query = query.filter(Venda.situacao_pagamento == situacao_pagamento)
-    
-    # Get total count
-    total = query.count()
+        query = query.where(Venda.situacao_pagamento == situacao_pagamento)
     
-    # Apply pagination and order by date
-    vendas = query.order_by(Venda.data_venda.desc()).offset(skip).limit(limit).all()
+    if cursor is not None:
+        # Paginação por cursor (keyset) sobre (data_venda, id)
+        total = await contar(db, query) if incluir_total and not cursor else None
+        vendas, proximo_cursor = await pagina_por_cursor(
+            db, query.options(*VENDA_COMPLETA), ORDEM_VENDAS, cursor, limit
+        )
+        paginacao = paginacao_cursor(limit, proximo_cursor, total)
+    else:
+        # Get total count
+        total = await contar(db, query) if incluir_total else None
+        
+        # Apply pagination and order by date
+        vendas = (await db.scalars(
+            query.options(*VENDA_COMPLETA).order_by(Venda.data_venda.desc()).offset(skip).limit(limit)
+        )).all()
+        paginacao = paginacao_offset(skip, limit, total)
     
     return {
         "data": {
             "items": [VendaSchema.from_orm(venda) for venda in vendas],
-            "paginacao": {
-                "pagina": (skip // limit) + 1,
-                "itensPorPagina": limit,
-                "totalItens": total,
-                "totalPaginas": (total + limit - 1) // limit
-            }
+            "paginacao": paginacao
         },
         "message": "Vendas listadas com sucesso",
         "success": True
     }
 
 @router.get("/dashboard", response_model=dict)
+@cache_resposta("vendas", "clientes")
 async def obter_dashboard_vendas(
+    request: Request,
     data_inicio: Optional[str] = Query(None, description="Data de início (YYYY-MM-DD). Se não informada, usa hoje"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Obter dashboard com estatísticas de vendas e clientes"""
-    from datetime import datetime, date, timedelta, time
-    from sqlalchemy import func, and_, extract
-    from app.models.cliente import Cliente
-    
+    from datetime import datetime, date
+
     # Definir datas
     hoje = date.today()
     
@@ -91,125 +130,28 @@ async def obter_dashboard_vendas(
     
     data_fim_dt = hoje
     
-    # Se a data de início for diferente de hoje, criar período
+    # Período: da data informada até hoje (incluindo todo o dia de hoje)
     if data_inicio_dt != hoje:
-        # Período: da data informada até hoje (incluindo todo o dia de hoje)
-        data_inicio_completa = datetime.combine(data_inicio_dt, time.min)  # 00:00:00
-        data_fim_completa = datetime.combine(data_fim_dt, time.max)        # 23:59:59
-        
-        vendas_periodo_query = db.query(Venda).filter(
-            and_(
-                Venda.data_venda >= data_inicio_completa,
-                Venda.data_venda <= data_fim_completa
-            )
-        )
         periodo_texto = f"de {data_inicio_dt.strftime('%d/%m/%Y')} até {data_fim_dt.strftime('%d/%m/%Y')}"
     else:
-        # Apenas hoje (todo o dia)
-        inicio_hoje = datetime.combine(hoje, time.min)  # 00:00:00
-        fim_hoje = datetime.combine(hoje, time.max)     # 23:59:59
-        
-        vendas_periodo_query = db.query(Venda).filter(
-            and_(
-                Venda.data_venda >= inicio_hoje,
-                Venda.data_venda <= fim_hoje
-            )
-        )
         periodo_texto = f"de hoje ({hoje.strftime('%d/%m/%Y')})"
     
-    # Vendas do período
-    vendas_periodo = vendas_periodo_query.all()
-    total_vendas_periodo = len(vendas_periodo)
-    valor_total_vendas = sum(float(v.total_venda) for v in vendas_periodo)
-    lucro_bruto_total = sum(float(v.lucro_bruto_total or 0) for v in vendas_periodo)
-    ticket_medio = (valor_total_vendas / total_vendas_periodo) if total_vendas_periodo > 0 else 0
-
-    # Estatísticas de clientes
-    total_clientes = db.query(Cliente).count()
-    total_clientes_ativos = db.query(Cliente).filter(Cliente.ativo == True).count()
-
-    # Vendas mensais (últimos 12 meses)
-    from collections import OrderedDict
-    vendas_mensais = OrderedDict()
-    for i in range(11, -1, -1):
-        mes_ref = (hoje.month - i - 1) % 12 + 1
-        ano_ref = hoje.year if hoje.month - i > 0 else hoje.year - 1
-        vendas_mes = db.query(
-            func.count(Venda.id),
-            func.sum(Venda.total_venda),
-            func.sum(Venda.lucro_bruto_total)
-        ).filter(
-            extract('month', Venda.data_venda) == mes_ref,
-            extract('year', Venda.data_venda) == ano_ref
-        ).first()
-        vendas_mensais[f"{mes_ref:02d}/{ano_ref}"] = {
-            "quantidade": vendas_mes[0] or 0,
-            "valor_total": float(vendas_mes[1] or 0),
-            "lucro_bruto_total": float(vendas_mes[2] or 0)
+    def montar_dashboard(sessao) -> dict:
+        agregacoes = AgregacaoVendasService(sessao)
+        return {
+            "periodo": {
+                "data_inicio": data_inicio_dt.strftime("%Y-%m-%d"),
+                "data_fim": data_fim_dt.strftime("%Y-%m-%d"),
+                "descricao": periodo_texto
+            },
+            "vendas_periodo": agregacoes.kpis_periodo(data_inicio_dt, data_fim_dt),
+            "estatisticas_clientes": agregacoes.estatisticas_clientes(),
+            "vendas_mensais": agregacoes.serie_mensal(hoje, meses=12),
+            "pagamentos_pendentes": agregacoes.pagamentos_pendentes(hoje),
+            "ranking_clientes": agregacoes.ranking_clientes(limite=5)
         }
 
-    # Pagamentos pendentes
-    vendas_pendentes = db.query(Venda).filter(
-        Venda.situacao_pagamento == SituacaoPagamento.PENDENTE
-    ).all()
-    total_pagamentos_pendentes = sum(float(v.total_venda) for v in vendas_pendentes)
-
-    # Ranking de clientes (top 5)
-    ranking_clientes = (
-        db.query(
-            Cliente.nome,
-            func.count(Venda.id).label('qtd_vendas'),
-            func.sum(Venda.total_venda).label('valor_total'),
-            func.sum(Venda.lucro_bruto_total).label('lucro_total')
-        )
-        .join(Venda, Venda.cliente_id == Cliente.id)
-        .group_by(Cliente.id)
-        .order_by(func.sum(Venda.total_venda).desc())
-        .limit(5)
-        .all()
-    )
-    ranking_clientes_list = [
-        {
-            "cliente": r.nome,
-            "qtd_vendas": r.qtd_vendas,
-            "valor_total": float(r.valor_total or 0),
-            "lucro_total": float(r.lucro_total or 0)
-        } for r in ranking_clientes
-    ]
-
-    dashboard = {
-        "periodo": {
-            "data_inicio": data_inicio_dt.strftime("%Y-%m-%d"),
-            "data_fim": data_fim_dt.strftime("%Y-%m-%d"),
-            "descricao": periodo_texto
-        },
-        "vendas_periodo": {
-            "total_vendas": total_vendas_periodo,
-            "valor_total": valor_total_vendas,
-            "lucro_bruto_total": lucro_bruto_total,
-            "ticket_medio": round(ticket_medio, 2)
-        },
-        "estatisticas_clientes": {
-            "total_clientes": total_clientes,
-            "clientes_ativos": total_clientes_ativos,
-            "clientes_inativos": total_clientes - total_clientes_ativos
-        },
-        "vendas_mensais": vendas_mensais,
-        "pagamentos_pendentes": {
-            "quantidade_vendas": len(vendas_pendentes),
-            "valor_total": total_pagamentos_pendentes,
-            "vendas": [
-                {
-                    "id": v.id,
-                    "cliente": v.cliente.nome if v.cliente else "Cliente não encontrado",
-                    "valor": float(v.total_venda),
-                    "data_venda": v.data_venda.strftime("%Y-%m-%d %H:%M:%S"),
-                    "dias_pendente": (hoje - v.data_venda.date()).days
-                } for v in vendas_pendentes
-            ]
-        },
-        "ranking_clientes": ranking_clientes_list
-    }
+    dashboard = await db.run_sync(montar_dashboard)
 
     return {
         "data": dashboard,
@@ -221,12 +163,12 @@ async def obter_dashboard_vendas(
 async def obter_venda(
     venda_id: int,
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Obter venda por ID com cálculo de lucro bruto"""
     from app.models.estoque import LucroBruto
     
-    venda = db.query(Venda).filter(Venda.id == venda_id).first()
+    venda = await _carregar_venda(db, venda_id)
     if not venda:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -247,9 +189,11 @@ async def obter_venda(
     
     if venda.situacao_pedido == SituacaoPedido.SEPARADO:
         # Buscar registros de lucro bruto desta venda (calculados pelo FIFO)
-        lucros_produtos = db.query(LucroBruto).filter(
-            LucroBruto.venda_id == venda_id
-        ).all()
+        lucros_produtos = (await db.scalars(
+            select(LucroBruto)
+            .options(*LUCRO_COM_PRODUTO)
+            .where(LucroBruto.venda_id == venda_id)
+        )).all()
         
         if lucros_produtos:
             # Somar todos os lucros dos produtos desta venda
@@ -296,22 +240,26 @@ async def obter_venda(
 async def criar_venda(
     venda_data: VendaCreate,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Criar nova venda (apenas administradores)"""
     # Verify client exists
-    cliente = db.query(Cliente).filter(Cliente.id == venda_data.cliente_id).first()
+    cliente = await db.get(Cliente, venda_data.cliente_id)
     if not cliente:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cliente não encontrado"
         )
     
-    # Verify all products exist
+    # Verify all products exist (uma única consulta IN para todos os itens)
+    produto_ids = {item.produto_id for item in venda_data.itens}
+    produtos = {
+        produto.id: produto
+        for produto in await db.scalars(select(Produto).where(Produto.id.in_(produto_ids)))
+    }
     total_venda = Decimal('0.00')
     for item in venda_data.itens:
-        produto = db.query(Produto).filter(Produto.id == item.produto_id).first()
-        if not produto:
+        if item.produto_id not in produtos:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Produto com ID {item.produto_id} não encontrado"
@@ -321,36 +269,52 @@ async def criar_venda(
         item_total = item.quantidade * item.valor_unitario
         total_venda += item_total
     
-    # Calcular lucro_bruto_total
+    # Calcular lucro_bruto_total e custo_total
     lucro_bruto_total = sum([item.lucro_bruto for item in venda_data.itens])
+    custo_total = sum(item.custo * item.quantidade for item in venda_data.itens)
 
     # Create venda
     db_venda = Venda(
         cliente_id=venda_data.cliente_id,
-        total_venda=total_venda,
+        # Mesma escala das colunas, já que a venda não é recarregada do banco
+        total_venda=total_venda.quantize(CENTAVOS, ROUND_HALF_UP),
         observacoes=venda_data.observacoes,
-        lucro_bruto_total=lucro_bruto_total
+        lucro_bruto_total=Decimal(lucro_bruto_total).quantize(CENTAVOS, ROUND_HALF_UP),
+        custo_total=Decimal(custo_total).quantize(CENTAVOS, ROUND_HALF_UP)
     )
     db.add(db_venda)
-    db.flush()  # Get the ID
+    await db.flush()  # Get the ID
 
-    # Create items
-    for item in venda_data.itens:
-        item_total = item.quantidade * item.valor_unitario
-        db_item = ItemVenda(
-            venda_id=db_venda.id,
-            produto_id=item.produto_id,
-            quantidade=item.quantidade,
-            tipo_medida=item.tipo_medida,
-            valor_unitario=item.valor_unitario,
-            custo=item.custo,
-            lucro_bruto=item.lucro_bruto,
-            valor_total_produto=item_total
-        )
-        db.add(db_item)
+    # Create items: um único INSERT em lote (executemany) em vez de um flush por item
+    await db.execute(insert(ItemVenda), [
+        {
+            "venda_id": db_venda.id,
+            "produto_id": item.produto_id,
+            "quantidade": item.quantidade,
+            "tipo_medida": item.tipo_medida,
+            "valor_unitario": item.valor_unitario,
+            "custo": item.custo,
+            "lucro_bruto": item.lucro_bruto,
+            "valor_total_produto": item.quantidade * item.valor_unitario
+        }
+        for item in venda_data.itens
+    ])
+    itens_criados = (await db.scalars(
+        select(ItemVenda).where(ItemVenda.venda_id == db_venda.id).order_by(ItemVenda.id)
+    )).all()
+
+    # Atualizar rollup diário e saldo do cliente na mesma transação
+    await db.run_sync(lambda sessao: VendasDiariasService(sessao).registrar_venda(db_venda, itens_criados))
+    await db.run_sync(lambda sessao: SaldoClienteService(sessao).registrar_venda(db_venda))
 
-    db.commit()
-    db.refresh(db_venda)
+    await db.commit()
+    await invalidar_cache("vendas")
+
+    # Cliente e produtos já estão carregados: montar a resposta sem recarregar a venda
+    set_committed_value(db_venda, "cliente", cliente)
+    set_committed_value(db_venda, "itens", list(itens_criados))
+    for db_item in itens_criados:
+        set_committed_value(db_item, "produto", produtos[db_item.produto_id])
 
     return {
         "data": VendaSchema.from_orm(db_venda),
@@ -358,6 +322,94 @@ async def criar_venda(
         "success": True
     }
 
+@router.post("/bulk", response_model=dict)
+async def importar_vendas(
+    request: Request,
+    formato: Optional[Literal["ndjson", "csv"]] = Query(None, description="Formato do corpo (padrão: pelo Content-Type)"),
+    current_user: Usuario = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Importar vendas em lote a partir do corpo da requisição (apenas administradores)
+
+    - NDJSON: um objeto por linha no formato de POST /vendas/, com `data_venda` opcional
+    - CSV: uma linha por item com as colunas pedido, cliente_id, produto_id, quantidade,
+      tipo_medida, valor_unitario, custo, lucro_bruto e, opcionalmente, observacoes e
+      data_venda; linhas seguidas com o mesmo `pedido` formam uma venda
+
+    O corpo é lido em streaming e gravado em transações de IMPORTACAO_VENDAS_LOTE vendas.
+    Retorna o resultado de cada registro (linha do arquivo, ID da venda criada ou erro).
+    """
+    if formato is None:
+        formato = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+    clientes, produtos = await db.run_sync(
+        lambda sessao: ImportacaoVendasService(sessao).carregar_referencias()
+    )
+    linhas = ler_linhas(request.stream())
+    registros = registros_csv(linhas) if formato == "csv" else registros_ndjson(linhas)
+
+    resultados = []
+    lote = []  # (resultado, pedido) aguardando gravação
+
+    async def gravar_lote():
+        pedidos = [pedido for _, pedido in lote]
+        try:
+            ids = await db.run_sync(lambda sessao: ImportacaoVendasService(sessao).gravar_lote(pedidos))
+            await db.commit()
+        except SQLAlchemyError:
+            await db.rollback()
+            # Regravar uma a uma para isolar as vendas que o banco recusou
+            ids = []
+            for pedido in pedidos:
+                try:
+                    ids += await db.run_sync(lambda sessao: ImportacaoVendasService(sessao).gravar_lote([pedido]))
+                    await db.commit()
+                except SQLAlchemyError:
+                    await db.rollback()
+                    ids.append(None)
+        for (resultado, _), venda_id in zip(lote, ids):
+            resultado["venda_id"] = venda_id
+            resultado["sucesso"] = venda_id is not None
+            if venda_id is None:
+                resultado["erro"] = "Erro ao gravar a venda no banco de dados"
+        await invalidar_cache("vendas")
+        lote.clear()
+
+    try:
+        async for linha, pedido_ref, dados in registros:
+            resultado = {"linha": linha, "pedido": pedido_ref, "sucesso": False, "venda_id": None, "erro": None}
+            resultados.append(resultado)
+            try:
+                lote.append((resultado, ImportacaoVendasService.validar(dados, clientes, produtos)))
+            except ErroImportacao as e:
+                resultado["erro"] = str(e)
+                continue
+            if len(lote) >= settings.IMPORTACAO_VENDAS_LOTE:
+                await gravar_lote()
+    except (ErroImportacao, UnicodeDecodeError) as e:
+        erro = str(e) if isinstance(e, ErroImportacao) else "O arquivo deve estar codificado em UTF-8"
+        if not resultados:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=erro
+            )
+        # Leitura interrompida: o que já foi validado ainda é gravado
+        resultados.append({"linha": None, "pedido": None, "sucesso": False, "venda_id": None, "erro": erro})
+    if lote:
+        await gravar_lote()
+
+    importadas = sum(1 for resultado in resultados if resultado["sucesso"])
+    return {
+        "data": {
+            "total_registros": len(resultados),
+            "importadas": importadas,
+            "com_erro": len(resultados) - importadas,
+            "resultados": resultados
+        },
+        "message": f"Importação concluída: {importadas} vendas importadas, {len(resultados) - importadas} com erro",
+        "success": True
+    }
+
 
 
 
@@ -368,19 +420,24 @@ async def criar_venda(
 async def marcar_como_pago(
     venda_id: int,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Marcar venda como paga"""
-    venda = db.query(Venda).filter(Venda.id == venda_id).first()
+    venda = await _carregar_venda(db, venda_id)
     if not venda:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Venda não encontrada"
         )
     
+    if venda.situacao_pagamento != SituacaoPagamento.PAGO:
+        await db.run_sync(lambda sessao: VendasDiariasService(sessao).registrar_pagamento(venda, venda.itens))
+        await db.run_sync(lambda sessao: SaldoClienteService(sessao).remover_venda(venda))
+
     venda.situacao_pagamento = SituacaoPagamento.PAGO
-    db.commit()
-    db.refresh(venda)
+    await db.commit()
+    await invalidar_cache("vendas")
+    venda = await _carregar_venda(db, venda_id)
     
     return {
         "data": VendaSchema.from_orm(venda),
@@ -392,7 +449,7 @@ async def marcar_como_pago(
 async def excluir_venda(
     venda_id: int,
     current_user: Usuario = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Exclui uma venda e retorna os produtos ao estoque.
@@ -400,7 +457,9 @@ async def excluir_venda(
     """
     
 
-    venda = db.query(Venda).filter(Venda.id == venda_id).first()
+    venda = await db.scalar(
+        select(Venda).options(*VENDA_COM_ITENS).where(Venda.id == venda_id)
+    )
     if not venda:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -419,11 +478,14 @@ async def excluir_venda(
         )
 
     # Exclui os itens e a venda (sem lógica de estoque/lucro/caixa)
-    itens = db.query(ItemVenda).filter(ItemVenda.venda_id == venda_id).all()
+    itens = list(venda.itens)
+    await db.run_sync(lambda sessao: VendasDiariasService(sessao).remover_venda(venda, itens))
+    await db.run_sync(lambda sessao: SaldoClienteService(sessao).remover_venda(venda))
     for item in itens:
-        db.delete(item)
-    db.delete(venda)
-    db.commit()
+        await db.delete(item)
+    await db.delete(venda)
+    await db.commit()
+    await invalidar_cache("vendas")
 
     return {
         "message": "Venda excluída com sucesso.",
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -16,15 +16,42 @@ class Settings(BaseSettings):
     DATABASE_USER: Optional[str] = "vendas_user"
     DATABASE_PASSWORD: Optional[str] = "vendas_pass"
     DATABASE_NAME: Optional[str] = "vendas_ceasa"
+    ASYNC_DATABASE_URL: Optional[str] = None  # se vazio, derivada da DATABASE_URL (aiomysql/aiosqlite)
+    
+    # Database Pool Settings (valores por engine: síncrono e assíncrono)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # segundos aguardando uma conexão livre antes de erro
+    DB_POOL_RECYCLE: int = 300  # segundos até reciclar uma conexão
+    DB_POOL_PRE_PING: Literal["pessimista", "otimista"] = "pessimista"  # "pessimista": ping a cada checkout; "otimista": sem ping, invalida ao detectar desconexão
     
     # Security Settings
     SECRET_KEY: str = "desenvolvimento_chave_secreta_123"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    USER_CACHE_TTL_SECONDS: int = 60  # cache do usuário autenticado por processo (0 desativa)
+    USER_CACHE_MAX_SIZE: int = 1024
+    
+    # FIFO Ledger Settings
+    FIFO_LEDGER_TTL_SECONDS: int = 5  # intervalo mínimo entre verificações de versão no banco
+    
+    # Cache de respostas dos relatórios (dashboards, resumo financeiro, alertas)
+    RESPONSE_CACHE_BACKEND: Literal["memoria", "redis", "desativado"] = "memoria"  # "redis" requer o pacote redis
+    RESPONSE_CACHE_TTL_SECONDS: int = 120
+    RESPONSE_CACHE_MAX_SIZE: int = 512
+    REDIS_URL: str = "redis://localhost:6379/0"
+    
+    # Alertas de estoque (SSE)
+    ALERTAS_STREAM_INTERVALO_SEGUNDOS: int = 15  # releitura/keep-alive do stream de alertas
+    
+    # Importação em lote
+    IMPORTACAO_VENDAS_LOTE: int = 500  # vendas gravadas por transação em POST /vendas/bulk
     
     # Upload Settings
     UPLOAD_FOLDER: str = "uploads"
     MAX_FILE_SIZE: int = 5242880  # 5MB
+    IMAGE_PROCESS_WORKERS: int = 2  # processos para redimensionar imagens (fora do event loop)
+    RCLONE_TIMEOUT_SECONDS: int = 120  # tempo máximo de cada comando rclone
     
     # Google Drive Settings
     RCLONE_CONFIG_PATH: str = "/app/rclone.conf"
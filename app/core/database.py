@@ -1,33 +1,82 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
 from app.core.config import settings
+from app.core.pool_metrics import (
+    PoolAsyncCronometrado,
+    PoolSyncCronometrado,
+    instrumentar_engine,
+    metricas_async,
+    metricas_sync
+)
 
 # Configurar timezone globalmente
 os.environ['TZ'] = 'America/Sao_Paulo'
 if hasattr(os, 'tzset'):
     os.tzset()
 
-# Create SQLAlchemy engine
+# Drivers assíncronos equivalentes aos drivers síncronos da DATABASE_URL
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# Parâmetros de pool compartilhados pelos dois engines
+# "otimista" dispensa o ping por checkout; conexões mortas são descartadas
+# quando o erro de desconexão aparece (o SQLAlchemy invalida o pool inteiro)
+POOL_KWARGS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING == "pessimista",
+}
+
+def get_async_database_url() -> str:
+    """URL do banco para o engine assíncrono (ASYNC_DATABASE_URL ou derivada da DATABASE_URL)"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    driver, separador, resto = settings.DATABASE_URL.partition("://")
+    return f"{ASYNC_DRIVERS.get(driver, driver)}{separador}{resto}"
+
+# Create SQLAlchemy engine (scripts, migrações e create_all)
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    echo=settings.DEBUG
+    poolclass=PoolSyncCronometrado,
+    echo=settings.DEBUG,
+    **POOL_KWARGS
 )
+instrumentar_engine(engine, metricas_sync)
+
+# Create async engine (endpoints)
+async_engine = create_async_engine(
+    get_async_database_url(),
+    poolclass=PoolAsyncCronometrado,
+    echo=settings.DEBUG,
+    **POOL_KWARGS
+)
+instrumentar_engine(async_engine.sync_engine, metricas_async)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create AsyncSessionLocal class
+# expire_on_commit=False: objetos continuam legíveis após o commit sem novo I/O implícito
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Create Base class
 Base = declarative_base()
 
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,21 +1,62 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.security import verify_token
 from app.models.usuario import Usuario
 from app.core.enums import TipoUsuario
+from app.utils.cache import TTLCache
 
 security = HTTPBearer()
+security_opcional = HTTPBearer(auto_error=False)
+
+# Usuários autenticados por email (subject do token). Guarda só as colunas:
+# cada requisição recebe uma cópia transitória, fora da sessão.
+usuarios_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
+def invalidar_usuario_cache(email: str) -> None:
+    """Remove o usuário do cache após alterações de nome, senha, tipo ou status"""
+    usuarios_cache.invalidate(email)
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Usuario:
     """Get current authenticated user"""
+    return await _usuario_do_token(credentials.credentials, db)
+
+async def get_current_user_stream(
+    token: Optional[str] = Query(None, description="Token JWT, para clientes que não enviam headers (EventSource)"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_opcional),
+    db: AsyncSession = Depends(get_db)
+) -> Usuario:
+    """Usuário autenticado pelo header Authorization ou pelo parâmetro `token`
+
+    Só para streams (Server-Sent Events): o EventSource do navegador não
+    permite enviar headers. O token na URL pode aparecer em logs de acesso.
+    """
+    if credentials is not None:
+        token = credentials.credentials
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token não informado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await _usuario_do_token(token, db)
+
+async def _usuario_do_token(token: str, db: AsyncSession) -> Usuario:
+    """Usuário ativo dono do token (do cache ou do banco)"""
     # Verify token
-    user_email = verify_token(credentials.credentials)
+    user_email = verify_token(token)
     if not user_email:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -23,8 +64,17 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Get user from database
-    user = db.query(Usuario).filter(Usuario.email == user_email).first()
+    # Get user from cache or database
+    colunas = usuarios_cache.get(user_email)
+    if colunas is not None:
+        user = Usuario(**colunas)
+    else:
+        user = await db.scalar(select(Usuario).where(Usuario.email == user_email).limit(1))
+        if user:
+            usuarios_cache.set(user_email, {
+                coluna.key: getattr(user, coluna.key) for coluna in Usuario.__table__.columns
+            })
+    
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,121 @@
+import threading
+import time
+from typing import Type
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class MetricasPool:
+    """Contadores de uso de um pool de conexões (um por engine)"""
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.pico_em_uso = 0
+        self.pico_overflow = 0
+        self.checkouts_com_overflow = 0
+        self.conexoes_abertas = 0
+        self.conexoes_invalidadas = 0
+
+    def registrar_espera(self, segundos: float) -> None:
+        with self._lock:
+            self.espera_total += segundos
+            self.espera_maxima = max(self.espera_maxima, segundos)
+
+    def registrar_timeout(self, segundos: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.espera_total += segundos
+            self.espera_maxima = max(self.espera_maxima, segundos)
+
+    def registrar_checkout(self, pool: QueuePool) -> None:
+        em_uso = pool.checkedout()
+        overflow = max(pool.overflow(), 0)
+        with self._lock:
+            self.checkouts += 1
+            self.pico_em_uso = max(self.pico_em_uso, em_uso)
+            self.pico_overflow = max(self.pico_overflow, overflow)
+            if overflow > 0:
+                self.checkouts_com_overflow += 1
+
+    def registrar_conexao(self) -> None:
+        with self._lock:
+            self.conexoes_abertas += 1
+
+    def registrar_invalidacao(self) -> None:
+        with self._lock:
+            self.conexoes_invalidadas += 1
+
+    def resumo(self, pool: QueuePool) -> dict:
+        """Estado atual do pool e contadores acumulados desde o início do processo"""
+        with self._lock:
+            aguardados = self.checkouts + self.timeouts
+            return {
+                "engine": self.nome,
+                "pool": {
+                    "tamanho": pool.size(),
+                    "em_uso": pool.checkedout(),
+                    "disponiveis": pool.checkedin(),
+                    "overflow": max(pool.overflow(), 0),
+                    "status": pool.status()
+                },
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "espera_media_ms": round(self.espera_total / aguardados * 1000, 3) if aguardados else 0.0,
+                "espera_maxima_ms": round(self.espera_maxima * 1000, 3),
+                "pico_em_uso": self.pico_em_uso,
+                "pico_overflow": self.pico_overflow,
+                "checkouts_com_overflow": self.checkouts_com_overflow,
+                "conexoes_abertas": self.conexoes_abertas,
+                "conexoes_invalidadas": self.conexoes_invalidadas
+            }
+
+
+def pool_cronometrado(base: Type[QueuePool], metricas: MetricasPool) -> Type[QueuePool]:
+    """Subclasse do pool que mede quanto tempo cada checkout esperou por uma conexão.
+
+    As métricas ficam na classe, então sobrevivem ao `recreate()` que o
+    SQLAlchemy faz ao invalidar o pool após uma desconexão.
+    """
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = base._do_get(self)
+        except PoolTimeoutError:
+            metricas.registrar_timeout(time.perf_counter() - inicio)
+            raise
+        metricas.registrar_espera(time.perf_counter() - inicio)
+        return conexao
+
+    return type(f"Cronometrado{base.__name__}", (base,), {"_do_get": _do_get, "metricas": metricas})
+
+
+def instrumentar_engine(engine: Engine, metricas: MetricasPool) -> None:
+    """Registra os listeners de checkout/conexão/invalidação no pool do engine"""
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        metricas.registrar_checkout(engine.pool)
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        metricas.registrar_conexao()
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidate(dbapi_connection, connection_record, exception):
+        metricas.registrar_invalidacao()
+
+
+metricas_sync = MetricasPool("sync")
+metricas_async = MetricasPool("async")
+
+PoolSyncCronometrado = pool_cronometrado(QueuePool, metricas_sync)
+PoolAsyncCronometrado = pool_cronometrado(AsyncAdaptedQueuePool, metricas_async)
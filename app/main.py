@@ -4,9 +4,11 @@ from fastapi.staticfiles import StaticFiles
 import os
 
 from app.core.config import settings
-from app.core.database import engine
+from app.core.database import AsyncSessionLocal, engine
 from app.models import Base
 from app.api.api_v1.api import api_router
+from app.services.autocomplete import carregar_autocomplete
+from app.utils.upload import shutdown_image_pool
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -38,6 +40,17 @@ app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_FOLDER), name="uploa
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+async def montar_autocomplete():
+    """Monta os índices de autocomplete de clientes e produtos em memória"""
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(carregar_autocomplete)
+
+@app.on_event("shutdown")
+async def encerrar_processos_imagem():
+    """Encerra o pool de processos de imagem"""
+    shutdown_image_pool()
+
 @app.get("/")
 async def root():
     return {
@@ -3,7 +3,7 @@ from app.core.database import Base
 from app.models.usuario import Usuario
 from app.models.cliente import Cliente
 from app.models.produto import Produto
-from app.models.venda import Venda, ItemVenda
+from app.models.venda import Venda, ItemVenda, VendaDiaria, SaldoCliente
 from app.models.estoque import EntradaEstoque, Inventario
 
 __all__ = [
@@ -13,6 +13,8 @@ __all__ = [
     "Produto",
     "Venda",
     "ItemVenda",
+    "VendaDiaria",
+    "SaldoCliente",
     "EntradaEstoque",
     "Inventario"
 ]
@@ -0,0 +1,34 @@
+"""
+Conjuntos reutilizáveis de opções de carregamento (loader options).
+Cada conjunto declara os relacionamentos que um schema de resposta percorre,
+para que a serialização não dispare uma consulta por objeto (N+1).
+"""
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.models.estoque import EntradaEstoque, Inventario, LucroBruto
+from app.models.venda import ItemVenda, Venda
+
+# VendaSchema: cliente (muitos-para-um, JOIN) e itens → produto (IN em lote)
+VENDA_COMPLETA = (
+    joinedload(Venda.cliente),
+    selectinload(Venda.itens).joinedload(ItemVenda.produto),
+)
+
+# Operações sobre os itens da venda (contagem, estorno, rollup)
+VENDA_COM_ITENS = (
+    selectinload(Venda.itens),
+)
+
+# EntradaEstoqueSchema e InventarioSchema incluem o produto
+ENTRADA_COM_PRODUTO = (
+    joinedload(EntradaEstoque.produto),
+)
+
+INVENTARIO_COM_PRODUTO = (
+    joinedload(Inventario.produto),
+)
+
+LUCRO_COM_PRODUTO = (
+    joinedload(LucroBruto.produto),
+)
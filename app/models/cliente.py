@@ -1,15 +1,24 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
 
 from app.core.database import Base
+from app.utils.texto import normalizar_texto, somente_digitos
 
 class Cliente(Base):
     __tablename__ = "clientes"
+    __table_args__ = (
+        # FULLTEXT com parser ngram no MySQL (busca por trechos); índice comum nos demais bancos
+        Index("ix_clientes_nome_busca", "nome_busca", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String(100), nullable=False, index=True)
     nome_fantasia = Column(String(100), nullable=True)
     cpf_ou_cnpj = Column(String(18), nullable=False, unique=True, index=True)
+    # Colunas de busca, preenchidas a partir de nome/nome_fantasia e cpf_ou_cnpj
+    nome_busca = Column(String(201), nullable=True)
+    cpf_ou_cnpj_digitos = Column(String(14), nullable=True, index=True)
     endereco = Column(String(255), nullable=False)
     ponto_referencia = Column(String(255), nullable=True)
     email = Column(String(100), nullable=True)
@@ -18,3 +27,15 @@ class Cliente(Base):
     ativo = Column(Boolean, default=True)
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
     atualizado_em = Column(DateTime(timezone=True), onupdate=func.now())
+
+    @validates("nome", "nome_fantasia")
+    def _atualizar_nome_busca(self, chave, valor):
+        nome = valor if chave == "nome" else self.nome
+        nome_fantasia = valor if chave == "nome_fantasia" else self.nome_fantasia
+        self.nome_busca = normalizar_texto(nome, nome_fantasia)
+        return valor
+
+    @validates("cpf_ou_cnpj")
+    def _atualizar_cpf_ou_cnpj_digitos(self, chave, valor):
+        self.cpf_ou_cnpj_digitos = somente_digitos(valor)
+        return valor
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DECIMAL, DateTime, Text, Enum as SQLEnum, String, Boolean
+from sqlalchemy import Column, Integer, ForeignKey, DECIMAL, DateTime, Text, Enum as SQLEnum, String, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -13,6 +13,10 @@ class TipoMovimentacao(enum.Enum):
 
 class EntradaEstoque(Base):
     __tablename__ = "entradas_estoque"
+    __table_args__ = (
+        Index("ix_entradas_estoque_data_entrada", "data_entrada"),
+        Index("ix_entradas_estoque_produto_data", "produto_id", "data_entrada"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     produto_id = Column(Integer, ForeignKey("produtos.id"), nullable=False)
@@ -31,6 +35,9 @@ class EntradaEstoque(Base):
 
 class Inventario(Base):
     __tablename__ = "inventarios"
+    __table_args__ = (
+        Index("ix_inventarios_produto_id", "produto_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     produto_id = Column(Integer, ForeignKey("produtos.id"), nullable=False)
@@ -46,9 +53,25 @@ class Inventario(Base):
     # Relationships
     produto = relationship("Produto")
 
+class AlertaEstoque(Base):
+    """Produtos abaixo do estoque mínimo ou sem inventário, atualizado a cada alteração de estoque"""
+    __tablename__ = "alertas_estoque"
+
+    produto_id = Column(Integer, ForeignKey("produtos.id"), primary_key=True)
+    quantidade_atual = Column(DECIMAL(10, 3), nullable=True)  # NULL: produto sem inventário
+    estoque_minimo = Column(DECIMAL(10, 2), nullable=False)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    produto = relationship("Produto")
+
 class EstoqueFifo(Base):
     """Controle de estoque FIFO (First In, First Out) para cálculo de custos"""
     __tablename__ = "estoque_fifo"
+    __table_args__ = (
+        Index("ix_estoque_fifo_produto_finalizado_data", "produto_id", "finalizado", "data_entrada"),
+        Index("ix_estoque_fifo_entrada_estoque_id", "entrada_estoque_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     produto_id = Column(Integer, ForeignKey("produtos.id"), nullable=False)
@@ -64,9 +87,23 @@ class EstoqueFifo(Base):
     produto = relationship("Produto")
     entrada_estoque = relationship("EntradaEstoque")
 
+class VersaoFifo(Base):
+    """Contador de versão das camadas FIFO de cada produto (invalidação do cache entre workers)"""
+    __tablename__ = "versoes_fifo"
+
+    produto_id = Column(Integer, ForeignKey("produtos.id"), primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class MovimentacaoCaixa(Base):
     """Registro de movimentações financeiras do estoque"""
     __tablename__ = "movimentacoes_caixa"
+    __table_args__ = (
+        Index("ix_movimentacoes_caixa_data", "data_movimentacao"),
+        Index("ix_movimentacoes_caixa_produto_data", "produto_id", "data_movimentacao"),
+        Index("ix_movimentacoes_caixa_venda_id", "venda_id"),
+        Index("ix_movimentacoes_caixa_entrada_tipo", "entrada_estoque_id", "tipo_movimentacao"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     produto_id = Column(Integer, ForeignKey("produtos.id"), nullable=False)
@@ -88,6 +125,11 @@ class MovimentacaoCaixa(Base):
 class LucroBruto(Base):
     """Cálculo de lucro bruto por venda"""
     __tablename__ = "lucros_brutos"
+    __table_args__ = (
+        Index("ix_lucros_brutos_venda_id", "venda_id"),
+        Index("ix_lucros_brutos_data_calculo", "data_calculo"),
+        Index("ix_lucros_brutos_produto_data", "produto_id", "data_calculo"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     venda_id = Column(Integer, ForeignKey("vendas.id"), nullable=False)
@@ -1,14 +1,22 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Numeric, Enum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Numeric, Enum, Index
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
 
 from app.core.database import Base
 from app.core.enums import TipoMedida
+from app.utils.texto import normalizar_texto
 
 class Produto(Base):
     __tablename__ = "produtos"
+    __table_args__ = (
+        # FULLTEXT com parser ngram no MySQL (busca por trechos); índice comum nos demais bancos
+        Index("ix_produtos_nome_busca", "nome_busca", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String(100), nullable=False, index=True)
+    # Nome normalizado para busca (sem acentos, minúsculo), preenchido a partir de nome
+    nome_busca = Column(String(100), nullable=True)
     descricao = Column(String(255), nullable=True)
     preco_venda = Column(Numeric(10, 2), nullable=False)
     tipo_medida = Column(Enum(TipoMedida), nullable=False, default=TipoMedida.UNIDADE)
@@ -17,3 +25,8 @@ class Produto(Base):
     ativo = Column(Boolean, default=True)
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
     atualizado_em = Column(DateTime(timezone=True), onupdate=func.now())
+
+    @validates("nome")
+    def _atualizar_nome_busca(self, chave, valor):
+        self.nome_busca = normalizar_texto(valor)
+        return valor
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum as SQLEnum, ForeignKey, DECIMAL, Text
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Enum as SQLEnum, ForeignKey, DECIMAL, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -7,11 +7,19 @@ from app.core.enums import TipoMedida, SituacaoPedido, SituacaoPagamento
 
 class Venda(Base):
     __tablename__ = "vendas"
+    __table_args__ = (
+        Index("ix_vendas_data_venda", "data_venda"),
+        Index("ix_vendas_cliente_data", "cliente_id", "data_venda"),
+        Index("ix_vendas_situacao_data", "situacao_pagamento", "data_venda"),
+        Index("ix_vendas_cliente_situacao_data", "cliente_id", "situacao_pagamento", "data_venda"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cliente_id = Column(Integer, ForeignKey("clientes.id"), nullable=True)
     total_venda = Column(DECIMAL(10, 2), nullable=False)
     lucro_bruto_total = Column(DECIMAL(10, 2), nullable=True)
+    # Soma de custo × quantidade dos itens, gravada na criação da venda
+    custo_total = Column(DECIMAL(10, 2), nullable=True)
     situacao_pagamento = Column(SQLEnum(SituacaoPagamento), default=SituacaoPagamento.PENDENTE)
     observacoes = Column(Text, nullable=True)
     data_venda = Column(DateTime(timezone=True), server_default=func.now())
@@ -24,6 +32,10 @@ class Venda(Base):
 
 class ItemVenda(Base):
     __tablename__ = "itens_venda"
+    __table_args__ = (
+        Index("ix_itens_venda_venda_id", "venda_id"),
+        Index("ix_itens_venda_produto_venda", "produto_id", "venda_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     venda_id = Column(Integer, ForeignKey("vendas.id"), nullable=False)
@@ -40,3 +52,51 @@ class ItemVenda(Base):
     # Relationships
     venda = relationship("Venda", back_populates="itens")
     produto = relationship("Produto")
+
+
+class VendaDiaria(Base):
+    """Rollup diário de vendas (dia × cliente × produto), mantido incrementalmente"""
+    __tablename__ = "vendas_diarias"
+    __table_args__ = (
+        UniqueConstraint("data", "cliente_id", "produto_id", name="uq_vendas_diarias_data_cliente_produto"),
+        Index("ix_vendas_diarias_cliente_data", "cliente_id", "data"),
+        Index("ix_vendas_diarias_produto_data", "produto_id", "data"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    data = Column(Date, nullable=False)
+    cliente_id = Column(Integer, ForeignKey("clientes.id"), nullable=True)
+    produto_id = Column(Integer, ForeignKey("produtos.id"), nullable=False)
+    # Cada venda é contada uma única vez, na linha do seu primeiro produto (menor produto_id),
+    # para que SUM(vendas) dê o número de vendas em qualquer agrupamento sem filtro de produto
+    vendas = Column(Integer, nullable=False, default=0)
+    itens = Column(Integer, nullable=False, default=0)
+    quantidade = Column(DECIMAL(14, 3), nullable=False, default=0)
+    valor_total = Column(DECIMAL(14, 2), nullable=False, default=0)
+    valor_pendente = Column(DECIMAL(14, 2), nullable=False, default=0)
+    custo_total = Column(DECIMAL(14, 2), nullable=False, default=0)
+    lucro_bruto = Column(DECIMAL(14, 2), nullable=False, default=0)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    cliente = relationship("Cliente")
+    produto = relationship("Produto")
+
+class SaldoCliente(Base):
+    """Saldo pendente de cada cliente, mantido na mesma transação das vendas"""
+    __tablename__ = "saldos_clientes"
+    __table_args__ = (
+        Index("ix_saldos_clientes_mais_antiga", "venda_pendente_mais_antiga"),
+    )
+
+    cliente_id = Column(Integer, ForeignKey("clientes.id"), primary_key=True)
+    valor_pendente = Column(DECIMAL(14, 2), nullable=False, default=0)
+    vendas_pendentes = Column(Integer, nullable=False, default=0)
+    custo_pendente = Column(DECIMAL(14, 2), nullable=False, default=0)
+    lucro_bruto_pendente = Column(DECIMAL(14, 2), nullable=False, default=0)
+    venda_pendente_mais_antiga = Column(DateTime(timezone=True), nullable=True)
+    venda_pendente_mais_recente = Column(DateTime(timezone=True), nullable=True)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    cliente = relationship("Cliente")
@@ -24,6 +24,12 @@ class EntradaEstoqueBase(BaseModel):
 class EntradaEstoqueCreate(EntradaEstoqueBase):
     pass
 
+class EntradaEstoqueLoteCreate(BaseModel):
+    """Entrega com vários produtos; fornecedor e observações valem para os itens que não os informarem"""
+    fornecedor: Optional[str] = None
+    observacoes: Optional[str] = None
+    itens: List[EntradaEstoqueCreate] = Field(..., min_length=1)
+
 class EntradaEstoque(EntradaEstoqueBase):
     id: int
     valor_total: Decimal
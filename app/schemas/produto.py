@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 
@@ -26,6 +26,10 @@ class ProdutoUpdate(BaseModel):
     estoque_minimo: Optional[Decimal] = Field(None, ge=0)
     ativo: Optional[bool] = None
 
+class ProdutoUsoRequest(BaseModel):
+    """IDs para a verificação de uso em lote (POST /produtos/usage)"""
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
 class Produto(ProdutoBase):
     id: int
     imagem: Optional[str] = None
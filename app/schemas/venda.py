@@ -41,13 +41,18 @@ class VendaBase(BaseModel):
     observacoes: Optional[str] = None
 
 class VendaCreate(VendaBase):
-    itens: List[ItemVendaCreate]
+    itens: List[ItemVendaCreate] = Field(..., min_length=1)
+
+class VendaImportacao(VendaCreate):
+    """Venda recebida na importação em lote (pode trazer a data original do pedido)"""
+    data_venda: Optional[datetime] = None
 
 
 class Venda(VendaBase):
     id: int
     total_venda: Decimal
     lucro_bruto_total: Optional[Decimal] = None
+    custo_total: Optional[Decimal] = None
     situacao_pagamento: SituacaoPagamento
     data_venda: datetime
     cliente_id: Optional[int] = None
@@ -0,0 +1,204 @@
+from collections import OrderedDict
+from datetime import date
+from typing import List
+
+from sqlalchemy import Date, and_, case, extract, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.functions import FunctionElement
+
+from app.core.enums import SituacaoPagamento
+from app.models.cliente import Cliente
+from app.models.venda import Venda, VendaDiaria
+
+
+class inicio_semana(FunctionElement):
+    """Segunda-feira da semana (ISO) de uma data"""
+    type = Date()
+    inherit_cache = True
+
+
+class inicio_mes(FunctionElement):
+    """Primeiro dia do mês de uma data"""
+    type = Date()
+    inherit_cache = True
+
+
+@compiles(inicio_semana)
+def _inicio_semana(elemento, compilador, **kw):
+    return "CAST(date_trunc('week', %s) AS DATE)" % compilador.process(elemento.clauses, **kw)
+
+
+@compiles(inicio_semana, "mysql")
+def _inicio_semana_mysql(elemento, compilador, **kw):
+    data = compilador.process(elemento.clauses, **kw)
+    return "DATE_SUB(%s, INTERVAL WEEKDAY(%s) DAY)" % (data, data)
+
+
+@compiles(inicio_semana, "sqlite")
+def _inicio_semana_sqlite(elemento, compilador, **kw):
+    return "date(%s, 'weekday 0', '-6 days')" % compilador.process(elemento.clauses, **kw)
+
+
+@compiles(inicio_mes)
+def _inicio_mes(elemento, compilador, **kw):
+    return "CAST(date_trunc('month', %s) AS DATE)" % compilador.process(elemento.clauses, **kw)
+
+
+@compiles(inicio_mes, "mysql")
+def _inicio_mes_mysql(elemento, compilador, **kw):
+    data = compilador.process(elemento.clauses, **kw)
+    return "DATE_SUB(%s, INTERVAL DAYOFMONTH(%s) - 1 DAY)" % (data, data)
+
+
+@compiles(inicio_mes, "sqlite")
+def _inicio_mes_sqlite(elemento, compilador, **kw):
+    return "date(%s, 'start of month')" % compilador.process(elemento.clauses, **kw)
+
+
+def inicio_periodo(data, periodo: str):
+    """Expressão SQL com o início do período ("dia", "semana" ou "mes") de uma data"""
+    if periodo == "semana":
+        return inicio_semana(data)
+    if periodo == "mes":
+        return inicio_mes(data)
+    return data
+
+
+def _deslocar_mes(ano: int, mes: int, meses: int) -> tuple:
+    """Desloca (ano, mes) pela quantidade de meses informada (pode ser negativa)"""
+    indice = ano * 12 + (mes - 1) + meses
+    return indice // 12, indice % 12 + 1
+
+
+class AgregacaoVendasService:
+    """Consultas agregadas de vendas usadas pelos dashboards.
+
+    Os totais por período vêm do rollup `vendas_diarias`, cujo custo depende
+    do número de dias no intervalo e não do número de vendas. Só a lista de
+    pendências, que precisa de cada venda, consulta `vendas` diretamente.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def kpis_periodo(self, inicio: date, fim: date) -> dict:
+        """Quantidade, faturamento e lucro bruto das vendas no período (dias inclusivos)"""
+        quantidade, valor_total, lucro_total = self.db.query(
+            func.sum(VendaDiaria.vendas),
+            func.sum(VendaDiaria.valor_total),
+            func.sum(VendaDiaria.lucro_bruto)
+        ).filter(
+            and_(
+                VendaDiaria.data >= inicio,
+                VendaDiaria.data <= fim
+            )
+        ).one()
+
+        quantidade = int(quantidade or 0)
+        valor_total = float(valor_total or 0)
+        return {
+            "total_vendas": quantidade,
+            "valor_total": valor_total,
+            "lucro_bruto_total": float(lucro_total or 0),
+            "ticket_medio": round(valor_total / quantidade, 2) if quantidade > 0 else 0
+        }
+
+    def serie_mensal(self, referencia: date, meses: int = 12) -> "OrderedDict[str, dict]":
+        """Série mensal dos últimos `meses` meses (incluindo o mês de referência)"""
+        ano_inicio, mes_inicio = _deslocar_mes(referencia.year, referencia.month, -(meses - 1))
+        ano_fim, mes_fim = _deslocar_mes(referencia.year, referencia.month, 1)
+
+        ano_col = extract('year', VendaDiaria.data).label('ano')
+        mes_col = extract('month', VendaDiaria.data).label('mes')
+        linhas = self.db.query(
+            ano_col,
+            mes_col,
+            func.sum(VendaDiaria.vendas),
+            func.sum(VendaDiaria.valor_total),
+            func.sum(VendaDiaria.lucro_bruto)
+        ).filter(
+            VendaDiaria.data >= date(ano_inicio, mes_inicio, 1),
+            VendaDiaria.data < date(ano_fim, mes_fim, 1)
+        ).group_by(ano_col, mes_col).all()
+
+        por_mes = {(int(ano), int(mes)): (qtd, valor, lucro) for ano, mes, qtd, valor, lucro in linhas}
+
+        serie = OrderedDict()
+        for i in range(meses):
+            ano_ref, mes_ref = _deslocar_mes(ano_inicio, mes_inicio, i)
+            qtd, valor, lucro = por_mes.get((ano_ref, mes_ref), (0, 0, 0))
+            serie[f"{mes_ref:02d}/{ano_ref}"] = {
+                "quantidade": int(qtd or 0),
+                "valor_total": float(valor or 0),
+                "lucro_bruto_total": float(lucro or 0)
+            }
+        return serie
+
+    def estatisticas_clientes(self) -> dict:
+        """Total de clientes e clientes ativos em uma só consulta"""
+        total, ativos = self.db.query(
+            func.count(Cliente.id),
+            func.sum(case((Cliente.ativo == True, 1), else_=0))
+        ).one()
+
+        total = total or 0
+        ativos = int(ativos or 0)
+        return {
+            "total_clientes": total,
+            "clientes_ativos": ativos,
+            "clientes_inativos": total - ativos
+        }
+
+    def pagamentos_pendentes(self, referencia: date) -> dict:
+        """Vendas pendentes com o nome do cliente carregado no mesmo round trip"""
+        linhas = self.db.query(
+            Venda.id,
+            Venda.total_venda,
+            Venda.data_venda,
+            Cliente.nome
+        ).outerjoin(
+            Cliente, Cliente.id == Venda.cliente_id
+        ).filter(
+            Venda.situacao_pagamento == SituacaoPagamento.PENDENTE
+        ).order_by(Venda.data_venda, Venda.id).all()
+
+        vendas: List[dict] = [
+            {
+                "id": linha.id,
+                "cliente": linha.nome if linha.nome else "Cliente não encontrado",
+                "valor": float(linha.total_venda),
+                "data_venda": linha.data_venda.strftime("%Y-%m-%d %H:%M:%S"),
+                "dias_pendente": (referencia - linha.data_venda.date()).days
+            }
+            for linha in linhas
+        ]
+        return {
+            "quantidade_vendas": len(vendas),
+            "valor_total": sum(v["valor"] for v in vendas),
+            "vendas": vendas
+        }
+
+    def ranking_clientes(self, limite: int = 5) -> List[dict]:
+        """Clientes com maior valor total comprado"""
+        ranking = (
+            self.db.query(
+                Cliente.nome,
+                func.sum(VendaDiaria.vendas).label('qtd_vendas'),
+                func.sum(VendaDiaria.valor_total).label('valor_total'),
+                func.sum(VendaDiaria.lucro_bruto).label('lucro_total')
+            )
+            .join(VendaDiaria, VendaDiaria.cliente_id == Cliente.id)
+            .group_by(Cliente.id, Cliente.nome)
+            .order_by(func.sum(VendaDiaria.valor_total).desc())
+            .limit(limite)
+            .all()
+        )
+        return [
+            {
+                "cliente": r.nome,
+                "qtd_vendas": int(r.qtd_vendas or 0),
+                "valor_total": float(r.valor_total or 0),
+                "lucro_total": float(r.lucro_total or 0)
+            } for r in ranking
+        ]
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from typing import Dict, Iterable
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from app.models.estoque import AlertaEstoque, Inventario
+from app.models.produto import Produto
+
+
+class NotificadorAlertas:
+    """Acorda os streams SSE deste processo quando os alertas mudam (após o commit)"""
+
+    def __init__(self):
+        self._assinantes: Dict[asyncio.Event, asyncio.AbstractEventLoop] = {}
+        self._lock = threading.Lock()
+
+    def assinar(self) -> asyncio.Event:
+        evento = asyncio.Event()
+        with self._lock:
+            self._assinantes[evento] = asyncio.get_running_loop()
+        return evento
+
+    def cancelar(self, evento: asyncio.Event) -> None:
+        with self._lock:
+            self._assinantes.pop(evento, None)
+
+    def notificar(self) -> None:
+        with self._lock:
+            assinantes = list(self._assinantes.items())
+        for evento, loop in assinantes:
+            loop.call_soon_threadsafe(evento.set)
+
+
+notificador_alertas = NotificadorAlertas()
+
+
+class AlertaEstoqueService:
+    """Manutenção de `alertas_estoque`: um registro por produto em alerta.
+
+    Os pontos que alteram inventário ou estoque mínimo chamam `atualizar` com
+    os produtos afetados, na mesma transação; a leitura dos alertas não precisa
+    comparar todo o inventário.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def atualizar(self, produto_ids: Iterable[int]) -> None:
+        """Recalcula os alertas dos produtos informados (sem commit)"""
+        produto_ids = set(produto_ids)
+        if not produto_ids:
+            return
+        self.db.flush()
+
+        situacao = {}
+        for produto_id, estoque_minimo, quantidade_atual in self.db.query(
+            Produto.id, Produto.estoque_minimo, Inventario.quantidade_atual
+        ).outerjoin(
+            Inventario, Inventario.produto_id == Produto.id
+        ).filter(Produto.id.in_(produto_ids)).order_by(Inventario.id):
+            situacao.setdefault(produto_id, (estoque_minimo, quantidade_atual))
+
+        self.db.query(AlertaEstoque).filter(
+            AlertaEstoque.produto_id.in_(produto_ids)
+        ).delete(synchronize_session=False)
+        alertas = [
+            {"produto_id": produto_id, "quantidade_atual": quantidade_atual, "estoque_minimo": estoque_minimo}
+            for produto_id, (estoque_minimo, quantidade_atual) in situacao.items()
+            if quantidade_atual is None or quantidade_atual < estoque_minimo
+        ]
+        if alertas:
+            self.db.execute(insert(AlertaEstoque), alertas)
+        self.db.info["alertas_estoque_alterados"] = True
+
+    def remover_produto(self, produto_id: int) -> None:
+        """Retira o alerta de um produto que está sendo excluído"""
+        self.db.query(AlertaEstoque).filter(
+            AlertaEstoque.produto_id == produto_id
+        ).delete(synchronize_session=False)
+        self.db.info["alertas_estoque_alterados"] = True
+
+    def listar(self) -> dict:
+        """Alertas atuais, separados em estoque baixo e sem inventário"""
+        alertas = self.db.query(AlertaEstoque, Produto.nome).join(
+            Produto, Produto.id == AlertaEstoque.produto_id
+        ).order_by(AlertaEstoque.produto_id).all()
+        return {
+            "produtos_estoque_baixo": [
+                {
+                    "produto": nome,
+                    "produto_id": alerta.produto_id,
+                    "quantidade_atual": alerta.quantidade_atual,
+                    "estoque_minimo": alerta.estoque_minimo
+                }
+                for alerta, nome in alertas if alerta.quantidade_atual is not None
+            ],
+            "produtos_sem_estoque": [
+                {
+                    "produto": nome,
+                    "produto_id": alerta.produto_id,
+                    "estoque_minimo": alerta.estoque_minimo
+                }
+                for alerta, nome in alertas if alerta.quantidade_atual is None
+            ]
+        }
+
+    def reconstruir(self) -> int:
+        """Recalcula a tabela para todos os produtos (backfill). Retorna o número de alertas"""
+        self.db.query(AlertaEstoque).delete(synchronize_session=False)
+        self.atualizar(produto_id for (produto_id,) in self.db.query(Produto.id))
+        self.db.commit()
+        return self.db.query(AlertaEstoque).count()
+
+
+@event.listens_for(Session, "after_commit")
+def _alertas_estoque_after_commit(session: Session) -> None:
+    if session.info.pop("alertas_estoque_alterados", False):
+        notificador_alertas.notificar()
+
+
+@event.listens_for(Session, "after_rollback")
+def _alertas_estoque_after_rollback(session: Session) -> None:
+    session.info.pop("alertas_estoque_alterados", None)
@@ -0,0 +1,127 @@
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.cliente import Cliente
+from app.models.produto import Produto
+from app.utils.texto import normalizar_texto
+
+# (texto normalizado a partir de uma palavra, id)
+Chave = Tuple[str, int]
+
+
+class IndicePrefixos:
+    """Autocomplete em memória por prefixo, sem acentos e sem diferenciar maiúsculas.
+
+    Para cada campo de texto guarda o nome normalizado inteiro e o trecho a
+    partir de cada palavra seguinte ("casa do ze" -> "do ze", "ze"), em listas
+    ordenadas; a busca é um bisect seguido da leitura dos vizinhos. Montado na
+    inicialização e mantido pelos endpoints de cadastro após o commit; o índice
+    é local a cada processo.
+    """
+
+    def __init__(self, modelo, campos: Tuple[str, ...]):
+        self.modelo = modelo
+        self.campos = campos
+        # Início do texto (preferido) e início das demais palavras
+        self._inicios: List[Chave] = []
+        self._palavras: List[Chave] = []
+        # id -> (dados devolvidos, ativo, chaves de início, chaves de palavras)
+        self._registros: Dict[int, Tuple[dict, bool, List[Chave], List[Chave]]] = {}
+        self._carregado = False
+        self._lock = threading.Lock()
+
+    @property
+    def carregado(self) -> bool:
+        return self._carregado
+
+    def carregar(self, db: Session) -> None:
+        """Monta o índice a partir da tabela (inicialização ou primeiro uso)"""
+        colunas = [self.modelo.id, self.modelo.ativo] + [getattr(self.modelo, campo) for campo in self.campos]
+        with self._lock:
+            self._inicios, self._palavras, self._registros = [], [], {}
+            for registro_id, ativo, *valores in db.execute(select(*colunas)):
+                self._incluir(registro_id, ativo, valores, ordenar=False)
+            self._inicios.sort()
+            self._palavras.sort()
+            self._carregado = True
+
+    def atualizar(self, objeto) -> None:
+        """Registra a versão atual de um objeto criado ou alterado (após o commit)"""
+        with self._lock:
+            if not self._carregado:
+                return
+            self._remover(objeto.id)
+            self._incluir(objeto.id, objeto.ativo, [getattr(objeto, campo) for campo in self.campos])
+
+    def remover(self, registro_id: int) -> None:
+        """Retira um registro excluído (após o commit)"""
+        with self._lock:
+            if self._carregado:
+                self._remover(registro_id)
+
+    def buscar(self, termo: str, limite: int, incluir_inativos: bool = False) -> List[dict]:
+        """Até `limite` registros cujo texto (ou alguma palavra dele) começa com o termo"""
+        prefixo = normalizar_texto(termo)
+        if not prefixo:
+            return []
+        resultado: Dict[int, dict] = {}
+        with self._lock:
+            for chaves in (self._inicios, self._palavras):
+                posicao = bisect_left(chaves, (prefixo,))
+                while posicao < len(chaves) and len(resultado) < limite:
+                    texto, registro_id = chaves[posicao]
+                    if not texto.startswith(prefixo):
+                        break
+                    dados, ativo, _, _ = self._registros[registro_id]
+                    if (ativo or incluir_inativos) and registro_id not in resultado:
+                        resultado[registro_id] = dados
+                    posicao += 1
+        return list(resultado.values())
+
+    def _incluir(self, registro_id: int, ativo: Optional[bool], valores: list, ordenar: bool = True) -> None:
+        inicios, palavras = [], []
+        for valor in valores:
+            texto = normalizar_texto(valor)
+            if not texto:
+                continue
+            inicios.append((texto, registro_id))
+            posicao = texto.find(" ")
+            while posicao != -1:
+                palavras.append((texto[posicao + 1:], registro_id))
+                posicao = texto.find(" ", posicao + 1)
+
+        for destino, chaves in ((self._inicios, inicios), (self._palavras, palavras)):
+            for chave in chaves:
+                if ordenar:
+                    insort(destino, chave)
+                else:
+                    destino.append(chave)
+
+        dados = {"id": registro_id}
+        dados.update(zip(self.campos, valores))
+        self._registros[registro_id] = (dados, ativo is not False, inicios, palavras)
+
+    def _remover(self, registro_id: int) -> None:
+        registro = self._registros.pop(registro_id, None)
+        if registro is None:
+            return
+        _, _, inicios, palavras = registro
+        for destino, chaves in ((self._inicios, inicios), (self._palavras, palavras)):
+            for chave in chaves:
+                posicao = bisect_left(destino, chave)
+                if posicao < len(destino) and destino[posicao] == chave:
+                    del destino[posicao]
+
+
+autocomplete_clientes = IndicePrefixos(Cliente, ("nome", "nome_fantasia"))
+autocomplete_produtos = IndicePrefixos(Produto, ("nome",))
+
+
+def carregar_autocomplete(db: Session) -> None:
+    """Monta os índices de clientes e produtos"""
+    autocomplete_clientes.carregar(db)
+    autocomplete_produtos.carregar(db)
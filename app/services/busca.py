@@ -0,0 +1,196 @@
+import threading
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import and_, event, select, true
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+
+from app.models.cliente import Cliente
+from app.models.produto import Produto
+from app.utils.texto import palavras_busca, somente_digitos
+
+# Menor palavra pesquisável pelo MATCH (ngram_token_size padrão do MySQL);
+# palavras menores são filtradas com LIKE sobre as linhas já encontradas
+TAMANHO_NGRAM = 2
+
+# Acima disso o filtro do índice em memória vira LIKE na coluna normalizada,
+# em vez de um IN com milhares de parâmetros
+LIMITE_IDS_FILTRO = 500
+
+
+def _trigramas(texto: str) -> Set[str]:
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceTrigramas:
+    """Índice de trigramas em memória sobre a coluna `nome_busca` de um modelo.
+
+    Alternativa ao FULLTEXT para bancos sem ele (SQLite em desenvolvimento e
+    testes). Carregado na primeira busca e mantido pelas escritas feitas neste
+    processo (após o commit), então serve a uma instalação com um só worker.
+    """
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self._textos: Optional[Dict[int, str]] = None
+        self._trigramas: Dict[str, Set[int]] = {}
+        # Alterações confirmadas enquanto a carga lê o banco
+        self._pendentes: Optional[Dict[int, Optional[str]]] = None
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()
+
+    def carregar(self, db: Session) -> None:
+        """Lê todos os textos da tabela, se o índice ainda não foi carregado"""
+        if self._textos is not None:
+            return
+        with self._lock_carga:
+            if self._textos is not None:
+                return
+            with self._lock:
+                self._pendentes = {}
+            linhas = db.execute(select(self.modelo.id, self.modelo.nome_busca)).all()
+            with self._lock:
+                self._textos = {}
+                self._trigramas = {}
+                for registro_id, texto in linhas:
+                    self._incluir(registro_id, texto or "")
+                for registro_id, texto in self._pendentes.items():
+                    self._substituir(registro_id, texto)
+                self._pendentes = None
+
+    def aplicar(self, alteracoes: Dict[int, Optional[str]]) -> None:
+        """Texto atual de cada registro alterado (None: excluído)"""
+        with self._lock:
+            if self._textos is not None:
+                for registro_id, texto in alteracoes.items():
+                    self._substituir(registro_id, texto)
+            elif self._pendentes is not None:
+                self._pendentes.update(alteracoes)
+
+    def buscar(self, palavras: List[str]) -> List[int]:
+        """IDs cujo texto contém todas as palavras (como trecho), em ordem"""
+        with self._lock:
+            conjuntos = [
+                self._trigramas.get(trigrama, set())
+                for palavra in palavras
+                for trigrama in _trigramas(palavra)
+            ]
+            if conjuntos:
+                conjuntos.sort(key=len)
+                candidatos = set(conjuntos[0])
+                for conjunto in conjuntos[1:]:
+                    if not candidatos:
+                        break
+                    candidatos &= conjunto
+            else:
+                # Só palavras com menos de 3 letras: confere todos os textos
+                candidatos = self._textos.keys()
+            return sorted(
+                registro_id for registro_id in candidatos
+                if all(palavra in self._textos[registro_id] for palavra in palavras)
+            )
+
+    def _substituir(self, registro_id: int, texto: Optional[str]) -> None:
+        self._remover(registro_id)
+        if texto is not None:
+            self._incluir(registro_id, texto)
+
+    def _incluir(self, registro_id: int, texto: str) -> None:
+        self._textos[registro_id] = texto
+        for trigrama in _trigramas(texto):
+            self._trigramas.setdefault(trigrama, set()).add(registro_id)
+
+    def _remover(self, registro_id: int) -> None:
+        texto = self._textos.pop(registro_id, None)
+        if texto is None:
+            return
+        for trigrama in _trigramas(texto):
+            ids = self._trigramas.get(trigrama)
+            if ids is not None:
+                ids.discard(registro_id)
+                if not ids:
+                    del self._trigramas[trigrama]
+
+
+indices_busca = {
+    Cliente: IndiceTrigramas(Cliente),
+    Produto: IndiceTrigramas(Produto),
+}
+
+
+class BuscaService:
+    """Filtros de busca por nome (clientes e produtos) e por CPF/CNPJ.
+
+    O termo é normalizado como a coluna `nome_busca` (sem acentos, minúsculo)
+    e cada palavra precisa aparecer como trecho do nome. No MySQL o filtro usa
+    o índice FULLTEXT (parser ngram); nos demais bancos, o índice de trigramas
+    em memória.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def filtro_clientes(self, termo: str):
+        """Condição WHERE para clientes cujo nome ou nome fantasia contém o termo"""
+        return self._filtro_nome(Cliente, termo)
+
+    def filtro_produtos(self, termo: str):
+        """Condição WHERE para produtos cujo nome contém o termo"""
+        return self._filtro_nome(Produto, termo)
+
+    @staticmethod
+    def filtro_documento(termo: str):
+        """Condição WHERE por CPF/CNPJ: prefixo dos dígitos, com ou sem pontuação"""
+        digitos = somente_digitos(termo)
+        if not digitos:
+            return Cliente.cpf_ou_cnpj.ilike(f"%{termo}%")
+        return Cliente.cpf_ou_cnpj_digitos.like(f"{digitos}%")
+
+    def _filtro_nome(self, modelo, termo: str):
+        palavras = palavras_busca(termo)
+        if not palavras:
+            return true()
+
+        if self.db.get_bind().dialect.name == "mysql":
+            longas = [palavra for palavra in palavras if len(palavra) >= TAMANHO_NGRAM]
+            condicoes = [modelo.nome_busca.like(f"%{palavra}%") for palavra in palavras if len(palavra) < TAMANHO_NGRAM]
+            if longas:
+                # Modo booleano: todas as palavras obrigatórias, cada uma como frase de ngrams
+                termo_fulltext = " ".join(f'+"{palavra}"' for palavra in longas)
+                condicoes.insert(0, match(modelo.nome_busca, against=termo_fulltext).in_boolean_mode())
+            return and_(*condicoes)
+
+        indice = indices_busca[modelo]
+        indice.carregar(self.db)
+        ids = indice.buscar(palavras)
+        if len(ids) > LIMITE_IDS_FILTRO:
+            return and_(*[modelo.nome_busca.like(f"%{palavra}%") for palavra in palavras])
+        return modelo.id.in_(ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _busca_after_flush(session: Session, contexto) -> None:
+    pendentes = None
+    for objeto in list(session.new) + list(session.dirty) + list(session.deleted):
+        if type(objeto) not in indices_busca:
+            continue
+        if objeto in session.deleted:
+            texto = None
+        elif "nome_busca" in objeto.__dict__:
+            texto = objeto.__dict__["nome_busca"] or ""
+        else:
+            continue
+        if pendentes is None:
+            pendentes = session.info.setdefault("busca_pendente", {})
+        pendentes.setdefault(type(objeto), {})[objeto.id] = texto
+
+
+@event.listens_for(Session, "after_commit")
+def _busca_after_commit(session: Session) -> None:
+    for modelo, alteracoes in session.info.pop("busca_pendente", {}).items():
+        indices_busca[modelo].aplicar(alteracoes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _busca_after_rollback(session: Session) -> None:
+    session.info.pop("busca_pendente", None)
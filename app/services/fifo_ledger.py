@@ -0,0 +1,283 @@
+import threading
+import time
+from array import array
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, desc, event, insert, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.estoque import EstoqueFifo, VersaoFifo
+
+# Quantidades têm 3 casas decimais e custos 2: guardamos inteiros exatos
+ESCALA_QUANTIDADE = 1000
+ESCALA_CUSTO = 100
+
+
+def _para_milesimos(quantidade) -> int:
+    return int((Decimal(quantidade) * ESCALA_QUANTIDADE).to_integral_value())
+
+
+def _para_centavos(valor) -> int:
+    return int((Decimal(valor) * ESCALA_CUSTO).to_integral_value())
+
+
+def _para_decimal(milesimos_x_centavos: int) -> Decimal:
+    return Decimal(milesimos_x_centavos) / (ESCALA_QUANTIDADE * ESCALA_CUSTO)
+
+
+class CamadasProduto:
+    """Camadas FIFO abertas de um produto, em ordem de consumo.
+
+    Fila compacta sobre arrays de inteiros (id, quantidade em milésimos,
+    custo em centavos); `inicio` aponta para a primeira camada ainda aberta.
+    """
+
+    __slots__ = ("ids", "quantidades", "custos", "inicio", "ultimo_custo", "versao", "verificado_em")
+
+    def __init__(self, versao: int):
+        self.ids = array("q")
+        self.quantidades = array("q")
+        self.custos = array("q")
+        self.inicio = 0
+        self.ultimo_custo = None
+        self.versao = versao
+        self.verificado_em = time.monotonic()
+
+    def adicionar(self, camada_id: int, quantidade: int, custo: int) -> None:
+        self.ids.append(camada_id)
+        self.quantidades.append(quantidade)
+        self.custos.append(custo)
+        self.ultimo_custo = custo
+
+    def remover(self, camada_id: int) -> None:
+        for i in range(self.inicio, len(self.ids)):
+            if self.ids[i] == camada_id:
+                del self.ids[i], self.quantidades[i], self.custos[i]
+                return
+
+    def consumir(self, quantidade: int) -> None:
+        i = self.inicio
+        while quantidade > 0 and i < len(self.ids):
+            usada = min(quantidade, self.quantidades[i])
+            self.quantidades[i] -= usada
+            quantidade -= usada
+            if self.quantidades[i] <= 0:
+                i += 1
+        self.inicio = i
+        self._compactar()
+
+    def custo(self, quantidade: int) -> int:
+        """Custo (milésimos × centavos) de `quantidade` sem alterar as camadas"""
+        total = 0
+        for i in range(self.inicio, len(self.ids)):
+            if quantidade <= 0:
+                break
+            usada = min(quantidade, self.quantidades[i])
+            total += usada * self.custos[i]
+            quantidade -= usada
+        if quantidade > 0 and self.ultimo_custo is not None:
+            total += quantidade * self.ultimo_custo
+        return total
+
+    def valor(self, quantidade: int) -> int:
+        """Valor das primeiras `quantidade` unidades em estoque (sem custo de reposição)"""
+        total = 0
+        for i in range(self.inicio, len(self.ids)):
+            if quantidade <= 0:
+                break
+            usada = min(quantidade, self.quantidades[i])
+            total += usada * self.custos[i]
+            quantidade -= usada
+        return total
+
+    def _compactar(self) -> None:
+        if self.inicio and self.inicio * 2 >= len(self.ids):
+            del self.ids[:self.inicio], self.quantidades[:self.inicio], self.custos[:self.inicio]
+            self.inicio = 0
+
+
+class FifoLedger:
+    """Cache por processo das camadas FIFO abertas de cada produto.
+
+    As camadas são carregadas sob demanda e atualizadas (write-through) pelos
+    pontos que alteram o FIFO. Cada alteração incrementa `versoes_fifo.versao`
+    na mesma transação; outros workers percebem a mudança ao comparar a versão,
+    o que é feito no máximo a cada FIFO_LEDGER_TTL_SECONDS por produto. Dentro
+    desse intervalo as consultas de custo não vão ao banco.
+    """
+
+    def __init__(self, ttl: float = settings.FIFO_LEDGER_TTL_SECONDS):
+        self.ttl = ttl
+        self._produtos: Dict[int, CamadasProduto] = {}
+        self._lock = threading.Lock()
+
+    # Leitura
+
+    def cotar_custo(self, db: Session, produto_id: int, quantidade) -> Decimal:
+        """Custo FIFO de uma quantidade, sem consumir estoque"""
+        camadas = self._obter(db, produto_id)
+        with self._lock:
+            return _para_decimal(camadas.custo(_para_milesimos(quantidade)))
+
+    def valor_estoque(self, db: Session, produto_id: int, quantidade) -> Decimal:
+        """Valor FIFO das primeiras `quantidade` unidades em estoque"""
+        camadas = self._obter(db, produto_id)
+        with self._lock:
+            return _para_decimal(camadas.valor(_para_milesimos(quantidade)))
+
+    # Escrita (write-through, aplicada ao cache somente após o commit)
+
+    def registrar_entrada(self, db: Session, produto_id: int, camada_id: int, quantidade, custo) -> None:
+        self.registrar_entradas(db, [(produto_id, camada_id, quantidade, custo)])
+
+    def registrar_entradas(self, db: Session, novas_camadas: Iterable[Tuple[int, int, object, object]]) -> None:
+        """Registra várias camadas novas (produto_id, camada_id, quantidade, custo) de uma vez"""
+        por_produto: Dict[int, List[Tuple[int, int, int]]] = {}
+        for produto_id, camada_id, quantidade, custo in novas_camadas:
+            por_produto.setdefault(produto_id, []).append(
+                (camada_id, _para_milesimos(quantidade), _para_centavos(custo))
+            )
+
+        def adicionar(camadas_novas):
+            def aplicar(camadas: CamadasProduto) -> None:
+                for camada in camadas_novas:
+                    camadas.adicionar(*camada)
+            return aplicar
+        self._alterar(db, {produto_id: adicionar(camadas) for produto_id, camadas in por_produto.items()})
+
+    def registrar_consumo(self, db: Session, consumos: Iterable[Tuple[int, object]]) -> None:
+        """Registra saídas (produto_id, quantidade) já aplicadas às camadas no banco"""
+        por_produto: Dict[int, int] = {}
+        for produto_id, quantidade in consumos:
+            por_produto[produto_id] = por_produto.get(produto_id, 0) + _para_milesimos(quantidade)
+        self._alterar(db, {
+            produto_id: lambda camadas, q=quantidade: camadas.consumir(q)
+            for produto_id, quantidade in por_produto.items()
+        })
+
+    def remover_entrada(self, db: Session, produto_id: int, camada_ids: List[int]) -> None:
+        def remover(camadas: CamadasProduto) -> None:
+            for camada_id in camada_ids:
+                camadas.remover(camada_id)
+        self._alterar(db, {produto_id: remover})
+
+    def remover_produto(self, db: Session, produto_id: int) -> None:
+        """Apaga a versão de um produto que está sendo excluído (sem commit).
+
+        A linha de `versoes_fifo` referencia o produto e impediria a exclusão;
+        o cache local é descartado após o commit.
+        """
+        db.execute(delete(VersaoFifo).where(VersaoFifo.produto_id == produto_id))
+        db.info.setdefault("fifo_ledger_pendente", []).append((produto_id, 0, None))
+
+    def registrar_alteracao(self, db: Session, produto_ids: Iterable[int]) -> None:
+        """Para alterações sem equivalente local (ex.: estorno): descarta o cache após o commit"""
+        self._alterar(db, dict.fromkeys(produto_ids))
+
+    def invalidar(self, produto_id: Optional[int] = None) -> None:
+        with self._lock:
+            if produto_id is None:
+                self._produtos.clear()
+            else:
+                self._produtos.pop(produto_id, None)
+
+    # Internos
+
+    def _obter(self, db: Session, produto_id: int) -> CamadasProduto:
+        with self._lock:
+            camadas = self._produtos.get(produto_id)
+        agora = time.monotonic()
+        if camadas is not None and agora - camadas.verificado_em < self.ttl:
+            return camadas
+
+        versao = db.query(VersaoFifo.versao).filter(VersaoFifo.produto_id == produto_id).scalar() or 0
+        if camadas is not None and camadas.versao == versao:
+            camadas.verificado_em = agora
+            return camadas
+
+        return self._carregar(db, produto_id, versao)
+
+    def _carregar(self, db: Session, produto_id: int, versao: int) -> CamadasProduto:
+        linhas = db.query(
+            EstoqueFifo.id,
+            EstoqueFifo.quantidade_restante,
+            EstoqueFifo.preco_custo_unitario
+        ).filter(
+            and_(
+                EstoqueFifo.produto_id == produto_id,
+                EstoqueFifo.finalizado == False,
+                EstoqueFifo.quantidade_restante > 0
+            )
+        ).order_by(EstoqueFifo.data_entrada, EstoqueFifo.id).all()
+
+        ultimo_custo = db.query(EstoqueFifo.preco_custo_unitario).filter(
+            EstoqueFifo.produto_id == produto_id
+        ).order_by(desc(EstoqueFifo.data_entrada), desc(EstoqueFifo.id)).limit(1).scalar()
+
+        camadas = CamadasProduto(versao)
+        for camada_id, quantidade, custo in linhas:
+            camadas.adicionar(camada_id, _para_milesimos(quantidade), _para_centavos(custo))
+        camadas.ultimo_custo = _para_centavos(ultimo_custo) if ultimo_custo is not None else None
+
+        with self._lock:
+            self._produtos[produto_id] = camadas
+        return camadas
+
+    def _alterar(self, db: Session, alteracoes: Dict[int, Optional[Callable[[CamadasProduto], None]]]) -> None:
+        """Incrementa a versão dos produtos no banco e agenda as alterações locais para depois do commit.
+
+        Todos os produtos são tratados com um UPDATE, uma leitura das versões e,
+        para produtos ainda sem versão, um INSERT em lote.
+        """
+        if not alteracoes:
+            return
+        produto_ids = sorted(alteracoes)
+        db.execute(
+            update(VersaoFifo)
+            .where(VersaoFifo.produto_id.in_(produto_ids))
+            .values(versao=VersaoFifo.versao + 1)
+        )
+        # As linhas ficam travadas pelo UPDATE até o commit, então as versões lidas são as que serão gravadas
+        versoes = dict(db.query(VersaoFifo.produto_id, VersaoFifo.versao).filter(
+            VersaoFifo.produto_id.in_(produto_ids)
+        ).all())
+        novos = [produto_id for produto_id in produto_ids if produto_id not in versoes]
+        if novos:
+            db.execute(insert(VersaoFifo), [{"produto_id": produto_id, "versao": 1} for produto_id in novos])
+            versoes.update(dict.fromkeys(novos, 1))
+
+        pendentes = db.info.setdefault("fifo_ledger_pendente", [])
+        for produto_id in produto_ids:
+            pendentes.append((produto_id, versoes[produto_id], alteracoes[produto_id]))
+
+    def _aplicar_pendentes(self, pendentes) -> None:
+        with self._lock:
+            for produto_id, nova_versao, alteracao in pendentes:
+                camadas = self._produtos.get(produto_id)
+                if camadas is None:
+                    continue
+                if alteracao is None or camadas.versao != nova_versao - 1:
+                    # Outro worker alterou o produto antes: recarregar na próxima leitura
+                    del self._produtos[produto_id]
+                    continue
+                alteracao(camadas)
+                camadas.versao = nova_versao
+                camadas.verificado_em = time.monotonic()
+
+
+fifo_ledger = FifoLedger()
+
+
+@event.listens_for(Session, "after_commit")
+def _fifo_ledger_after_commit(session: Session) -> None:
+    pendentes = session.info.pop("fifo_ledger_pendente", None)
+    if pendentes:
+        fifo_ledger._aplicar_pendentes(pendentes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _fifo_ledger_after_rollback(session: Session) -> None:
+    for produto_id, _, _ in session.info.pop("fifo_ledger_pendente", []):
+        fifo_ledger.invalidar(produto_id)
@@ -1,12 +1,14 @@
-from typing import List, Tuple
+from collections import defaultdict, deque
+from typing import List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy import and_, case, desc, func, insert, update
 from decimal import Decimal
 from datetime import datetime
 
 from app.models.estoque import EstoqueFifo, MovimentacaoCaixa, LucroBruto, EntradaEstoque, TipoMovimentacao
 from app.models.venda import Venda, ItemVenda
 from app.models.produto import Produto
+from app.services.fifo_ledger import fifo_ledger
 
 class FluxoCaixaService:
     """Serviço para gerenciar fluxo de caixa com controle FIFO"""
@@ -26,6 +28,10 @@ class FluxoCaixaService:
             finalizado=False
         )
         self.db.add(estoque_fifo)
+        self.db.flush()
+        fifo_ledger.registrar_entrada(
+            self.db, entrada.produto_id, estoque_fifo.id, entrada.quantidade, entrada.preco_custo
+        )
         
         # Registrar movimentação de caixa (entrada)
         movimentacao = MovimentacaoCaixa(
@@ -40,91 +46,172 @@ class FluxoCaixaService:
         self.db.add(movimentacao)
         self.db.commit()
     
-    def processar_venda_separada(self, venda: Venda) -> List[LucroBruto]:
-        """Processa venda separada aplicando FIFO e calculando lucro bruto"""
-        lucros = []
+    def registrar_entradas_estoque(self, entradas: List[EntradaEstoque]) -> None:
+        """Registra várias entradas de estoque no controle FIFO com comandos em lote.
         
-        for item in venda.itens:
-            if item.quantidade_real and item.quantidade_real > 0:
-                lucro = self._calcular_custo_fifo(venda, item)
-                if lucro:
-                    lucros.append(lucro)
+        Camadas FIFO e movimentações de caixa são gravadas com um INSERT cada e os
+        IDs das camadas, usados pelo ledger, são lidos em uma única consulta. O
+        commit fica a cargo de quem chama, junto com as próprias entradas.
+        """
+        if not entradas:
+            return
         
-        return lucros
+        self.db.execute(insert(EstoqueFifo), [
+            {
+                "produto_id": entrada.produto_id,
+                "entrada_estoque_id": entrada.id,
+                "quantidade_restante": entrada.quantidade,
+                "preco_custo_unitario": entrada.preco_custo,
+                "data_entrada": entrada.data_entrada,
+                "finalizado": False
+            }
+            for entrada in entradas
+        ])
+        camadas = self.db.query(
+            EstoqueFifo.id,
+            EstoqueFifo.produto_id,
+            EstoqueFifo.quantidade_restante,
+            EstoqueFifo.preco_custo_unitario
+        ).filter(
+            EstoqueFifo.entrada_estoque_id.in_([entrada.id for entrada in entradas])
+        ).order_by(EstoqueFifo.id).all()
+        fifo_ledger.registrar_entradas(self.db, [
+            (camada.produto_id, camada.id, camada.quantidade_restante, camada.preco_custo_unitario)
+            for camada in camadas
+        ])
+        
+        self.db.execute(insert(MovimentacaoCaixa), [
+            {
+                "produto_id": entrada.produto_id,
+                "entrada_estoque_id": entrada.id,
+                "tipo_movimentacao": TipoMovimentacao.ENTRADA,
+                "quantidade": entrada.quantidade,
+                "preco_unitario": entrada.preco_custo,
+                "valor_total": entrada.valor_total,
+                "observacoes": f"Entrada de estoque - {entrada.fornecedor or 'Não informado'}"
+            }
+            for entrada in entradas
+        ])
     
-    def _calcular_custo_fifo(self, venda: Venda, item: ItemVenda) -> LucroBruto:
-        """Calcula custo usando método FIFO e gera registro de lucro bruto"""
-        quantidade_pendente = item.quantidade_real
-        custo_total = Decimal('0')
+    def processar_venda_separada(self, venda: Venda) -> List[dict]:
+        """Processa venda separada aplicando FIFO e calculando lucro bruto"""
+        return self.processar_venda(venda)
+    
+    def processar_venda(self, venda: Venda, itens: Optional[List[ItemVenda]] = None) -> List[dict]:
+        """Aplica FIFO a todos os itens da venda em uma única transação.
         
-        # Buscar estoques FIFO não finalizados, ordenados por data de entrada (FIFO)
-        estoques_fifo = self.db.query(EstoqueFifo).filter(
+        As camadas abertas de todos os produtos do pedido são lidas (e travadas)
+        em uma só consulta, consumidas em memória e gravadas com comandos em lote,
+        junto com os registros de lucro bruto e as movimentações de caixa.
+        Retorna os valores dos registros de lucro bruto criados.
+        """
+        itens = [item for item in (itens if itens is not None else venda.itens) if item.quantidade and item.quantidade > 0]
+        if not itens:
+            return []
+        
+        produto_ids = sorted({item.produto_id for item in itens})
+        
+        # Camadas FIFO abertas de todos os produtos, na ordem de consumo
+        camadas = self.db.query(
+            EstoqueFifo.id,
+            EstoqueFifo.produto_id,
+            EstoqueFifo.quantidade_restante,
+            EstoqueFifo.preco_custo_unitario
+        ).filter(
             and_(
-                EstoqueFifo.produto_id == item.produto_id,
+                EstoqueFifo.produto_id.in_(produto_ids),
                 EstoqueFifo.finalizado == False,
                 EstoqueFifo.quantidade_restante > 0
             )
-        ).order_by(EstoqueFifo.data_entrada).all()
+        ).order_by(
+            EstoqueFifo.produto_id, EstoqueFifo.data_entrada, EstoqueFifo.id
+        ).with_for_update().all()
         
-        # Aplicar FIFO para calcular custo
-        for estoque in estoques_fifo:
-            if quantidade_pendente <= 0:
-                break
-            
-            quantidade_usada = min(quantidade_pendente, estoque.quantidade_restante)
-            custo_parcial = quantidade_usada * estoque.preco_custo_unitario
-            custo_total += custo_parcial
-            
-            # Atualizar estoque FIFO
-            estoque.quantidade_restante -= quantidade_usada
-            if estoque.quantidade_restante <= 0:
-                estoque.finalizado = True
-            
-            quantidade_pendente -= quantidade_usada
+        camadas_por_produto = defaultdict(deque)
+        for camada in camadas:
+            camadas_por_produto[camada.produto_id].append(
+                [camada.id, camada.quantidade_restante, camada.preco_custo_unitario]
+            )
         
-        if quantidade_pendente > 0:
-            # Se ainda há quantidade pendente, usar custo médio dos últimos estoques
-            ultimo_estoque = self.db.query(EstoqueFifo).filter(
-                EstoqueFifo.produto_id == item.produto_id
-            ).order_by(desc(EstoqueFifo.data_entrada)).first()
+        camadas_alteradas = {}
+        itens_sem_saldo = []
+        custos = []
+        consumos = []
+        for item in itens:
+            quantidade_pendente = item.quantidade
+            custo_total = Decimal('0')
+            fila = camadas_por_produto[item.produto_id]
             
-            if ultimo_estoque:
-                custo_restante = quantidade_pendente * ultimo_estoque.preco_custo_unitario
-                custo_total += custo_restante
+            # Aplicar FIFO para calcular custo
+            while quantidade_pendente > 0 and fila:
+                camada = fila[0]
+                quantidade_usada = min(quantidade_pendente, camada[1])
+                custo_total += quantidade_usada * camada[2]
+                camada[1] -= quantidade_usada
+                quantidade_pendente -= quantidade_usada
+                camadas_alteradas[camada[0]] = camada
+                if camada[1] <= 0:
+                    fila.popleft()
+            
+            custos.append([item, custo_total, quantidade_pendente])
+            consumos.append((item.produto_id, item.quantidade - quantidade_pendente))
+            if quantidade_pendente > 0:
+                itens_sem_saldo.append(item.produto_id)
         
-        # Calcular receita total
-        receita_total = item.quantidade_real * item.valor_unitario
+        if itens_sem_saldo:
+            # Quantidade sem saldo FIFO usa o custo da entrada mais recente do produto
+            ultimos_custos = {}
+            for produto_id, preco in self.db.query(
+                EstoqueFifo.produto_id, EstoqueFifo.preco_custo_unitario
+            ).filter(
+                EstoqueFifo.produto_id.in_(set(itens_sem_saldo))
+            ).order_by(EstoqueFifo.produto_id, desc(EstoqueFifo.data_entrada), desc(EstoqueFifo.id)):
+                ultimos_custos.setdefault(produto_id, preco)
+            for custo in custos:
+                item, _, quantidade_pendente = custo
+                if quantidade_pendente > 0 and item.produto_id in ultimos_custos:
+                    custo[1] += quantidade_pendente * ultimos_custos[item.produto_id]
         
-        # Calcular lucro bruto
-        lucro_bruto_valor = receita_total - custo_total
-        margem_percentual = (lucro_bruto_valor / receita_total * 100) if receita_total > 0 else Decimal('0')
-        
-        # Criar registro de lucro bruto
-        lucro_bruto = LucroBruto(
-            venda_id=venda.id,
-            produto_id=item.produto_id,
-            quantidade_vendida=item.quantidade_real,
-            custo_total=custo_total,
-            receita_total=receita_total,
-            lucro_bruto=lucro_bruto_valor,
-            margem_percentual=margem_percentual
-        )
-        self.db.add(lucro_bruto)
-        
-        # Registrar movimentação de caixa (saída)
-        movimentacao = MovimentacaoCaixa(
-            produto_id=item.produto_id,
-            venda_id=venda.id,
-            tipo_movimentacao=TipoMovimentacao.SAIDA,
-            quantidade=item.quantidade_real,
-            preco_unitario=item.valor_unitario,
-            valor_total=receita_total,
-            observacoes=f"Venda #{venda.id} - Cliente: {venda.cliente.nome if venda.cliente else 'Balcão'}"
-        )
-        self.db.add(movimentacao)
+        cliente_nome = venda.cliente.nome if venda.cliente else 'Balcão'
+        lucros = []
+        movimentacoes = []
+        for item, custo_total, _ in custos:
+            receita_total = item.quantidade * item.valor_unitario
+            lucro_bruto_valor = receita_total - custo_total
+            margem_percentual = (lucro_bruto_valor / receita_total * 100) if receita_total > 0 else Decimal('0')
+            lucros.append({
+                "venda_id": venda.id,
+                "produto_id": item.produto_id,
+                "quantidade_vendida": item.quantidade,
+                "custo_total": custo_total,
+                "receita_total": receita_total,
+                "lucro_bruto": lucro_bruto_valor,
+                "margem_percentual": margem_percentual
+            })
+            movimentacoes.append({
+                "produto_id": item.produto_id,
+                "venda_id": venda.id,
+                "tipo_movimentacao": TipoMovimentacao.SAIDA,
+                "quantidade": item.quantidade,
+                "preco_unitario": item.valor_unitario,
+                "valor_total": receita_total,
+                "observacoes": f"Venda #{venda.id} - Cliente: {cliente_nome}"
+            })
         
+        if camadas_alteradas:
+            self.db.execute(update(EstoqueFifo), [
+                {
+                    "id": camada_id,
+                    "quantidade_restante": quantidade,
+                    "finalizado": quantidade <= 0
+                }
+                for camada_id, quantidade, _ in camadas_alteradas.values()
+            ])
+            fifo_ledger.registrar_consumo(self.db, consumos)
+        self.db.execute(insert(LucroBruto), lucros)
+        self.db.execute(insert(MovimentacaoCaixa), movimentacoes)
         self.db.commit()
-        return lucro_bruto
+        return lucros
     
     def reverter_venda_cancelada(self, venda: Venda) -> None:
         """Reverte movimentações de uma venda cancelada"""
@@ -149,6 +236,8 @@ class FluxoCaixaService:
             # Remover registro de lucro bruto
             self.db.delete(lucro)
         
+        if lucros:
+            fifo_ledger.registrar_alteracao(self.db, [lucro.produto_id for lucro in lucros])
         self.db.commit()
     
     def _restaurar_estoque_fifo(self, lucro: LucroBruto) -> None:
@@ -181,53 +270,66 @@ class FluxoCaixaService:
                     estoque.finalizado = False
                     quantidade_restaurar -= quantidade_a_restaurar
     
-    def obter_relatorio_fluxo_caixa(self, produto_id: int = None, 
-                                   data_inicio: datetime = None, 
-                                   data_fim: datetime = None) -> dict:
-        """Gera relatório de fluxo de caixa"""
-        query = self.db.query(MovimentacaoCaixa)
-        
+    def cotar_custo(self, produto_id: int, quantidade: Decimal) -> Decimal:
+        """Custo FIFO estimado para uma quantidade, sem consumir estoque"""
+        return fifo_ledger.cotar_custo(self.db, produto_id, quantidade)
+    
+    @staticmethod
+    def filtros_movimentacoes(produto_id: int = None,
+                              data_inicio: datetime = None,
+                              data_fim: datetime = None) -> list:
+        """Filtros das movimentações do relatório (também usados na listagem paginada)"""
+        filtros = []
         if produto_id:
-            query = query.filter(MovimentacaoCaixa.produto_id == produto_id)
+            filtros.append(MovimentacaoCaixa.produto_id == produto_id)
         if data_inicio:
-            query = query.filter(MovimentacaoCaixa.data_movimentacao >= data_inicio)
+            filtros.append(MovimentacaoCaixa.data_movimentacao >= data_inicio)
         if data_fim:
-            query = query.filter(MovimentacaoCaixa.data_movimentacao <= data_fim)
-        
-        movimentacoes = query.order_by(MovimentacaoCaixa.data_movimentacao).all()
-        
-        total_entradas = sum(
-            mov.valor_total for mov in movimentacoes 
-            if mov.tipo_movimentacao == TipoMovimentacao.ENTRADA
-        )
+            filtros.append(MovimentacaoCaixa.data_movimentacao <= data_fim)
+        return filtros
+    
+    def obter_relatorio_fluxo_caixa(self, produto_id: int = None, 
+                                   data_inicio: datetime = None, 
+                                   data_fim: datetime = None) -> dict:
+        """Gera os totais do relatório de fluxo de caixa.
         
-        total_saidas = sum(
-            mov.valor_total for mov in movimentacoes 
-            if mov.tipo_movimentacao == TipoMovimentacao.SAIDA
-        )
+        Totais, contagens e margem vêm de agregações condicionais no banco
+        (uma consulta para as movimentações e outra para o lucro bruto); a lista
+        de movimentações é paginada à parte por quem chama.
+        """
+        entrada = MovimentacaoCaixa.tipo_movimentacao == TipoMovimentacao.ENTRADA
+        saida = MovimentacaoCaixa.tipo_movimentacao == TipoMovimentacao.SAIDA
+        total_entradas, total_saidas, quantidade_vendas, quantidade_movimentacoes = self.db.query(
+            func.sum(case((entrada, MovimentacaoCaixa.valor_total), else_=0)),
+            func.sum(case((saida, MovimentacaoCaixa.valor_total), else_=0)),
+            func.sum(case((saida, 1), else_=0)),
+            func.count(MovimentacaoCaixa.id)
+        ).filter(
+            *self.filtros_movimentacoes(produto_id, data_inicio, data_fim)
+        ).one()
         
         # Calcular lucro bruto
-        query_lucro = self.db.query(LucroBruto)
+        query_lucro = self.db.query(
+            func.sum(LucroBruto.lucro_bruto),
+            func.sum(LucroBruto.margem_percentual),
+            func.count(LucroBruto.id)
+        )
         if produto_id:
             query_lucro = query_lucro.filter(LucroBruto.produto_id == produto_id)
         if data_inicio:
             query_lucro = query_lucro.filter(LucroBruto.data_calculo >= data_inicio)
         if data_fim:
             query_lucro = query_lucro.filter(LucroBruto.data_calculo <= data_fim)
+        lucro_bruto_total, soma_margens, quantidade_lucros = query_lucro.one()
         
-        lucros = query_lucro.all()
-        lucro_bruto_total = sum(lucro.lucro_bruto for lucro in lucros)
-        margem_media = (
-            sum(lucro.margem_percentual for lucro in lucros) / len(lucros)
-            if lucros else Decimal('0')
-        )
-        
+        total_entradas = total_entradas or Decimal('0')
+        total_saidas = total_saidas or Decimal('0')
         return {
-            "movimentacoes": movimentacoes,
             "total_entradas": total_entradas,
             "total_saidas": total_saidas,
             "saldo": total_saidas - total_entradas,  # Receita - Custo
-            "lucro_bruto_total": lucro_bruto_total,
-            "margem_media": margem_media,
-            "quantidade_vendas": len([m for m in movimentacoes if m.tipo_movimentacao == TipoMovimentacao.SAIDA])
+            "lucro_bruto_total": lucro_bruto_total or Decimal('0'),
+            "margem_media": soma_margens / quantidade_lucros if quantidade_lucros else Decimal('0'),
+            "quantidade_vendas": int(quantidade_vendas or 0),
+            "quantidade_movimentacoes": quantidade_movimentacoes
         }
@@ -0,0 +1,225 @@
+import codecs
+import csv
+import json
+from decimal import Decimal, ROUND_HALF_UP
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app.core.enums import SituacaoPagamento
+from app.models.cliente import Cliente
+from app.models.produto import Produto
+from app.models.venda import Venda, ItemVenda
+from app.schemas.venda import VendaImportacao
+from app.services.saldo_cliente import SaldoClienteService
+from app.services.vendas_diarias import VendasDiariasService
+from app.utils.timezone import to_brazil_tz
+
+CENTAVOS = Decimal('0.01')
+MILESIMOS = Decimal('0.001')
+
+# Colunas do CSV (uma linha por item); `observacoes` e `data_venda` são opcionais
+COLUNAS_ITEM = ("produto_id", "quantidade", "tipo_medida", "valor_unitario", "custo", "lucro_bruto")
+COLUNAS_DECIMAIS = ("quantidade", "valor_unitario", "custo", "lucro_bruto")
+
+# (linha do arquivo, pedido do CSV, dados brutos ou mensagem de erro)
+Registro = Tuple[int, Optional[str], object]
+
+
+class ErroImportacao(ValueError):
+    """Registro da importação que não pode ser gravado"""
+
+
+async def ler_linhas(partes: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decodifica o corpo recebido em partes e entrega uma linha por vez"""
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    resto = ""
+    async for parte in partes:
+        resto += decodificador.decode(parte)
+        *linhas, resto = resto.split("\n")
+        for linha in linhas:
+            yield linha.rstrip("\r")
+    resto += decodificador.decode(b"", final=True)
+    if resto.strip():
+        yield resto.rstrip("\r")
+
+
+async def registros_ndjson(linhas: AsyncIterator[str]) -> AsyncIterator[Registro]:
+    """Um objeto JSON (no formato de POST /vendas/) por linha"""
+    numero = 0
+    async for linha in linhas:
+        numero += 1
+        if not linha.strip():
+            continue
+        try:
+            yield numero, None, json.loads(linha)
+        except json.JSONDecodeError as e:
+            yield numero, None, f"JSON inválido: {e.msg}"
+
+
+async def registros_csv(linhas: AsyncIterator[str]) -> AsyncIterator[Registro]:
+    """Agrupa as linhas de itens do CSV em vendas pela coluna `pedido`"""
+    numero = 0
+    cabecalho = None
+    delimitador = ","
+    atual = None  # (linha inicial, pedido, dados)
+
+    async for linha in linhas:
+        numero += 1
+        if not linha.strip():
+            continue
+        if cabecalho is None:
+            # Planilhas exportadas em português costumam usar ";"
+            if ";" in linha and "," not in linha:
+                delimitador = ";"
+            cabecalho = [coluna.strip().lower() for coluna in next(csv.reader([linha], delimiter=delimitador))]
+            faltando = [c for c in ("pedido", "cliente_id") + COLUNAS_ITEM if c not in cabecalho]
+            if faltando:
+                raise ErroImportacao(f"Colunas obrigatórias ausentes no CSV: {', '.join(faltando)}")
+            continue
+
+        valores = dict(zip(cabecalho, next(csv.reader([linha], delimiter=delimitador))))
+        valores = {chave: valor.strip() for chave, valor in valores.items()}
+        if delimitador == ";":
+            for coluna in COLUNAS_DECIMAIS:
+                if coluna in valores:
+                    valores[coluna] = valores[coluna].replace(",", ".")
+        item = {coluna: valores.get(coluna) for coluna in COLUNAS_ITEM}
+
+        pedido = valores.get("pedido")
+        if atual is not None and atual[1] == pedido:
+            atual[2]["itens"].append(item)
+            continue
+        if atual is not None:
+            yield atual
+        atual = (numero, pedido, {
+            "cliente_id": valores.get("cliente_id"),
+            "observacoes": valores.get("observacoes") or None,
+            "data_venda": valores.get("data_venda") or None,
+            "itens": [item]
+        })
+
+    if cabecalho is None:
+        raise ErroImportacao("Arquivo CSV vazio")
+    if atual is not None:
+        yield atual
+
+
+class ImportacaoVendasService:
+    """Validação e gravação em lote das vendas importadas"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def carregar_referencias(self) -> Tuple[Set[int], Set[int]]:
+        """IDs de clientes e produtos existentes, carregados uma vez por importação"""
+        clientes = {cliente_id for (cliente_id,) in self.db.query(Cliente.id)}
+        produtos = {produto_id for (produto_id,) in self.db.query(Produto.id)}
+        return clientes, produtos
+
+    @staticmethod
+    def validar(dados: object, clientes: Set[int], produtos: Set[int]) -> VendaImportacao:
+        """Converte os dados brutos de um registro, conferindo cliente e produtos nos mapas"""
+        if isinstance(dados, str):
+            raise ErroImportacao(dados)
+        try:
+            venda = VendaImportacao.model_validate(dados)
+        except ValidationError as e:
+            erro = e.errors()[0]
+            campo = ".".join(str(parte) for parte in erro["loc"])
+            raise ErroImportacao(f"{campo}: {erro['msg']}" if campo else erro["msg"])
+
+        if venda.data_venda is not None and venda.data_venda.tzinfo is not None:
+            # Datas gravadas sem fuso, no horário de Brasília, como o padrão do banco
+            venda.data_venda = to_brazil_tz(venda.data_venda).replace(tzinfo=None)
+
+        if venda.cliente_id not in clientes:
+            raise ErroImportacao("Cliente não encontrado")
+        for item in venda.itens:
+            if item.produto_id not in produtos:
+                raise ErroImportacao(f"Produto com ID {item.produto_id} não encontrado")
+        return venda
+
+    def gravar_lote(self, pedidos: List[VendaImportacao]) -> List[int]:
+        """Grava vendas, itens e rollup de um lote (sem commit). Retorna os IDs das vendas"""
+        valores = [self._valores_venda(pedido) for pedido in pedidos]
+        ids = self._inserir_vendas(valores)
+        if any(pedido.data_venda is None for pedido in pedidos):
+            # Uma consulta lê a data gerada pelo banco de todas as vendas do lote
+            datas = dict(self.db.query(Venda.id, Venda.data_venda).filter(Venda.id.in_(ids)).all())
+            for venda_id, dados in zip(ids, valores):
+                dados.setdefault("data_venda", datas[venda_id])
+        vendas = [Venda(id=venda_id, **dados) for venda_id, dados in zip(ids, valores)]
+
+        # Valores na escala das colunas, para o rollup somar o mesmo que foi gravado
+        linhas = [
+            {
+                "venda_id": venda.id,
+                "produto_id": item.produto_id,
+                "quantidade": item.quantidade.quantize(MILESIMOS, ROUND_HALF_UP),
+                "tipo_medida": item.tipo_medida,
+                "valor_unitario": item.valor_unitario.quantize(CENTAVOS, ROUND_HALF_UP),
+                "custo": item.custo.quantize(CENTAVOS, ROUND_HALF_UP),
+                "lucro_bruto": item.lucro_bruto.quantize(CENTAVOS, ROUND_HALF_UP),
+                "valor_total_produto": (item.quantidade * item.valor_unitario).quantize(CENTAVOS, ROUND_HALF_UP)
+            }
+            for venda, pedido in zip(vendas, pedidos)
+            for item in pedido.itens
+        ]
+        self.db.execute(insert(ItemVenda), linhas)
+
+        itens_por_venda: Dict[int, List[ItemVenda]] = {}
+        for linha in linhas:
+            itens_por_venda.setdefault(linha["venda_id"], []).append(ItemVenda(**linha))
+        vendas_com_itens = [(venda, itens_por_venda[venda.id]) for venda in vendas]
+        VendasDiariasService(self.db).registrar_vendas(vendas_com_itens)
+        SaldoClienteService(self.db).registrar_vendas(vendas)
+        return ids
+
+    def _inserir_vendas(self, valores: List[dict]) -> List[int]:
+        """INSERT das vendas em lote. Retorna os IDs na ordem de `valores`.
+
+        As linhas são agrupadas pelas colunas informadas (a data é opcional) e
+        cada grupo vai em um comando. Os IDs autoincrementais de um INSERT são
+        atribuídos na ordem das linhas: com RETURNING eles são ordenados e
+        associados às linhas; no MySQL, sem RETURNING, vêm do primeiro ID do
+        INSERT de várias linhas somado ao auto_increment_increment.
+        """
+        tabela = Venda.__table__
+        dialeto = self.db.get_bind().dialect
+        grupos: Dict[tuple, List[int]] = {}
+        for posicao, dados in enumerate(valores):
+            grupos.setdefault(tuple(dados), []).append(posicao)
+
+        ids: List[int] = [0] * len(valores)
+        for posicoes in grupos.values():
+            linhas = [valores[posicao] for posicao in posicoes]
+            if dialeto.insert_executemany_returning:
+                gerados = sorted(self.db.execute(insert(tabela).returning(tabela.c.id), linhas).scalars())
+            else:
+                primeiro = self.db.execute(insert(tabela).values(linhas)).lastrowid
+                passo = self.db.execute(text("SELECT @@auto_increment_increment")).scalar()
+                gerados = range(primeiro, primeiro + passo * len(linhas), passo)
+            for posicao, venda_id in zip(posicoes, gerados):
+                ids[posicao] = venda_id
+        return ids
+
+    @staticmethod
+    def _valores_venda(pedido: VendaImportacao) -> dict:
+        """Colunas da venda calculadas a partir dos itens (data só quando informada)"""
+        total_venda = sum(item.quantidade * item.valor_unitario for item in pedido.itens)
+        lucro_bruto_total = sum(item.lucro_bruto for item in pedido.itens)
+        custo_total = sum(item.custo * item.quantidade for item in pedido.itens)
+        valores = {
+            "cliente_id": pedido.cliente_id,
+            "total_venda": Decimal(total_venda).quantize(CENTAVOS, ROUND_HALF_UP),
+            "observacoes": pedido.observacoes,
+            "lucro_bruto_total": Decimal(lucro_bruto_total).quantize(CENTAVOS, ROUND_HALF_UP),
+            "custo_total": Decimal(custo_total).quantize(CENTAVOS, ROUND_HALF_UP),
+            "situacao_pagamento": SituacaoPagamento.PENDENTE
+        }
+        if pedido.data_venda is not None:
+            valores["data_venda"] = pedido.data_venda
+        return valores
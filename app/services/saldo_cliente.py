@@ -0,0 +1,160 @@
+from decimal import Decimal
+from typing import Dict, Iterable
+
+from sqlalchemy import case, func, insert, literal
+from sqlalchemy.orm import Session
+
+from app.core.enums import SituacaoPagamento
+from app.models.venda import Venda, SaldoCliente
+from app.utils.upsert import inserir_ou_atualizar
+
+
+class SaldoClienteService:
+    """Manutenção incremental de `saldos_clientes` (saldo pendente por cliente).
+
+    Valores e contagens são somados/subtraídos a cada venda; as datas da venda
+    pendente mais antiga e mais recente são recalculadas pelo índice
+    (cliente_id, situacao_pagamento, data_venda) quando uma venda sai do saldo.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def registrar_venda(self, venda: Venda) -> None:
+        """Soma ao saldo do cliente uma venda recém-criada (sempre pendente)"""
+        self.registrar_vendas([venda])
+
+    def registrar_vendas(self, vendas: Iterable[Venda]) -> None:
+        """Soma várias vendas recém-criadas, agregadas por cliente, em um único upsert"""
+        por_cliente: Dict[int, dict] = {}
+        for venda in vendas:
+            if venda.cliente_id is None:
+                continue
+            totais = por_cliente.setdefault(venda.cliente_id, {
+                "valor": Decimal('0'),
+                "vendas": 0,
+                "custo": Decimal('0'),
+                "lucro": Decimal('0'),
+                "mais_antiga": venda.data_venda,
+                "mais_recente": venda.data_venda
+            })
+            totais["valor"] += venda.total_venda
+            totais["vendas"] += 1
+            totais["custo"] += venda.custo_total or 0
+            totais["lucro"] += venda.lucro_bruto_total or 0
+            totais["mais_antiga"] = min(totais["mais_antiga"], venda.data_venda)
+            totais["mais_recente"] = max(totais["mais_recente"], venda.data_venda)
+
+        self._somar(por_cliente)
+
+    def remover_venda(self, venda: Venda) -> None:
+        """Retira do saldo uma venda pendente que está sendo paga ou excluída.
+
+        Deve ser chamado antes de alterar a situação ou excluir a venda.
+        """
+        if venda.cliente_id is None or venda.situacao_pagamento == SituacaoPagamento.PAGO:
+            return
+
+        mais_antiga, mais_recente = self.db.query(
+            func.min(Venda.data_venda),
+            func.max(Venda.data_venda)
+        ).filter(
+            Venda.cliente_id == venda.cliente_id,
+            Venda.situacao_pagamento == SituacaoPagamento.PENDENTE,
+            Venda.id != venda.id
+        ).one()
+
+        if mais_antiga is None:
+            # Era a última venda pendente: o cliente sai da tabela (como no
+            # reconstruir) e a linha não impede a exclusão do cliente
+            self.db.query(SaldoCliente).filter(
+                SaldoCliente.cliente_id == venda.cliente_id
+            ).delete(synchronize_session=False)
+            return
+
+        self.db.query(SaldoCliente).filter(
+            SaldoCliente.cliente_id == venda.cliente_id
+        ).update({
+            SaldoCliente.valor_pendente: SaldoCliente.valor_pendente - venda.total_venda,
+            SaldoCliente.vendas_pendentes: SaldoCliente.vendas_pendentes - 1,
+            SaldoCliente.custo_pendente: SaldoCliente.custo_pendente - (venda.custo_total or 0),
+            SaldoCliente.lucro_bruto_pendente: SaldoCliente.lucro_bruto_pendente - (venda.lucro_bruto_total or 0),
+            SaldoCliente.venda_pendente_mais_antiga: mais_antiga,
+            SaldoCliente.venda_pendente_mais_recente: mais_recente
+        }, synchronize_session=False)
+
+    def reconstruir(self) -> int:
+        """Recalcula a tabela a partir das vendas pendentes (backfill).
+
+        Retorna o número de clientes com saldo pendente.
+        """
+        self.db.query(SaldoCliente).delete(synchronize_session=False)
+
+        selecao = self.db.query(
+            Venda.cliente_id,
+            func.sum(Venda.total_venda),
+            func.count(Venda.id),
+            func.coalesce(func.sum(Venda.custo_total), literal(0)),
+            func.coalesce(func.sum(Venda.lucro_bruto_total), literal(0)),
+            func.min(Venda.data_venda),
+            func.max(Venda.data_venda)
+        ).filter(
+            Venda.cliente_id.isnot(None),
+            Venda.situacao_pagamento == SituacaoPagamento.PENDENTE
+        ).group_by(Venda.cliente_id)
+
+        resultado = self.db.execute(
+            insert(SaldoCliente).from_select(
+                [
+                    "cliente_id", "valor_pendente", "vendas_pendentes", "custo_pendente",
+                    "lucro_bruto_pendente", "venda_pendente_mais_antiga", "venda_pendente_mais_recente"
+                ],
+                selecao.statement
+            )
+        )
+        self.db.commit()
+        return resultado.rowcount
+
+    def _somar(self, por_cliente: Dict[int, dict]) -> None:
+        """Soma os totais no saldo de cada cliente, criando a linha se necessário (upsert)"""
+        tabela = SaldoCliente.__table__
+        inserir_ou_atualizar(
+            self.db,
+            tabela,
+            [
+                {
+                    "cliente_id": cliente_id,
+                    "valor_pendente": totais["valor"],
+                    "vendas_pendentes": totais["vendas"],
+                    "custo_pendente": totais["custo"],
+                    "lucro_bruto_pendente": totais["lucro"],
+                    "venda_pendente_mais_antiga": totais["mais_antiga"],
+                    "venda_pendente_mais_recente": totais["mais_recente"]
+                }
+                for cliente_id, totais in por_cliente.items()
+            ],
+            ["cliente_id"],
+            lambda propostos: {
+                **{
+                    coluna: tabela.c[coluna] + propostos[coluna]
+                    for coluna in ("valor_pendente", "vendas_pendentes", "custo_pendente", "lucro_bruto_pendente")
+                },
+                "venda_pendente_mais_antiga": case(
+                    (
+                        tabela.c.venda_pendente_mais_antiga.is_(None)
+                        | (tabela.c.venda_pendente_mais_antiga > propostos.venda_pendente_mais_antiga),
+                        propostos.venda_pendente_mais_antiga
+                    ),
+                    else_=tabela.c.venda_pendente_mais_antiga
+                ),
+                "venda_pendente_mais_recente": case(
+                    (
+                        tabela.c.venda_pendente_mais_recente.is_(None)
+                        | (tabela.c.venda_pendente_mais_recente < propostos.venda_pendente_mais_recente),
+                        propostos.venda_pendente_mais_recente
+                    ),
+                    else_=tabela.c.venda_pendente_mais_recente
+                ),
+                "atualizado_em": func.now()
+            }
+        )
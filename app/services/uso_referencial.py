@@ -0,0 +1,53 @@
+from typing import Dict, Iterable, List
+
+from sqlalchemy import exists, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models.estoque import EntradaEstoque, EstoqueFifo, Inventario, LucroBruto, MovimentacaoCaixa
+from app.models.produto import Produto
+from app.models.venda import ItemVenda
+
+# Tabelas que impedem a exclusão de um produto: (descrição, coluna que referencia o produto).
+# Tabelas derivadas (alertas_estoque, versoes_fifo, vendas_diarias) não entram:
+# são removidas ou recalculadas junto com o produto.
+REFERENCIAS_PRODUTO = (
+    ("entradas de estoque", EntradaEstoque.produto_id),
+    ("itens de venda", ItemVenda.produto_id),
+    ("registros de inventário", Inventario.produto_id),
+    ("registros FIFO", EstoqueFifo.produto_id),
+    ("movimentações de caixa", MovimentacaoCaixa.produto_id),
+    ("registros de lucro", LucroBruto.produto_id),
+)
+
+
+class UsoReferencialService:
+    """Responde se (e onde) registros são referenciados por outras tabelas.
+
+    Uma única consulta: um SELECT com EXISTS por tabela referenciadora, unidos
+    com UNION ALL. O EXISTS para na primeira linha encontrada no índice da
+    coluna, então o custo não cresce com o volume de histórico.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def usos_produtos(self, produto_ids: Iterable[int]) -> Dict[int, List[str]]:
+        """Descrições das tabelas que referenciam cada produto (lista vazia: livre para exclusão)"""
+        produto_ids = list(set(produto_ids))
+        usos: Dict[int, List[str]] = {produto_id: [] for produto_id in produto_ids}
+        if not produto_ids:
+            return usos
+
+        consulta = union_all(*[
+            select(
+                Produto.id.label("produto_id"),
+                literal(ordem).label("ordem")
+            ).where(
+                Produto.id.in_(produto_ids),
+                exists().where(coluna == Produto.id)
+            )
+            for ordem, (_, coluna) in enumerate(REFERENCIAS_PRODUTO)
+        ])
+        for produto_id, ordem in sorted(self.db.execute(consulta)):
+            usos[produto_id].append(REFERENCIAS_PRODUTO[ordem][0])
+        return usos
@@ -0,0 +1,236 @@
+from collections import OrderedDict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, case, func, insert, literal, update
+from sqlalchemy.orm import Session
+
+from app.core.enums import SituacaoPagamento
+from app.models.venda import Venda, ItemVenda, VendaDiaria
+from app.utils.upsert import inserir_ou_atualizar
+
+
+class VendasDiariasService:
+    """Manutenção incremental do rollup `vendas_diarias` (dia × cliente × produto)"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def registrar_venda(self, venda: Venda, itens: Iterable[ItemVenda]) -> None:
+        """Soma uma venda recém-criada ao rollup"""
+        self._aplicar(venda, itens, sinal=1, pendente=True)
+
+    def registrar_vendas(self, vendas: Iterable[Tuple[Venda, Iterable[ItemVenda]]]) -> None:
+        """Soma várias vendas recém-criadas ao rollup (importação em lote).
+
+        Os deltas são acumulados por (dia, cliente) antes de gravar, então o
+        número de comandos depende das combinações distintas, não das vendas.
+        """
+        acumulado: Dict[tuple, Dict[int, dict]] = {}
+        for venda, itens in vendas:
+            por_produto = acumulado.setdefault((venda.data_venda.date(), venda.cliente_id), {})
+            for produto_id, deltas in self._deltas(self._agrupar_por_produto(itens), 1, True).items():
+                atual = por_produto.setdefault(produto_id, dict.fromkeys(deltas, 0))
+                for coluna, delta in deltas.items():
+                    atual[coluna] += delta
+
+        for (dia, cliente_id), por_produto in acumulado.items():
+            self._incrementar(dia, cliente_id, por_produto)
+
+    def remover_venda(self, venda: Venda, itens: Iterable[ItemVenda]) -> None:
+        """Retira do rollup uma venda que está sendo excluída"""
+        pendente = venda.situacao_pagamento != SituacaoPagamento.PAGO
+        self._aplicar(venda, itens, sinal=-1, pendente=pendente)
+
+    def registrar_pagamento(self, venda: Venda, itens: Iterable[ItemVenda]) -> None:
+        """Move o valor da venda de pendente para pago no rollup"""
+        dia = venda.data_venda.date()
+        self._incrementar(dia, venda.cliente_id, {
+            produto_id: {VendaDiaria.valor_pendente: -totais["valor_total"]}
+            for produto_id, totais in self._agrupar_por_produto(itens).items()
+        })
+
+    def reconstruir(self, data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> int:
+        """Recalcula o rollup a partir de `vendas`/`itens_venda` (backfill).
+
+        Sem datas, reconstrói a tabela inteira. Retorna o número de linhas geradas.
+        """
+        delete_query = self.db.query(VendaDiaria)
+        if data_inicio:
+            delete_query = delete_query.filter(VendaDiaria.data >= data_inicio)
+        if data_fim:
+            delete_query = delete_query.filter(VendaDiaria.data <= data_fim)
+        delete_query.delete(synchronize_session=False)
+
+        # Primeiro produto de cada venda, que recebe a contagem da venda
+        primeiro_produto = self.db.query(
+            ItemVenda.venda_id.label("venda_id"),
+            func.min(ItemVenda.produto_id).label("produto_id")
+        ).group_by(ItemVenda.venda_id).subquery()
+
+        dia = func.date(Venda.data_venda)
+        pendente = Venda.situacao_pagamento == SituacaoPagamento.PENDENTE
+        selecao = self.db.query(
+            dia,
+            Venda.cliente_id,
+            ItemVenda.produto_id,
+            func.count(func.distinct(case(
+                (ItemVenda.produto_id == primeiro_produto.c.produto_id, Venda.id)
+            ))),
+            func.count(ItemVenda.id),
+            func.sum(ItemVenda.quantidade),
+            func.sum(ItemVenda.valor_total_produto),
+            func.sum(case((pendente, ItemVenda.valor_total_produto), else_=literal(0))),
+            func.sum(ItemVenda.custo * ItemVenda.quantidade),
+            func.sum(ItemVenda.lucro_bruto)
+        ).join(
+            Venda, Venda.id == ItemVenda.venda_id
+        ).join(
+            primeiro_produto, primeiro_produto.c.venda_id == Venda.id
+        )
+        if data_inicio:
+            selecao = selecao.filter(Venda.data_venda >= data_inicio)
+        if data_fim:
+            selecao = selecao.filter(Venda.data_venda < data_fim + timedelta(days=1))
+        selecao = selecao.group_by(dia, Venda.cliente_id, ItemVenda.produto_id)
+
+        resultado = self.db.execute(
+            insert(VendaDiaria).from_select(
+                [
+                    "data", "cliente_id", "produto_id", "vendas", "itens", "quantidade",
+                    "valor_total", "valor_pendente", "custo_total", "lucro_bruto"
+                ],
+                selecao.statement
+            )
+        )
+        self.db.commit()
+        return resultado.rowcount
+
+    def _aplicar(self, venda: Venda, itens: Iterable[ItemVenda], sinal: int, pendente: bool) -> None:
+        """Aplica (sinal=1) ou retira (sinal=-1) os totais de uma venda do rollup"""
+        dia = venda.data_venda.date()
+        agrupado = self._agrupar_por_produto(itens)
+        if not agrupado:
+            return
+
+        self._incrementar(dia, venda.cliente_id, self._deltas(agrupado, sinal, pendente))
+
+        if sinal < 0:
+            # Linhas que ficaram sem itens não representam mais nenhuma venda
+            self.db.query(VendaDiaria).filter(
+                VendaDiaria.data == dia,
+                self._filtro_cliente(venda.cliente_id),
+                VendaDiaria.produto_id.in_(list(agrupado)),
+                VendaDiaria.itens <= 0
+            ).delete(synchronize_session=False)
+
+    @staticmethod
+    def _deltas(agrupado: "OrderedDict[int, dict]", sinal: int, pendente: bool) -> Dict[int, dict]:
+        """Deltas do rollup por produto para os totais agrupados de uma venda"""
+        if not agrupado:
+            return {}
+        primeiro_produto_id = min(agrupado)
+        return {
+            produto_id: {
+                VendaDiaria.vendas: sinal if produto_id == primeiro_produto_id else 0,
+                VendaDiaria.itens: sinal * totais["itens"],
+                VendaDiaria.quantidade: sinal * totais["quantidade"],
+                VendaDiaria.valor_total: sinal * totais["valor_total"],
+                VendaDiaria.valor_pendente: sinal * totais["valor_total"] if pendente else Decimal('0'),
+                VendaDiaria.custo_total: sinal * totais["custo_total"],
+                VendaDiaria.lucro_bruto: sinal * totais["lucro_bruto"],
+            }
+            for produto_id, totais in agrupado.items()
+        }
+
+    @staticmethod
+    def _agrupar_por_produto(itens: Iterable[ItemVenda]) -> "OrderedDict[int, dict]":
+        """Soma os itens de uma venda por produto"""
+        agrupado = OrderedDict()
+        for item in itens:
+            totais = agrupado.setdefault(item.produto_id, {
+                "itens": 0,
+                "quantidade": Decimal('0'),
+                "valor_total": Decimal('0'),
+                "custo_total": Decimal('0'),
+                "lucro_bruto": Decimal('0')
+            })
+            totais["itens"] += 1
+            totais["quantidade"] += item.quantidade
+            totais["valor_total"] += item.valor_total_produto
+            totais["custo_total"] += item.custo * item.quantidade
+            totais["lucro_bruto"] += item.lucro_bruto
+        return agrupado
+
+    @staticmethod
+    def _filtro_cliente(cliente_id: Optional[int]):
+        """Filtro por cliente que também trata vendas sem cliente (NULL)"""
+        if cliente_id is None:
+            return VendaDiaria.cliente_id.is_(None)
+        return VendaDiaria.cliente_id == cliente_id
+
+    def _incrementar(self, dia: date, cliente_id: Optional[int], deltas_por_produto: Dict[int, dict]) -> None:
+        """Soma os deltas de cada produto na linha (dia, cliente, produto), criando as que faltam.
+
+        Um único INSERT ... ON DUPLICATE KEY UPDATE (ON CONFLICT no SQLite) em
+        lote: vendas simultâneas do mesmo dia/cliente/produto não disputam a
+        criação da linha.
+        """
+        if not deltas_por_produto:
+            return
+        if cliente_id is None:
+            self._incrementar_sem_cliente(dia, deltas_por_produto)
+            return
+
+        tabela = VendaDiaria.__table__
+        colunas = [coluna.key for coluna in next(iter(deltas_por_produto.values()))]
+        inserir_ou_atualizar(
+            self.db,
+            tabela,
+            [
+                {"data": dia, "cliente_id": cliente_id, "produto_id": produto_id,
+                 **{coluna.key: delta for coluna, delta in deltas.items()}}
+                for produto_id, deltas in deltas_por_produto.items()
+            ],
+            ["data", "cliente_id", "produto_id"],
+            lambda propostos: {
+                **{coluna: tabela.c[coluna] + propostos[coluna] for coluna in colunas},
+                "atualizado_em": func.now()
+            }
+        )
+
+    def _incrementar_sem_cliente(self, dia: date, deltas_por_produto: Dict[int, dict]) -> None:
+        """Vendas sem cliente (dados antigos): NULL não colide na chave única,
+        então as linhas existentes são buscadas e atualizadas em lote.
+        """
+        existentes = dict(self.db.query(VendaDiaria.produto_id, VendaDiaria.id).filter(
+            and_(
+                VendaDiaria.data == dia,
+                VendaDiaria.cliente_id.is_(None),
+                VendaDiaria.produto_id.in_(list(deltas_por_produto))
+            )
+        ).all())
+
+        tabela = VendaDiaria.__table__
+        colunas = [coluna.key for coluna in next(iter(deltas_por_produto.values()))]
+        if existentes:
+            self.db.execute(
+                update(tabela)
+                .where(tabela.c.id == bindparam("linha_id"))
+                .values({coluna: tabela.c[coluna] + bindparam(f"delta_{coluna}") for coluna in colunas}),
+                [
+                    {"linha_id": existentes[produto_id], **{f"delta_{c.key}": d for c, d in deltas.items()}}
+                    for produto_id, deltas in deltas_por_produto.items()
+                    if produto_id in existentes
+                ]
+            )
+
+        novas = [
+            {"data": dia, "cliente_id": None, "produto_id": produto_id,
+             **{coluna.key: delta for coluna, delta in deltas.items()}}
+            for produto_id, deltas in deltas_por_produto.items()
+            if produto_id not in existentes
+        ]
+        if novas:
+            self.db.execute(insert(tabela), novas)
@@ -0,0 +1,176 @@
+"""
+Cache de respostas JSON dos relatórios mais consultados, com ETag
+
+A chave combina caminho, parâmetros da consulta e a geração atual de cada
+domínio de dados usado pelo endpoint ("vendas", "estoque", "clientes",
+"produtos"). As escritas incrementam a geração do domínio após o commit, então
+as entradas antigas deixam de ser encontradas e expiram pelo TTL.
+
+Backends:
+- "memoria": LRU por processo (gerações também por processo; com vários
+  workers, uma escrita só invalida o worker que a recebeu até o TTL vencer)
+- "redis": servidor Redis (ou compatível) compartilhado entre os workers,
+  requer o pacote `redis`
+- "desativado": sem cache (ETag/304 continuam funcionando)
+"""
+
+import functools
+import hashlib
+import threading
+from datetime import date
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.utils.cache import TTLCache
+
+# (etag, corpo JSON)
+Entrada = Tuple[str, bytes]
+
+# Mesma serialização do response_model=dict dos endpoints (Decimal como texto etc.)
+_SERIALIZADOR = TypeAdapter(dict)
+
+
+class BackendMemoria:
+    """Respostas e gerações em memória, locais ao processo"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._respostas = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._geracoes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def geracoes(self, dominios: Iterable[str]) -> List[int]:
+        with self._lock:
+            return [self._geracoes.get(dominio, 0) for dominio in dominios]
+
+    async def incrementar(self, dominios: Iterable[str]) -> None:
+        with self._lock:
+            for dominio in dominios:
+                self._geracoes[dominio] = self._geracoes.get(dominio, 0) + 1
+
+    async def obter(self, chave: str) -> Optional[Entrada]:
+        return self._respostas.get(chave)
+
+    async def guardar(self, chave: str, entrada: Entrada) -> None:
+        self._respostas.set(chave, entrada)
+
+
+class BackendRedis:
+    """Respostas e gerações em um Redis compartilhado entre os workers.
+
+    Falhas de conexão não interrompem a requisição: a resposta é calculada
+    normalmente, sem cache.
+    """
+
+    PREFIXO = "vendas_ceasa:cache"
+
+    def __init__(self, url: str, ttl: int):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requer o pacote 'redis' (pip install redis)")
+        self._erros = redis.RedisError
+        self._cliente = redis.from_url(url)
+        self.ttl = ttl
+
+    async def geracoes(self, dominios: Iterable[str]) -> List[int]:
+        dominios = list(dominios)
+        try:
+            valores = await self._cliente.mget([f"{self.PREFIXO}:geracao:{dominio}" for dominio in dominios])
+        except self._erros:
+            return []
+        return [int(valor or 0) for valor in valores]
+
+    async def incrementar(self, dominios: Iterable[str]) -> None:
+        try:
+            async with self._cliente.pipeline(transaction=False) as pipe:
+                for dominio in dominios:
+                    pipe.incr(f"{self.PREFIXO}:geracao:{dominio}")
+                await pipe.execute()
+        except self._erros:
+            pass
+
+    async def obter(self, chave: str) -> Optional[Entrada]:
+        try:
+            valor = await self._cliente.get(f"{self.PREFIXO}:resposta:{chave}")
+        except self._erros:
+            return None
+        if valor is None:
+            return None
+        etag, corpo = valor.split(b"\n", 1)
+        return etag.decode(), corpo
+
+    async def guardar(self, chave: str, entrada: Entrada) -> None:
+        etag, corpo = entrada
+        try:
+            await self._cliente.set(f"{self.PREFIXO}:resposta:{chave}", etag.encode() + b"\n" + corpo, ex=self.ttl)
+        except self._erros:
+            pass
+
+
+def _criar_backend():
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        return BackendRedis(settings.REDIS_URL, settings.RESPONSE_CACHE_TTL_SECONDS)
+    if settings.RESPONSE_CACHE_BACKEND == "memoria":
+        return BackendMemoria(settings.RESPONSE_CACHE_MAX_SIZE, settings.RESPONSE_CACHE_TTL_SECONDS)
+    return None
+
+
+backend = _criar_backend()
+
+
+async def invalidar_cache(*dominios: str) -> None:
+    """Incrementa a geração dos domínios alterados. Chamar após o commit"""
+    if backend is not None:
+        await backend.incrementar(dominios)
+
+
+def _responder(etag: str, corpo: bytes, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [valor.strip() for valor in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=corpo, media_type="application/json", headers=headers)
+
+
+def cache_resposta(*dominios: str):
+    """Decorador para endpoints GET que retornam dict; o endpoint deve receber `request: Request`.
+
+    Respostas que não são dict (ex.: exportações em streaming) passam direto.
+    Roda depois das dependências, então autenticação e permissões continuam valendo.
+    """
+    def decorador(endpoint: Callable[..., Awaitable]):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            if_none_match = request.headers.get("if-none-match")
+
+            chave = None
+            if backend is not None:
+                geracoes = await backend.geracoes(dominios)
+                if len(geracoes) == len(dominios):
+                    # A data entra na chave porque vários relatórios usam "hoje" como padrão
+                    partes = [
+                        request.url.path,
+                        "&".join(f"{nome}={valor}" for nome, valor in sorted(request.query_params.multi_items())),
+                        ",".join(f"{dominio}={geracao}" for dominio, geracao in zip(dominios, geracoes)),
+                        date.today().isoformat()
+                    ]
+                    chave = hashlib.sha1("|".join(partes).encode()).hexdigest()
+                    entrada = await backend.obter(chave)
+                    if entrada is not None:
+                        return _responder(*entrada, if_none_match)
+
+            resultado = await endpoint(*args, **kwargs)
+            if not isinstance(resultado, dict):
+                return resultado
+
+            corpo = JSONResponse(content=_SERIALIZADOR.dump_python(resultado, mode="json")).body
+            etag = f'"{hashlib.sha1(corpo).hexdigest()}"'
+            if chave is not None:
+                await backend.guardar(chave, (etag, corpo))
+            return _responder(etag, corpo, if_none_match)
+        return wrapper
+    return decorador
@@ -0,0 +1,52 @@
+"""
+Contador de comandos SQL para verificar N+1 em endpoints.
+Conta tudo o que passa pelos engines enquanto o contexto está aberto, então
+deve ser usado com uma requisição por vez (scripts de verificação, depuração).
+
+Exemplo:
+    with ContadorSQL() as contador:
+        client.get("/api/vendas/?limit=100", headers=headers)
+    contador.verificar_maximo(5, "listar_vendas")
+"""
+
+import threading
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.database import async_engine, engine
+
+
+class ContadorSQL:
+    """Context manager que registra os comandos executados nos engines da aplicação"""
+
+    def __init__(self, engines: Optional[List[Engine]] = None):
+        self.engines = engines or [engine, async_engine.sync_engine]
+        self.comandos: List[str] = []
+        self._lock = threading.Lock()
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.comandos.append(statement)
+
+    def __enter__(self) -> "ContadorSQL":
+        for alvo in self.engines:
+            event.listen(alvo, "before_cursor_execute", self._registrar)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for alvo in self.engines:
+            event.remove(alvo, "before_cursor_execute", self._registrar)
+
+    @property
+    def total(self) -> int:
+        return len(self.comandos)
+
+    def verificar_maximo(self, maximo: int, descricao: str = "requisição") -> None:
+        """Falha (AssertionError) se foram executados mais comandos que o limite"""
+        if self.total > maximo:
+            listagem = "\n".join(f"  {i + 1}. {sql.splitlines()[0]}" for i, sql in enumerate(self.comandos))
+            raise AssertionError(
+                f"{descricao}: {self.total} comandos SQL (máximo {maximo})\n{listagem}"
+            )
@@ -0,0 +1,151 @@
+"""
+Exportação de relatórios em CSV, XLSX ou NDJSON via StreamingResponse
+
+As linhas são lidas do banco com cursor do lado do servidor (`stream_results`
+com `yield_per`) e escritas na resposta à medida que chegam, então o uso de
+memória não depende do tamanho do relatório.
+"""
+
+import csv
+import enum
+import io
+import json
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import AsyncIterator, Callable, List, Literal, Sequence
+
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from openpyxl import Workbook
+from sqlalchemy.sql import Select
+
+from app.core.database import AsyncSessionLocal
+from app.utils.timezone import to_brazil_tz
+
+FormatoExportacao = Literal["csv", "xlsx", "ndjson"]
+
+LINHAS_POR_LOTE = 1000  # linhas buscadas do cursor e enviadas por vez
+TAMANHO_BLOCO = 64 * 1024
+
+TIPOS_MIDIA = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "ndjson": "application/x-ndjson",
+}
+
+
+async def linhas_do_banco(consulta: Select, formatar: Callable[[object], Sequence]) -> AsyncIterator[Sequence]:
+    """Executa a consulta em uma sessão própria e entrega cada linha formatada.
+
+    A sessão da requisição já foi fechada quando a resposta começa a ser
+    enviada, por isso o gerador abre (e fecha) a sua.
+    """
+    async with AsyncSessionLocal() as sessao:
+        resultado = await sessao.stream(consulta.execution_options(yield_per=LINHAS_POR_LOTE))
+        async for linha in resultado:
+            yield formatar(linha)
+
+
+def resposta_exportacao(
+    formato: FormatoExportacao,
+    nome_arquivo: str,
+    colunas: List[str],
+    linhas: AsyncIterator[Sequence]
+) -> StreamingResponse:
+    """StreamingResponse com as linhas no formato pedido, como anexo para download"""
+    geradores = {"csv": _csv, "xlsx": _xlsx, "ndjson": _ndjson}
+    return StreamingResponse(
+        geradores[formato](colunas, linhas),
+        media_type=TIPOS_MIDIA[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}.{formato}"'}
+    )
+
+
+def _texto(valor) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, enum.Enum):
+        return str(valor.value)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
+
+
+async def _csv(colunas: List[str], linhas: AsyncIterator[Sequence]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para o Excel reconhecer o UTF-8
+    buffer.write("\ufeff")
+    escritor.writerow(colunas)
+    quantidade = 0
+    async for linha in linhas:
+        escritor.writerow([_texto(valor) for valor in linha])
+        quantidade += 1
+        if quantidade % LINHAS_POR_LOTE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+async def _ndjson(colunas: List[str], linhas: AsyncIterator[Sequence]) -> AsyncIterator[bytes]:
+    partes = []
+    async for linha in linhas:
+        partes.append(json.dumps(dict(zip(colunas, linha)), default=_json, ensure_ascii=False))
+        if len(partes) >= LINHAS_POR_LOTE:
+            yield ("\n".join(partes) + "\n").encode("utf-8")
+            partes = []
+    if partes:
+        yield ("\n".join(partes) + "\n").encode("utf-8")
+
+
+def _json(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return _texto(valor)
+
+
+def _celula(valor):
+    if isinstance(valor, enum.Enum):
+        return valor.value
+    if isinstance(valor, datetime) and valor.tzinfo is not None:
+        # O Excel não guarda fuso horário: exporta no horário de Brasília
+        return to_brazil_tz(valor).replace(tzinfo=None)
+    return valor
+
+
+def _anexar(aba, lote: List[Sequence]) -> None:
+    for linha in lote:
+        aba.append([_celula(valor) for valor in linha])
+
+
+def _salvar(planilha: Workbook, arquivo) -> None:
+    planilha.save(arquivo)
+    arquivo.seek(0)
+
+
+async def _xlsx(colunas: List[str], linhas: AsyncIterator[Sequence]) -> AsyncIterator[bytes]:
+    # Modo write_only grava as linhas em disco à medida que chegam; o arquivo
+    # final (zip) só pode ser enviado depois da última linha. A escrita da
+    # planilha é síncrona (CPU e disco) e roda no threadpool, em lotes, para
+    # não bloquear o event loop
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet()
+    aba.append(colunas)
+    lote = []
+    async for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= LINHAS_POR_LOTE:
+            await run_in_threadpool(_anexar, aba, lote)
+            lote = []
+    if lote:
+        await run_in_threadpool(_anexar, aba, lote)
+
+    with tempfile.TemporaryFile() as arquivo:
+        await run_in_threadpool(_salvar, planilha, arquivo)
+        while True:
+            bloco = await run_in_threadpool(arquivo.read, TAMANHO_BLOCO)
+            if not bloco:
+                break
+            yield bloco
@@ -0,0 +1,155 @@
+"""
+Paginação por cursor (keyset) para as listagens
+O cursor é opaco para o cliente: base64 dos valores de ordenação do último item
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Date, DateTime, Numeric, and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.functions import FunctionElement
+
+# Ordenação keyset: (coluna, descendente). A última coluna deve ser única (id)
+Ordenacao = Sequence[Tuple[InstrumentedAttribute, bool]]
+
+
+class instante(FunctionElement):
+    """Data/hora comparada no filtro do cursor.
+
+    No SQLite as datas são texto: o padrão do banco (CURRENT_TIMESTAMP) grava
+    "AAAA-MM-DD HH:MM:SS" e os parâmetros vão com microssegundos, então o mesmo
+    instante não seria igual a si mesmo; os dois lados são normalizados.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(instante)
+def _instante(elemento, compilador, **kw):
+    return compilador.process(elemento.clauses, **kw)
+
+
+@compiles(instante, "sqlite")
+def _instante_sqlite(elemento, compilador, **kw):
+    return "strftime('%%Y-%%m-%%d %%H:%%M:%%f', %s)" % compilador.process(elemento.clauses, **kw)
+
+
+def _serializar(valor: Any) -> Any:
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def _desserializar(coluna: InstrumentedAttribute, valor: Any) -> Any:
+    if valor is None:
+        return None
+    tipo = coluna.property.columns[0].type
+    if isinstance(tipo, DateTime):
+        return datetime.fromisoformat(valor)
+    if isinstance(tipo, Date):
+        return date.fromisoformat(valor)
+    if isinstance(tipo, Numeric):
+        return Decimal(valor)
+    return valor
+
+
+def codificar_cursor(valores: Sequence[Any]) -> str:
+    """Gera o cursor opaco a partir dos valores de ordenação"""
+    bruto = json.dumps([_serializar(v) for v in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, ordenacao: Ordenacao) -> List[Any]:
+    """Lê o cursor recebido; cursores malformados geram 400"""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+        if not isinstance(valores, list) or len(valores) != len(ordenacao):
+            raise ValueError
+        return [_desserializar(coluna, v) for (coluna, _), v in zip(ordenacao, valores)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginação inválido"
+        )
+
+
+def filtro_apos(ordenacao: Ordenacao, valores: Sequence[Any]):
+    """Condição "depois do cursor" expandida em ORs, o que aproveita os índices compostos"""
+    termos = [
+        (instante(coluna), instante(valor)) if isinstance(valor, datetime) else (coluna, valor)
+        for (coluna, _), valor in zip(ordenacao, valores)
+    ]
+    condicoes = []
+    for i, (_, descendente) in enumerate(ordenacao):
+        iguais = [c == v for c, v in termos[:i]]
+        coluna, valor = termos[i]
+        passo = coluna < valor if descendente else coluna > valor
+        condicoes.append(and_(*iguais, passo))
+    return or_(*condicoes)
+
+
+def ordem(ordenacao: Ordenacao) -> list:
+    return [coluna.desc() if descendente else coluna.asc() for coluna, descendente in ordenacao]
+
+
+async def pagina_por_cursor(
+    db: AsyncSession,
+    query: Select,
+    ordenacao: Ordenacao,
+    cursor: str,
+    limit: int
+) -> Tuple[list, Optional[str]]:
+    """
+    Busca uma página a partir do cursor ("" = primeira página).
+    Retorna os itens e o cursor da próxima página (None na última).
+    Consultas com colunas extras (entidade + agregados) retornam as linhas;
+    o cursor usa a entidade da primeira coluna.
+    """
+    if cursor:
+        query = query.where(filtro_apos(ordenacao, decodificar_cursor(cursor, ordenacao)))
+
+    linhas = len(query.column_descriptions) > 1
+    consulta = query.order_by(*ordem(ordenacao)).limit(limit + 1)
+    itens = (await (db.execute(consulta) if linhas else db.scalars(consulta))).all()
+    if len(itens) <= limit:
+        return list(itens), None
+
+    itens = list(itens[:limit])
+    ultimo = itens[-1][0] if linhas else itens[-1]
+    return itens, codificar_cursor([getattr(ultimo, coluna.key) for coluna, _ in ordenacao])
+
+
+async def contar(db: AsyncSession, query: Select) -> int:
+    """COUNT(*) dos registros da consulta (sem ordenação nem paginação)"""
+    return await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+
+def paginacao_offset(skip: int, limit: int, total: Optional[int]) -> dict:
+    """Bloco "paginacao" das respostas em modo offset (total None quando não calculado)"""
+    return {
+        "pagina": (skip // limit) + 1,
+        "itensPorPagina": limit,
+        "totalItens": total,
+        "totalPaginas": (total + limit - 1) // limit if total is not None else None
+    }
+
+
+def paginacao_cursor(limit: int, proximo_cursor: Optional[str], total: Optional[int]) -> dict:
+    """Bloco "paginacao" das respostas em modo cursor"""
+    return {
+        "itensPorPagina": limit,
+        "proximoCursor": proximo_cursor,
+        "temMais": proximo_cursor is not None,
+        "totalItens": total
+    }
@@ -0,0 +1,29 @@
+"""
+Normalização de textos para busca: sem acentos, minúsculo, só letras e dígitos
+Usada nas colunas de busca (nome_busca, cpf_ou_cnpj_digitos) e nos termos pesquisados
+"""
+
+import re
+import unicodedata
+from typing import List, Optional
+
+_NAO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+_NAO_DIGITO = re.compile(r"\D+")
+
+
+def normalizar_texto(*partes: Optional[str]) -> str:
+    """'José  Açougue', 'Ltda.' -> 'jose acougue ltda'"""
+    texto = " ".join(parte for parte in partes if parte)
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(caractere for caractere in texto if not unicodedata.combining(caractere))
+    return _NAO_ALFANUMERICO.sub(" ", texto.lower()).strip()
+
+
+def palavras_busca(termo: Optional[str]) -> List[str]:
+    """Palavras normalizadas de um termo de busca, sem repetição"""
+    return list(dict.fromkeys(normalizar_texto(termo).split()))
+
+
+def somente_digitos(texto: Optional[str]) -> str:
+    """'12.345.678/0001-90' -> '12345678000190'"""
+    return _NAO_DIGITO.sub("", texto or "")
@@ -1,7 +1,8 @@
+import asyncio
 import os
 import uuid
-import subprocess
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
 from fastapi import UploadFile, HTTPException
 from PIL import Image
 import aiofiles
@@ -10,12 +11,42 @@ from app.core.config import settings
 
 ALLOWED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
 MAX_IMAGE_SIZE = (1920, 1920)  # Max width, height
+UPLOAD_CHUNK_SIZE = 256 * 1024  # bytes read/written per step when saving uploads
 
-async def save_upload_file(upload_file: UploadFile, destination: str) -> None:
-    """Save uploaded file to destination"""
-    async with aiofiles.open(destination, 'wb') as f:
-        content = await upload_file.read()
-        await f.write(content)
+# Image encoding is CPU bound: it runs in a bounded process pool, off the event loop
+_image_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_image_pool() -> ProcessPoolExecutor:
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_WORKERS)
+    return _image_pool
+
+def shutdown_image_pool() -> None:
+    """Stop the image worker processes (application shutdown)"""
+    global _image_pool
+    if _image_pool is not None:
+        _image_pool.shutdown(wait=False, cancel_futures=True)
+        _image_pool = None
+
+async def save_upload_file(upload_file: UploadFile, destination: str, max_size: int = settings.MAX_FILE_SIZE) -> int:
+    """Save uploaded file to destination in chunks, enforcing max_size. Returns the size in bytes"""
+    size = 0
+    try:
+        async with aiofiles.open(destination, 'wb') as f:
+            while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Arquivo muito grande. Máximo: {max_size / (1024*1024):.1f}MB"
+                    )
+                await f.write(chunk)
+    except BaseException:
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise
+    return size
 
 def validate_image_file(filename: str, file_size: int) -> None:
     """Validate image file"""
@@ -38,20 +69,44 @@ def validate_image_file(filename: str, file_size: int) -> None:
         )
 
 def resize_image(image_path: str, max_size: tuple = MAX_IMAGE_SIZE) -> None:
-    """Resize image if it's too large"""
+    """Resize image if it's too large (runs in a worker process)"""
+    with Image.open(image_path) as img:
+        # Convert to RGB if necessary
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGB')
+        
+        # Resize if necessary
+        if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
+            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+            img.save(image_path, optimize=True, quality=85)
+
+async def resize_image_async(image_path: str, max_size: tuple = MAX_IMAGE_SIZE) -> None:
+    """Resize image in the process pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
     try:
-        with Image.open(image_path) as img:
-            # Convert to RGB if necessary
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            
-            # Resize if necessary
-            if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                img.save(image_path, optimize=True, quality=85)
+        await loop.run_in_executor(_get_image_pool(), resize_image, image_path, max_size)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar imagem: {str(e)}")
 
+async def _run_rclone(args: List[str]) -> bool:
+    """Run an rclone command as an async subprocess. Returns True on success"""
+    process = await asyncio.create_subprocess_exec(
+        "rclone", *args, "--config", settings.RCLONE_CONFIG_PATH,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout=settings.RCLONE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        print(f"Erro no rclone: tempo esgotado após {settings.RCLONE_TIMEOUT_SECONDS}s")
+        return False
+    if process.returncode != 0:
+        print(f"Erro no rclone: {stderr.decode(errors='replace')}")
+        return False
+    return True
+
 async def upload_image_to_gdrive(local_path: str, filename: str) -> Optional[str]:
     """Upload image to Google Drive using rclone"""
     try:
@@ -59,31 +114,25 @@ async def upload_image_to_gdrive(local_path: str, filename: str) -> Optional[str
         unique_filename = f"{uuid.uuid4()}_{filename}"
         
         # Upload to Google Drive
-        cmd = [
-            "rclone", 
-            "copy", 
+        uploaded = await _run_rclone([
+            "copy",
             local_path,
-            f"{settings.GDRIVE_REMOTE_NAME}:{settings.GDRIVE_FOLDER_ID}/{unique_filename}",
-            "--config", settings.RCLONE_CONFIG_PATH
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
+            f"{settings.GDRIVE_REMOTE_NAME}:{settings.GDRIVE_FOLDER_ID}/{unique_filename}"
+        ])
         
-        if result.returncode == 0:
+        if uploaded:
             # Generate public link (this would need to be implemented based on your Google Drive setup)
             # For now, return a placeholder URL
             return f"https://drive.google.com/file/d/{unique_filename}/view"
-        else:
-            print(f"Erro no rclone: {result.stderr}")
-            return None
-            
+        return None
+    
     except Exception as e:
         print(f"Erro ao fazer upload para Google Drive: {str(e)}")
         return None
 
 async def process_and_upload_image(upload_file: UploadFile) -> Optional[str]:
     """Process and upload image file"""
-    # Validate file
+    # Validate file (size is checked again while streaming, since it may be unknown here)
     validate_image_file(upload_file.filename, upload_file.size or 0)
     
     # Generate unique filename
@@ -96,7 +145,7 @@ async def process_and_upload_image(upload_file: UploadFile) -> Optional[str]:
         await save_upload_file(upload_file, local_path)
         
         # Resize image if necessary
-        resize_image(local_path)
+        await resize_image_async(local_path)
         
         # Upload to Google Drive
         gdrive_url = await upload_image_to_gdrive(local_path, unique_filename)
@@ -106,30 +155,25 @@ async def process_and_upload_image(upload_file: UploadFile) -> Optional[str]:
             os.remove(local_path)
         
         return gdrive_url
-        
+    
     except Exception as e:
         # Clean up local file on error
         if os.path.exists(local_path):
             os.remove(local_path)
         raise e
 
-def delete_image_from_gdrive(image_url: str) -> bool:
+async def delete_image_from_gdrive(image_url: str) -> bool:
     """Delete image from Google Drive"""
     try:
         # Extract filename from URL (this is a simplified example)
         # You would need to implement proper URL parsing based on your Google Drive setup
         filename = image_url.split('/')[-2] if '/' in image_url else image_url
         
-        cmd = [
-            "rclone", 
-            "delete", 
-            f"{settings.GDRIVE_REMOTE_NAME}:{settings.GDRIVE_FOLDER_ID}/{filename}",
-            "--config", settings.RCLONE_CONFIG_PATH
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        return result.returncode == 0
-        
+        return await _run_rclone([
+            "delete",
+            f"{settings.GDRIVE_REMOTE_NAME}:{settings.GDRIVE_FOLDER_ID}/{filename}"
+        ])
+    
     except Exception as e:
         print(f"Erro ao deletar imagem do Google Drive: {str(e)}")
         return False
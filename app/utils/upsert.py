@@ -0,0 +1,35 @@
+"""
+INSERT com atualização em caso de chave duplicada, em um único comando
+MySQL: ON DUPLICATE KEY UPDATE; SQLite/PostgreSQL: ON CONFLICT DO UPDATE
+"""
+
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import Table
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def inserir_ou_atualizar(
+    db: Session,
+    tabela: Table,
+    linhas: List[dict],
+    chaves: List[str],
+    ao_conflitar: Callable[[Any], Dict[str, Any]]
+) -> None:
+    """Insere as linhas; as que colidem com `chaves` recebem os SETs de `ao_conflitar`.
+
+    `ao_conflitar` recebe a coleção com os valores propostos pela linha
+    (`inserted` no MySQL, `excluded` nos demais) e devolve {coluna: expressão};
+    referências a `tabela.c` são os valores já gravados.
+    """
+    if not linhas:
+        return
+    dialeto = db.get_bind().dialect.name
+    if dialeto == "mysql":
+        comando = mysql.insert(tabela)
+        comando = comando.on_duplicate_key_update(ao_conflitar(comando.inserted))
+    else:
+        comando = (postgresql if dialeto == "postgresql" else sqlite).insert(tabela)
+        comando = comando.on_conflict_do_update(index_elements=chaves, set_=ao_conflitar(comando.excluded))
+    db.execute(comando, linhas)
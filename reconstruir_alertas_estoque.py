@@ -0,0 +1,28 @@
+"""
+Script para reconstruir os alertas de estoque (tabela alertas_estoque)
+Use para corrigir divergências (a migração já preenche a tabela)
+
+Uso:
+    python reconstruir_alertas_estoque.py
+"""
+
+from app.core.database import SessionLocal
+from app.services.alertas_estoque import AlertaEstoqueService
+
+
+def main():
+    """Função principal"""
+    print("🔄 Reconstruindo alertas_estoque...")
+    db = SessionLocal()
+    try:
+        linhas = AlertaEstoqueService(db).reconstruir()
+        print(f"✅ {linhas} produtos em alerta")
+    except Exception as e:
+        print(f"❌ Erro ao reconstruir alertas_estoque: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
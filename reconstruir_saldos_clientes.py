@@ -0,0 +1,28 @@
+"""
+Script para reconstruir o saldo pendente por cliente (tabela saldos_clientes)
+Use para corrigir divergências (a migração já preenche a tabela)
+
+Uso:
+    python reconstruir_saldos_clientes.py
+"""
+
+from app.core.database import SessionLocal
+from app.services.saldo_cliente import SaldoClienteService
+
+
+def main():
+    """Função principal"""
+    print("🔄 Reconstruindo saldos_clientes...")
+    db = SessionLocal()
+    try:
+        linhas = SaldoClienteService(db).reconstruir()
+        print(f"✅ {linhas} clientes com saldo pendente")
+    except Exception as e:
+        print(f"❌ Erro ao reconstruir saldos_clientes: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Script para reconstruir o rollup diário de vendas (tabela vendas_diarias)
+Use após aplicar a migração ou para corrigir divergências
+
+Uso:
+    python reconstruir_vendas_diarias.py                          # tabela inteira
+    python reconstruir_vendas_diarias.py 2025-01-01 2025-01-31    # apenas o período
+"""
+
+import sys
+from datetime import datetime
+
+from app.core.database import SessionLocal
+from app.services.vendas_diarias import VendasDiariasService
+
+
+def main():
+    """Função principal"""
+    data_inicio = datetime.strptime(sys.argv[1], "%Y-%m-%d").date() if len(sys.argv) > 1 else None
+    data_fim = datetime.strptime(sys.argv[2], "%Y-%m-%d").date() if len(sys.argv) > 2 else None
+
+    print("🔄 Reconstruindo vendas_diarias...")
+    db = SessionLocal()
+    try:
+        linhas = VendasDiariasService(db).reconstruir(data_inicio, data_fim)
+        print(f"✅ {linhas} linhas geradas")
+    except Exception as e:
+        print(f"❌ Erro ao reconstruir vendas_diarias: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
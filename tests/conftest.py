@@ -0,0 +1,92 @@
+"""
+Configuração dos testes: banco SQLite temporário, cliente HTTP e dados de exemplo
+As variáveis de ambiente precisam estar definidas antes de importar a aplicação.
+"""
+
+import os
+import tempfile
+
+_PASTA_TESTES = tempfile.mkdtemp(prefix="vendas_ceasa_testes_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_PASTA_TESTES, 'testes.db')}"
+os.environ["ASYNC_DATABASE_URL"] = ""
+os.environ["DEBUG"] = "False"
+os.environ["RESPONSE_CACHE_BACKEND"] = "desativado"
+os.environ["UPLOAD_FOLDER"] = os.path.join(_PASTA_TESTES, "uploads")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.database import SessionLocal
+from app.core.enums import TipoUsuario
+from app.core.security import get_password_hash
+from app.main import app
+from app.models.usuario import Usuario
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as cliente_http:
+        yield cliente_http
+
+
+@pytest.fixture(scope="session")
+def headers(client):
+    """Cabeçalho de autenticação de um administrador"""
+    db = SessionLocal()
+    db.add(Usuario(
+        nome="Administrador",
+        email="admin@testes.com",
+        cpf_ou_cnpj="00000000000",
+        senha_hash=get_password_hash("senha"),
+        tipo=TipoUsuario.ADMINISTRADOR,
+        ativo=True
+    ))
+    db.commit()
+    db.close()
+
+    resposta = client.post("/api/auth/login", json={"login": "admin@testes.com", "senha": "senha"})
+    assert resposta.status_code == 200, resposta.text
+    return {"Authorization": f"Bearer {resposta.json()['data']['token']}"}
+
+
+def _criar(client, headers, url, dados) -> int:
+    resposta = client.post(url, json=dados, headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()["data"]["id"]
+
+
+@pytest.fixture(scope="session")
+def dados(client, headers):
+    """Clientes, produtos, entradas de estoque e vendas (pendentes e pagas)"""
+    clientes = [
+        _criar(client, headers, "/api/clientes/", {
+            "nome": f"Cliente {i}", "cpf_ou_cnpj": f"{i:011d}", "endereco": "Rua A", "telefone1": "1"
+        })
+        for i in range(1, 4)
+    ]
+    produtos = [
+        _criar(client, headers, "/api/produtos/", {
+            "nome": nome, "preco_venda": "5.00", "tipo_medida": "kg", "estoque_minimo": "10"
+        })
+        for nome in ("Tomate", "Alface", "Cenoura")
+    ]
+    for produto_id in produtos:
+        for custo in ("3.00", "3.50"):
+            _criar(client, headers, "/api/estoque/entradas", {
+                "produto_id": produto_id, "quantidade": "100", "tipo_medida": "kg", "preco_custo": custo
+            })
+
+    vendas = []
+    for cliente_id in clientes:
+        for produto_id in produtos:
+            vendas.append(_criar(client, headers, "/api/vendas/", {
+                "cliente_id": cliente_id,
+                "itens": [{
+                    "produto_id": produto_id, "quantidade": "2", "tipo_medida": "kg",
+                    "valor_unitario": "5", "custo": "3", "lucro_bruto": "4"
+                }]
+            }))
+    resposta = client.put(f"/api/vendas/{vendas[0]}/pagamento", headers=headers)
+    assert resposta.status_code == 200, resposta.text
+
+    return {"clientes": clientes, "produtos": produtos, "vendas": vendas}
@@ -0,0 +1,80 @@
+"""
+Stream de alertas de estoque (Server-Sent Events)
+"""
+
+import json
+from urllib.parse import urlencode
+
+import anyio
+
+from app.core.config import settings
+from app.main import app
+
+URL = "/api/estoque/alertas/stream"
+
+
+def _primeiro_evento(client, params=None, headers=None):
+    """Chama o app ASGI direto (o TestClient só devolve respostas já encerradas),
+    lê até o primeiro evento completo e desconecta. Retorna (status, nome, dados)"""
+    recebido = {"corpo": b""}
+    completo = anyio.Event()
+
+    async def receive():
+        if "pedido" not in recebido:
+            recebido["pedido"] = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await completo.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(mensagem):
+        if mensagem["type"] == "http.response.start":
+            recebido["status"] = mensagem["status"]
+            recebido["headers"] = dict(mensagem["headers"])
+        else:
+            recebido["corpo"] += mensagem.get("body", b"")
+            if b"\n\n" in recebido["corpo"] or not mensagem.get("more_body"):
+                completo.set()
+
+    async def chamar():
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "server": ("testserver", 80), "client": ("testclient", 50000),
+            "root_path": "", "path": URL, "raw_path": URL.encode(),
+            "query_string": urlencode(params or {}).encode(),
+            "headers": [(nome.lower().encode(), valor.encode()) for nome, valor in (headers or {}).items()],
+        }
+        with anyio.fail_after(10):
+            await app(scope, receive, send)
+
+    client.portal.call(chamar)
+    if recebido["status"] != 200:
+        return recebido["status"], None, json.loads(recebido["corpo"])
+
+    assert recebido["headers"][b"content-type"].startswith(b"text/event-stream")
+    campos = dict(
+        linha.split(": ", 1) for linha in recebido["corpo"].decode().split("\n\n", 1)[0].split("\n")
+    )
+    return recebido["status"], campos["event"], json.loads(campos["data"])
+
+
+def test_primeiro_evento_com_token_na_url(client, headers, dados, monkeypatch):
+    monkeypatch.setattr(settings, "ALERTAS_STREAM_INTERVALO_SEGUNDOS", 1)
+    token = headers["Authorization"].removeprefix("Bearer ")
+
+    status, evento, corpo = _primeiro_evento(client, params={"token": token})
+    assert status == 200
+    assert evento == "alertas"
+    assert corpo == client.get("/api/estoque/alertas", headers=headers).json()
+
+
+def test_primeiro_evento_com_header(client, headers, dados, monkeypatch):
+    monkeypatch.setattr(settings, "ALERTAS_STREAM_INTERVALO_SEGUNDOS", 1)
+    status, evento, corpo = _primeiro_evento(client, headers=headers)
+    assert status == 200
+    assert evento == "alertas"
+    assert corpo["success"] is True
+
+
+def test_stream_sem_token(client, dados):
+    assert _primeiro_evento(client, params={"token": "invalido"})[0] == 401
+    assert _primeiro_evento(client)[0] == 401
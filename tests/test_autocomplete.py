@@ -0,0 +1,150 @@
+"""
+Autocomplete em memória (IndicePrefixos) e endpoints de sugestões
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.database import SessionLocal
+from app.models.cliente import Cliente
+from app.services.autocomplete import IndicePrefixos
+from tests.conftest import _criar
+
+# Ids fora da faixa usada pelo banco de testes
+BASE_ID = 1_000_000
+
+
+def _cliente(deslocamento, nome, nome_fantasia=None, ativo=True):
+    return SimpleNamespace(id=BASE_ID + deslocamento, nome=nome, nome_fantasia=nome_fantasia, ativo=ativo)
+
+
+def _ids(sugestoes):
+    return [sugestao["id"] - BASE_ID for sugestao in sugestoes]
+
+
+@pytest.fixture
+def indice(dados):
+    """Índice de clientes carregado do banco de testes, com registros transitórios acrescentados"""
+    indice = IndicePrefixos(Cliente, ("nome", "nome_fantasia"))
+    db = SessionLocal()
+    try:
+        indice.carregar(db)
+    finally:
+        db.close()
+    return indice
+
+
+def test_carregar_do_banco(indice, dados):
+    assert indice.carregado
+    ids = [sugestao["id"] for sugestao in indice.buscar("cliente", 50)]
+    assert set(dados["clientes"]) <= set(ids)
+
+
+def test_acentos_e_maiusculas(indice):
+    indice.atualizar(_cliente(1, "José Açougue", "Casa do Zé Xavantes"))
+    assert _ids(indice.buscar("acou", 10)) == [1]
+    assert _ids(indice.buscar("JOSE", 10)) == [1]
+    assert _ids(indice.buscar("zé xav", 10)) == [1]
+    assert indice.buscar("acougue", 10) == [
+        {"id": BASE_ID + 1, "nome": "José Açougue", "nome_fantasia": "Casa do Zé Xavantes"}
+    ]
+    assert indice.buscar(" .- ", 10) == []
+
+
+def test_prefixo_de_qualquer_palavra(indice):
+    indice.atualizar(_cliente(2, "Mercearia Xucuru Ltda"))
+    assert _ids(indice.buscar("xucu", 10)) == [2]
+    assert _ids(indice.buscar("ltda", 10)) == [2]
+    # Só inícios de palavra: trechos do meio não casam
+    assert indice.buscar("ucuru", 10) == []
+
+
+def test_limite_prioriza_inicio_do_texto(indice):
+    for deslocamento, nome in ((3, "Feira do Xingu"), (4, "Xingu Frutas"), (5, "Xingu Verduras")):
+        indice.atualizar(_cliente(deslocamento, nome))
+    assert _ids(indice.buscar("xingu", 2)) == [4, 5]
+    assert _ids(indice.buscar("xingu", 10)) == [4, 5, 3]
+    assert len(indice.buscar("xingu", 1)) == 1
+
+
+def test_inativos_filtrados(indice):
+    indice.atualizar(_cliente(6, "Banca Xokleng", ativo=False))
+    assert indice.buscar("xokleng", 10) == []
+    assert _ids(indice.buscar("xokleng", 10, incluir_inativos=True)) == [6]
+
+
+def test_renomear_e_remover(indice):
+    indice.atualizar(_cliente(7, "Hortifruti Xeta"))
+    assert _ids(indice.buscar("xeta", 10)) == [7]
+
+    indice.atualizar(_cliente(7, "Hortifruti Yawalapiti"))
+    assert indice.buscar("xeta", 10) == []
+    assert indice.buscar("yawa", 10)[0]["nome"] == "Hortifruti Yawalapiti"
+    assert _ids(indice.buscar("hortifruti", 10)) == [7]
+
+    indice.remover(BASE_ID + 7)
+    assert indice.buscar("yawa", 10) == []
+    assert indice.buscar("hortifruti", 10) == []
+    # Remover de novo (ou um id desconhecido) não falha
+    indice.remover(BASE_ID + 7)
+
+
+def test_atualizacoes_ignoradas_antes_de_carregar():
+    indice = IndicePrefixos(Cliente, ("nome", "nome_fantasia"))
+    indice.atualizar(_cliente(8, "Xerente"))
+    assert not indice.carregado
+    assert indice.buscar("xerente", 10) == []
+
+
+def _sugestoes(client, headers, url, **params):
+    resposta = client.get(url, params=params, headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    return [sugestao["id"] for sugestao in resposta.json()["data"]]
+
+
+def test_autocomplete_clientes(client, headers, dados):
+    url = "/api/clientes/autocomplete"
+    cliente_id = _criar(client, headers, "/api/clientes/", {
+        "nome": "Quitanda Xerém", "nome_fantasia": "Frutas da Vó", "cpf_ou_cnpj": "66666666666",
+        "endereco": "Rua D", "telefone1": "4"
+    })
+    assert _sugestoes(client, headers, url, nome="xere") == [cliente_id]
+    assert _sugestoes(client, headers, url, nome="VO") == [cliente_id]
+
+    resposta = client.put(f"/api/clientes/{cliente_id}", json={"nome": "Quitanda Jequitibá"}, headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    assert _sugestoes(client, headers, url, nome="xere") == []
+    assert _sugestoes(client, headers, url, nome="jequi") == [cliente_id]
+
+    resposta = client.put(f"/api/clientes/{cliente_id}", json={"ativo": False}, headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    assert _sugestoes(client, headers, url, nome="jequi") == []
+    assert _sugestoes(client, headers, url, nome="jequi", incluir_inativos=True) == [cliente_id]
+
+    assert client.delete(f"/api/clientes/{cliente_id}", headers=headers).status_code == 200
+    assert _sugestoes(client, headers, url, nome="jequi", incluir_inativos=True) == []
+
+    assert client.get(url, params={"nome": ""}, headers=headers).status_code == 422
+
+
+def test_autocomplete_produtos(client, headers, dados):
+    url = "/api/produtos/autocomplete"
+    produtos = [
+        _criar(client, headers, "/api/produtos/", {
+            "nome": nome, "preco_venda": "3.00", "tipo_medida": "kg", "estoque_minimo": "0"
+        })
+        for nome in ("Jiló Comprido", "Jiló Redondo", "Maxixe do Jiló")
+    ]
+    assert _sugestoes(client, headers, url, nome="jilo") == produtos
+    assert _sugestoes(client, headers, url, nome="jilo", limit=2) == produtos[:2]
+    assert _sugestoes(client, headers, url, nome="REDON") == [produtos[1]]
+
+    resposta = client.put(f"/api/produtos/{produtos[1]}", json={"nome": "Maxixe Redondo"}, headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    assert _sugestoes(client, headers, url, nome="jilo") == [produtos[0], produtos[2]]
+    # Em ordem alfabética do texto normalizado: "maxixe do jilo" antes de "maxixe redondo"
+    assert _sugestoes(client, headers, url, nome="maxixe") == [produtos[2], produtos[1]]
+
+    assert client.delete(f"/api/produtos/{produtos[0]}", headers=headers).status_code == 200
+    assert _sugestoes(client, headers, url, nome="jilo") == [produtos[2]]
@@ -0,0 +1,57 @@
+"""
+Cache de respostas com ETag: 304 para If-None-Match e invalidação após escritas
+"""
+
+import pytest
+
+from app.utils import cache_respostas
+from tests.conftest import _criar
+
+URL = "/api/vendas/dashboard"
+
+
+@pytest.fixture
+def cache_memoria(monkeypatch):
+    """Liga o backend em memória só para o teste (os demais rodam sem cache)"""
+    backend = cache_respostas.BackendMemoria(maxsize=16, ttl=60)
+    monkeypatch.setattr(cache_respostas, "backend", backend)
+    return backend
+
+
+def test_if_none_match_retorna_304(client, headers, dados, cache_memoria):
+    resposta = client.get(URL, headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    etag = resposta.headers["ETag"]
+
+    resposta = client.get(URL, headers={**headers, "If-None-Match": etag})
+    assert resposta.status_code == 304
+    assert resposta.content == b""
+    assert resposta.headers["ETag"] == etag
+
+    # ETag diferente: corpo completo
+    resposta = client.get(URL, headers={**headers, "If-None-Match": '"outro"'})
+    assert resposta.status_code == 200
+    assert resposta.headers["ETag"] == etag
+
+
+def test_escrita_invalida_cache(client, headers, dados, cache_memoria):
+    resposta = client.get(URL, headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    etag = resposta.headers["ETag"]
+    total = resposta.json()["data"]["vendas_periodo"]["total_vendas"]
+
+    # Segunda leitura sai do cache, sem tocar no banco
+    assert client.get(URL, headers=headers).headers["ETag"] == etag
+
+    _criar(client, headers, "/api/vendas/", {
+        "cliente_id": dados["clientes"][0],
+        "itens": [{
+            "produto_id": dados["produtos"][0], "quantidade": "1", "tipo_medida": "kg",
+            "valor_unitario": "5", "custo": "3", "lucro_bruto": "2"
+        }]
+    })
+
+    resposta = client.get(URL, headers={**headers, "If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert resposta.headers["ETag"] != etag
+    assert resposta.json()["data"]["vendas_periodo"]["total_vendas"] == total + 1
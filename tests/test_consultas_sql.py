@@ -0,0 +1,41 @@
+"""
+Quantidade de comandos SQL por requisição nas listagens (ContadorSQL)
+
+Os dados de exemplo têm 9 vendas de 3 clientes e 3 produtos, com 2 entradas
+de estoque por produto; uma consulta por linha (N+1) ultrapassa os limites.
+"""
+
+import pytest
+
+from app.utils.contador_sql import ContadorSQL
+
+PERIODO = "data_inicio=2020-01-01&data_fim=2099-12-31"
+
+# (url, máximo de comandos)
+LISTAGENS = [
+    ("/api/vendas/?limit=100", 3),
+    ("/api/vendas/?cliente_id={cliente_id}&limit=100", 3),
+    ("/api/vendas/dashboard", 5),
+    ("/api/clientes/?limit=100", 2),
+    ("/api/produtos/?limit=100", 2),
+    ("/api/estoque/entradas?limit=100", 2),
+    ("/api/estoque/entradas/deletaveis?produto_id={produto_id}", 3),
+    ("/api/estoque/inventario", 2),
+    (f"/api/estoque/fluxo-caixa?{PERIODO}", 3),
+    (f"/api/estoque/rentabilidade?{PERIODO}", 1),
+    ("/api/relatorios/pagamentos-pendentes", 2),
+    ("/api/relatorios/historico-vendas/{cliente_id}", 5),
+    ("/api/relatorios/resumo-financeiro/{cliente_id}", 6),
+    ("/api/relatorios/dashboard-vendas", 3),
+    ("/api/relatorios/clientes-inadimplentes?dias_minimo=0", 1),
+]
+
+
+@pytest.mark.parametrize("modelo_url,maximo", LISTAGENS)
+def test_listagens_sem_n_mais_1(client, headers, dados, modelo_url, maximo):
+    url = modelo_url.format(cliente_id=dados["clientes"][0], produto_id=dados["produtos"][0])
+
+    with ContadorSQL() as contador:
+        resposta = client.get(url, headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    contador.verificar_maximo(maximo, url)
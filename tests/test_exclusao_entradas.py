@@ -0,0 +1,62 @@
+"""
+Entradas de estoque que podem ser excluídas: camadas FIFO já consumidas bloqueiam a exclusão
+"""
+
+from decimal import Decimal
+
+from sqlalchemy.orm import selectinload
+
+from app.core.database import SessionLocal
+from app.models.venda import Venda
+from app.services.fluxo_caixa import FluxoCaixaService
+from tests.conftest import _criar
+
+
+def test_flags_de_exclusao_com_camadas_consumidas(client, headers, dados):
+    produto_id = _criar(client, headers, "/api/produtos/", {
+        "nome": "Beterraba", "preco_venda": "5.00", "tipo_medida": "kg", "estoque_minimo": "0"
+    })
+    entradas = [
+        _criar(client, headers, "/api/estoque/entradas", {
+            "produto_id": produto_id, "quantidade": "10", "tipo_medida": "kg", "preco_custo": custo
+        })
+        for custo in ("2.00", "3.00", "4.00")
+    ]
+
+    # 12 kg: esgota a primeira camada e consome parte da segunda
+    venda_id = _criar(client, headers, "/api/vendas/", {
+        "cliente_id": dados["clientes"][0],
+        "itens": [{
+            "produto_id": produto_id, "quantidade": "12", "tipo_medida": "kg",
+            "valor_unitario": "5", "custo": "2.17", "lucro_bruto": "2.83"
+        }]
+    })
+    db = SessionLocal()
+    try:
+        venda = db.get(Venda, venda_id, options=[selectinload(Venda.itens), selectinload(Venda.cliente)])
+        FluxoCaixaService(db).processar_venda(venda)
+    finally:
+        db.close()
+
+    resposta = client.get(f"/api/estoque/entradas/deletaveis?produto_id={produto_id}", headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    deletaveis = resposta.json()["data"]["entradas_deletaveis"]
+    assert [entrada["id"] for entrada in deletaveis] == [entradas[2]]
+    assert deletaveis[0]["status_exclusao"]["pode_deletar"] is True
+    assert deletaveis[0]["status_exclusao"]["tem_fifo"] is True
+    assert resposta.json()["data"]["paginacao"]["totalItens"] == 1
+
+    usadas = {entradas[0]: Decimal("10"), entradas[1]: Decimal("2"), entradas[2]: Decimal("0")}
+    for entrada_id, usada in usadas.items():
+        resposta = client.get(f"/api/estoque/entradas/{entrada_id}/status-exclusao", headers=headers)
+        assert resposta.status_code == 200, resposta.text
+        status = resposta.json()["data"]
+        assert status["pode_deletar"] is (usada == 0)
+        assert [Decimal(str(fifo["quantidade_usada"])) for fifo in status["detalhes_fifo"]] == [usada]
+        if usada:
+            assert any("utilizada em vendas" in motivo for motivo in status["motivos_bloqueio"])
+        else:
+            assert status["motivos_bloqueio"] == []
+
+    resposta = client.get("/api/estoque/entradas/0/status-exclusao", headers=headers)
+    assert resposta.status_code == 404
@@ -0,0 +1,21 @@
+"""
+Exportação de relatórios em XLSX (StreamingResponse)
+"""
+
+import io
+
+from openpyxl import load_workbook
+
+
+def test_exportar_historico_xlsx(client, headers, dados):
+    cliente_id = dados["clientes"][1]
+    resposta = client.get(f"/api/relatorios/historico-vendas/{cliente_id}?format=xlsx", headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.headers["content-type"].startswith(
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+    aba = load_workbook(io.BytesIO(resposta.content), read_only=True).active
+    linhas = list(aba.iter_rows(values_only=True))
+    # Cabeçalho e uma linha por venda do cliente
+    assert len(linhas) == 1 + 3
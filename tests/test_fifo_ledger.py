@@ -0,0 +1,100 @@
+"""
+Cache das camadas FIFO (fifo_ledger) comparado com o FIFO gravado no banco
+"""
+
+from decimal import Decimal
+
+from sqlalchemy.orm import selectinload
+
+from app.core.database import SessionLocal
+from app.models.estoque import EstoqueFifo
+from app.models.venda import Venda
+from app.services.fluxo_caixa import FluxoCaixaService
+from tests.conftest import _criar
+
+QUANTIDADE_COTADA = Decimal("15")
+
+
+def _custo_no_banco(produto_id, quantidade):
+    """Custo FIFO calculado direto das camadas abertas no banco"""
+    db = SessionLocal()
+    try:
+        camadas = db.query(EstoqueFifo).filter(
+            EstoqueFifo.produto_id == produto_id,
+            EstoqueFifo.finalizado == False,
+            EstoqueFifo.quantidade_restante > 0
+        ).order_by(EstoqueFifo.data_entrada, EstoqueFifo.id).all()
+        ultima = db.query(EstoqueFifo).filter(
+            EstoqueFifo.produto_id == produto_id
+        ).order_by(EstoqueFifo.data_entrada.desc(), EstoqueFifo.id.desc()).first()
+    finally:
+        db.close()
+
+    total = Decimal("0")
+    for camada in camadas:
+        usada = min(quantidade, camada.quantidade_restante)
+        total += usada * camada.preco_custo_unitario
+        quantidade -= usada
+    return total + quantidade * ultima.preco_custo_unitario
+
+
+def _cotar(client, headers, produto_id):
+    resposta = client.get(
+        f"/api/estoque/custo-fifo/{produto_id}?quantidade={QUANTIDADE_COTADA}", headers=headers
+    )
+    assert resposta.status_code == 200, resposta.text
+    return Decimal(str(resposta.json()["data"]["custo_total"]))
+
+
+def _produto_com_camadas(client, headers, nome):
+    produto_id = _criar(client, headers, "/api/produtos/", {
+        "nome": nome, "preco_venda": "5.00", "tipo_medida": "kg", "estoque_minimo": "0"
+    })
+    for custo in ("2.00", "3.00"):
+        _criar(client, headers, "/api/estoque/entradas", {
+            "produto_id": produto_id, "quantidade": "10", "tipo_medida": "kg", "preco_custo": custo
+        })
+    return produto_id
+
+
+def _venda(client, headers, cliente_id, produto_id, quantidade):
+    venda_id = _criar(client, headers, "/api/vendas/", {
+        "cliente_id": cliente_id,
+        "itens": [{
+            "produto_id": produto_id, "quantidade": quantidade, "tipo_medida": "kg",
+            "valor_unitario": "5", "custo": "3", "lucro_bruto": "2"
+        }]
+    })
+    db = SessionLocal()
+    venda = db.get(Venda, venda_id, options=[selectinload(Venda.itens), selectinload(Venda.cliente)])
+    return db, venda
+
+
+def test_cotacao_apos_venda(client, headers, dados):
+    produto_id = _produto_com_camadas(client, headers, "Pimentao")
+    # Cache carregado antes da venda: a baixa precisa ser aplicada nele após o commit
+    assert _cotar(client, headers, produto_id) == Decimal("35.00")
+
+    db, venda = _venda(client, headers, dados["clientes"][0], produto_id, "4")
+    try:
+        FluxoCaixaService(db).processar_venda(venda)
+    finally:
+        db.close()
+
+    assert _cotar(client, headers, produto_id) == _custo_no_banco(produto_id, QUANTIDADE_COTADA) == Decimal("39.00")
+
+
+def test_cotacao_apos_rollback(client, headers, dados, monkeypatch):
+    produto_id = _produto_com_camadas(client, headers, "Berinjela")
+    assert _cotar(client, headers, produto_id) == Decimal("35.00")
+
+    db, venda = _venda(client, headers, dados["clientes"][0], produto_id, "12")
+    try:
+        # A transação da venda é desfeita em vez de confirmada
+        monkeypatch.setattr(db, "commit", db.flush)
+        FluxoCaixaService(db).processar_venda(venda)
+        db.rollback()
+    finally:
+        db.close()
+
+    assert _cotar(client, headers, produto_id) == _custo_no_banco(produto_id, QUANTIDADE_COTADA) == Decimal("35.00")
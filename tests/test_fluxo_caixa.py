@@ -0,0 +1,84 @@
+"""
+Relatório de fluxo de caixa: totais agregados no banco e páginas de movimentações
+"""
+
+from decimal import Decimal
+
+from sqlalchemy.orm import selectinload
+
+from app.core.database import SessionLocal
+from app.models.estoque import LucroBruto, MovimentacaoCaixa, TipoMovimentacao
+from app.models.venda import Venda
+from app.services.fluxo_caixa import FluxoCaixaService
+from tests.conftest import _criar
+
+
+def _decimal(valor):
+    return Decimal(str(valor))
+
+
+def _seed(client, headers, cliente_id):
+    """Produto com 3 entradas e 2 vendas processadas: 5 movimentações"""
+    produto_id = _criar(client, headers, "/api/produtos/", {
+        "nome": "Abobrinha", "preco_venda": "6.00", "tipo_medida": "kg", "estoque_minimo": "0"
+    })
+    for quantidade, custo in (("10", "2.00"), ("5", "2.50"), ("8", "3.10")):
+        _criar(client, headers, "/api/estoque/entradas", {
+            "produto_id": produto_id, "quantidade": quantidade, "tipo_medida": "kg", "preco_custo": custo
+        })
+    for quantidade, valor in (("12", "6.00"), ("4.5", "6.40")):
+        venda_id = _criar(client, headers, "/api/vendas/", {
+            "cliente_id": cliente_id,
+            "itens": [{
+                "produto_id": produto_id, "quantidade": quantidade, "tipo_medida": "kg",
+                "valor_unitario": valor, "custo": "2", "lucro_bruto": "1"
+            }]
+        })
+        db = SessionLocal()
+        try:
+            venda = db.get(Venda, venda_id, options=[selectinload(Venda.itens), selectinload(Venda.cliente)])
+            FluxoCaixaService(db).processar_venda(venda)
+        finally:
+            db.close()
+    return produto_id
+
+
+def test_totais_e_paginas_do_fluxo_caixa(client, headers, dados):
+    produto_id = _seed(client, headers, dados["clientes"][0])
+
+    db = SessionLocal()
+    try:
+        movimentacoes = db.query(MovimentacaoCaixa).filter(MovimentacaoCaixa.produto_id == produto_id).all()
+        lucros = db.query(LucroBruto).filter(LucroBruto.produto_id == produto_id).all()
+    finally:
+        db.close()
+    entradas = sum(m.valor_total for m in movimentacoes if m.tipo_movimentacao == TipoMovimentacao.ENTRADA)
+    saidas = sum(m.valor_total for m in movimentacoes if m.tipo_movimentacao == TipoMovimentacao.SAIDA)
+    assert len(movimentacoes) == 5
+
+    url = f"/api/estoque/fluxo-caixa?produto_id={produto_id}&limit=2"
+    ids, total_paginas, skip = [], None, 0
+    while total_paginas is None or skip // 2 < total_paginas:
+        resposta = client.get(f"{url}&skip={skip}", headers=headers)
+        assert resposta.status_code == 200, resposta.text
+        pagina = resposta.json()["data"]
+        # Os totais cobrem todo o filtro em qualquer página
+        assert _decimal(pagina["total_entradas"]) == entradas
+        assert _decimal(pagina["total_saidas"]) == saidas
+        assert _decimal(pagina["saldo"]) == saidas - entradas
+        assert _decimal(pagina["lucro_bruto_total"]) == sum(lucro.lucro_bruto for lucro in lucros)
+        assert pagina["quantidade_vendas"] == 2
+        assert pagina["paginacao"]["totalItens"] == 5
+        assert len(pagina["movimentacoes"]) <= 2
+        total_paginas = pagina["paginacao"]["totalPaginas"]
+        ids += [mov["id"] for mov in pagina["movimentacoes"]]
+        skip += 2
+
+    assert total_paginas == 3
+    assert sorted(ids) == sorted(m.id for m in movimentacoes)
+
+    # Sem limit explícito vem a página padrão, com o total informado
+    resposta = client.get(f"/api/estoque/fluxo-caixa?produto_id={produto_id}", headers=headers)
+    paginacao = resposta.json()["data"]["paginacao"]
+    assert paginacao["itensPorPagina"] == 100
+    assert paginacao["totalItens"] == 5
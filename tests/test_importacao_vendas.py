@@ -0,0 +1,81 @@
+"""
+Importação de vendas em lote (POST /vendas/bulk)
+"""
+
+import json
+from datetime import datetime
+
+from app.core.database import SessionLocal
+from app.models.venda import Venda
+from app.utils.contador_sql import ContadorSQL
+from tests.conftest import _criar
+
+
+def _importar(client, headers, registros):
+    resposta = client.post(
+        "/api/vendas/bulk",
+        content="\n".join(json.dumps(registro) for registro in registros),
+        headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()["data"]
+
+
+def _item(produto_id, valor="5"):
+    return {
+        "produto_id": produto_id, "quantidade": "1", "tipo_medida": "kg",
+        "valor_unitario": valor, "custo": "3", "lucro_bruto": "2"
+    }
+
+
+def test_importar_datas_com_e_sem_fuso(client, headers, dados):
+    cliente_id = _criar(client, headers, "/api/clientes/", {
+        "nome": "Cliente Importacao", "cpf_ou_cnpj": "77777777777", "endereco": "Rua D", "telefone1": "4"
+    })
+    produto_id = dados["produtos"][0]
+    resultado = _importar(client, headers, [
+        {"cliente_id": cliente_id, "data_venda": "2026-01-10T10:00:00-03:00", "itens": [_item(produto_id)]},
+        {"cliente_id": cliente_id, "data_venda": "2026-01-10T15:00:00Z", "itens": [_item(produto_id)]},
+        {"cliente_id": cliente_id, "data_venda": "2026-01-11T09:00:00", "itens": [_item(produto_id)]},
+        {"cliente_id": cliente_id, "itens": [_item(produto_id)]},
+    ])
+    ids = [registro["venda_id"] for registro in resultado["resultados"]]
+    assert all(registro["sucesso"] for registro in resultado["resultados"]), resultado
+
+    db = SessionLocal()
+    try:
+        datas = {venda.id: venda.data_venda for venda in db.query(Venda).filter(Venda.id.in_(ids))}
+    finally:
+        db.close()
+    # Com fuso: convertidas para o horário de Brasília e gravadas sem fuso
+    assert datas[ids[0]].replace(tzinfo=None) == datetime(2026, 1, 10, 10, 0)
+    assert datas[ids[1]].replace(tzinfo=None) == datetime(2026, 1, 10, 12, 0)
+    assert datas[ids[2]].replace(tzinfo=None) == datetime(2026, 1, 11, 9, 0)
+    assert datas[ids[3]] is not None
+
+
+def test_importar_vendas_em_um_insert(client, headers, dados):
+    produto_id = dados["produtos"][1]
+    registros = [
+        {"cliente_id": cliente_id, "itens": [_item(produto_id, valor), _item(produto_id)]}
+        for cliente_id in dados["clientes"]
+        for valor in ("6", "7")
+    ]
+    with ContadorSQL() as contador:
+        resultado = _importar(client, headers, registros)
+    assert all(registro["sucesso"] for registro in resultado["resultados"]), resultado
+
+    # Todas as vendas do lote em um único INSERT
+    insercoes = [comando for comando in contador.comandos if comando.lstrip().upper().startswith("INSERT INTO VENDAS ")]
+    assert len(insercoes) == 1, insercoes
+
+    # Cada ID devolvido corresponde à venda do registro, na mesma ordem
+    ids = [registro["venda_id"] for registro in resultado["resultados"]]
+    db = SessionLocal()
+    try:
+        vendas = {venda.id: venda for venda in db.query(Venda).filter(Venda.id.in_(ids))}
+    finally:
+        db.close()
+    for registro, venda_id in zip(registros, ids):
+        assert vendas[venda_id].cliente_id == registro["cliente_id"]
+        assert vendas[venda_id].total_venda == int(registro["itens"][0]["valor_unitario"]) + 5
@@ -0,0 +1,95 @@
+"""
+Planos de execução das consultas principais dos endpoints (SQLite: EXPLAIN QUERY PLAN)
+
+Cada requisição é executada sobre os dados de exemplo; os SELECTs capturados
+são explicados e o teste falha se alguma tabela indexada pela migração
+8e41c0a7d2f6 for lida por varredura completa ("SCAN tabela" sem índice).
+Listagens sem filtro percorrem um índice na ordem da paginação
+("SCAN tabela USING INDEX ..."), o que é aceito.
+"""
+
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app.core.database import async_engine, engine
+
+TABELAS_INDEXADAS = {
+    "vendas", "itens_venda", "entradas_estoque", "inventarios",
+    "estoque_fifo", "movimentacoes_caixa", "lucros_brutos",
+}
+
+PERIODO = "data_inicio=2020-01-01&data_fim=2099-12-31"
+
+ENDPOINTS = [
+    "/api/vendas/",
+    "/api/vendas/?cliente_id={cliente_id}",
+    "/api/vendas/?situacao_pagamento=Pendente",
+    "/api/vendas/?cliente_id={cliente_id}&situacao_pagamento=Pendente",
+    "/api/vendas/dashboard",
+    "/api/estoque/entradas",
+    "/api/estoque/entradas?produto_id={produto_id}",
+    f"/api/estoque/entradas?{PERIODO}",
+    "/api/estoque/entradas/deletaveis?produto_id={produto_id}",
+    "/api/estoque/inventario?produto_id={produto_id}",
+    "/api/estoque/consulta/{produto_id}",
+    "/api/estoque/custo-fifo/{produto_id}?quantidade=5",
+    f"/api/estoque/fluxo-caixa?{PERIODO}",
+    "/api/estoque/fluxo-caixa?produto_id={produto_id}&" + PERIODO,
+    f"/api/estoque/rentabilidade?{PERIODO}",
+    "/api/relatorios/historico-vendas/{cliente_id}",
+    "/api/relatorios/resumo-financeiro/{cliente_id}",
+    "/api/relatorios/dashboard-vendas",
+    "/api/relatorios/clientes-inadimplentes?dias_minimo=0",
+]
+
+
+@contextmanager
+def capturar_selects():
+    """SELECTs (com parâmetros) executados pelo engine dos endpoints"""
+    comandos = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            comandos.append((statement, parameters))
+
+    alvo = async_engine.sync_engine
+    event.listen(alvo, "before_cursor_execute", registrar)
+    try:
+        yield comandos
+    finally:
+        event.remove(alvo, "before_cursor_execute", registrar)
+
+
+def varreduras_completas(statement, parameters):
+    """Linhas do plano que leem uma tabela indexada sem usar índice (mesmo banco, engine síncrono)"""
+    with engine.connect() as conexao:
+        plano = conexao.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    varreduras = []
+    for linha in plano:
+        detalhe = linha[-1]
+        encontrado = re.match(r"SCAN (\w+)(.*)", detalhe)
+        if encontrado and encontrado.group(1) in TABELAS_INDEXADAS and "INDEX" not in encontrado.group(2):
+            varreduras.append(detalhe)
+    return varreduras
+
+
+@pytest.mark.parametrize("modelo_url", ENDPOINTS)
+def test_consultas_usam_indices(client, headers, dados, modelo_url):
+    if async_engine.dialect.name != "sqlite":
+        pytest.skip("verificação baseada no EXPLAIN QUERY PLAN do SQLite")
+    url = modelo_url.format(cliente_id=dados["clientes"][0], produto_id=dados["produtos"][0])
+
+    with capturar_selects() as comandos:
+        resposta = client.get(url, headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    assert comandos, f"{url}: nenhuma consulta executada"
+
+    problemas = []
+    for statement, parameters in comandos:
+        varreduras = varreduras_completas(statement, parameters)
+        if varreduras:
+            problemas.append(f"{' '.join(statement.split())[:200]}\n    {varreduras}")
+    assert not problemas, f"{url}: varredura completa\n" + "\n".join(problemas)
@@ -0,0 +1,56 @@
+"""
+Paginação por cursor (keyset) das listagens
+"""
+
+from app.core.database import SessionLocal
+from app.models.venda import Venda
+
+
+def _percorrer(client, headers, url, limit):
+    """Todas as páginas a partir do cursor vazio. Retorna (ids na ordem, total da primeira página)"""
+    ids, cursor, total = [], "", None
+    while cursor is not None:
+        resposta = client.get(url, params={"cursor": cursor, "limit": limit}, headers=headers)
+        assert resposta.status_code == 200, resposta.text
+        dados = resposta.json()["data"]
+        if total is None:
+            total = dados["paginacao"]["totalItens"]
+        assert len(dados["items"]) <= limit
+        ids += [item["id"] for item in dados["items"]]
+        cursor = dados["paginacao"]["proximoCursor"]
+    return ids, total
+
+
+def test_cursor_vendas_sem_repeticoes_nem_lacunas(client, headers, dados):
+    db = SessionLocal()
+    try:
+        # Várias vendas criadas no mesmo segundo: o desempate pelo id é exercitado
+        esperado = [
+            venda_id for (venda_id,) in
+            db.query(Venda.id).order_by(Venda.data_venda.desc(), Venda.id.desc())
+        ]
+    finally:
+        db.close()
+
+    ids, total = _percorrer(client, headers, "/api/vendas/", limit=2)
+    assert ids == esperado
+    assert total == len(esperado)
+
+
+def test_cursor_com_filtro(client, headers, dados):
+    cliente_id = dados["clientes"][2]
+    ids, total = _percorrer(client, headers, f"/api/vendas/?cliente_id={cliente_id}", limit=1)
+    assert len(ids) == len(set(ids)) == total
+    assert set(dados["vendas"][6:9]) <= set(ids)
+
+
+def test_cursor_clientes(client, headers, dados):
+    ids, total = _percorrer(client, headers, "/api/clientes/", limit=2)
+    assert ids == sorted(ids)
+    assert len(ids) == total
+    assert set(dados["clientes"]) <= set(ids)
+
+
+def test_cursor_invalido(client, headers, dados):
+    resposta = client.get("/api/vendas/", params={"cursor": "nao-e-um-cursor"}, headers=headers)
+    assert resposta.status_code == 400
@@ -0,0 +1,42 @@
+"""
+Relatórios calculados a partir das tabelas de apoio (saldos_clientes)
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from tests.conftest import _criar
+
+
+def test_inadimplentes_somam_apenas_vendas_em_atraso(client, headers, dados):
+    cliente_id = _criar(client, headers, "/api/clientes/", {
+        "nome": "Cliente Atrasado", "cpf_ou_cnpj": "88888888888", "endereco": "Rua C", "telefone1": "3"
+    })
+    atrasada = (datetime.now() - timedelta(days=45)).isoformat()
+    corpo = "\n".join(
+        json.dumps({
+            "cliente_id": cliente_id,
+            "data_venda": data_venda,
+            "itens": [{
+                "produto_id": dados["produtos"][0], "quantidade": "1", "tipo_medida": "kg",
+                "valor_unitario": valor, "custo": "3", "lucro_bruto": "1"
+            }]
+        })
+        for data_venda, valor in ((atrasada, "7"), (None, "11"))
+    )
+    resposta = client.post(
+        "/api/vendas/bulk", content=corpo,
+        headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert resposta.status_code == 200, resposta.text
+
+    resposta = client.get("/api/relatorios/clientes-inadimplentes?dias_minimo=30", headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    linhas = [
+        linha for linha in resposta.json()["data"]["clientes_inadimplentes"]
+        if linha["cliente"]["id"] == cliente_id
+    ]
+    assert len(linhas) == 1
+    # A venda recente continua pendente, mas não está em atraso
+    assert linhas[0]["divida"]["total_devido"] == 7
+    assert linhas[0]["divida"]["vendas_pendentes"] == 1
@@ -0,0 +1,56 @@
+"""
+Verificação em lote de uso dos produtos (POST /produtos/usage)
+"""
+
+from app.core.database import SessionLocal
+from app.services.uso_referencial import UsoReferencialService
+from tests.conftest import _criar
+
+
+def _produto(client, headers, nome):
+    return _criar(client, headers, "/api/produtos/", {
+        "nome": nome, "preco_venda": "4.00", "tipo_medida": "kg", "estoque_minimo": "0"
+    })
+
+
+def test_uso_em_lote(client, headers, dados):
+    livre = _produto(client, headers, "Quiabo")
+    com_entrada = _produto(client, headers, "Rucula")
+    _criar(client, headers, "/api/estoque/entradas", {
+        "produto_id": com_entrada, "quantidade": "5", "tipo_medida": "kg", "preco_custo": "1.50"
+    })
+    vendido = dados["produtos"][0]
+    inexistente = max(livre, com_entrada, vendido) + 1000
+
+    resposta = client.post(
+        "/api/produtos/usage", json={"ids": [vendido, livre, com_entrada, inexistente, livre]}, headers=headers
+    )
+    assert resposta.status_code == 200, resposta.text
+    data = resposta.json()["data"]
+    produtos = {produto["produto_id"]: produto for produto in data["produtos"]}
+
+    assert list(produtos) == sorted({livre, com_entrada, vendido})
+    assert data["nao_encontrados"] == [inexistente]
+    assert data["resumo"] == {"em_uso": 2, "livres": 1}
+
+    assert produtos[livre]["em_uso"] is False
+    assert produtos[livre]["referencias"] == []
+    assert produtos[com_entrada]["em_uso"] is True
+    assert "entradas de estoque" in produtos[com_entrada]["referencias"]
+    assert "itens de venda" not in produtos[com_entrada]["referencias"]
+    assert {"entradas de estoque", "itens de venda"} <= set(produtos[vendido]["referencias"])
+
+    # A exclusão usa a mesma verificação
+    assert client.delete(f"/api/produtos/{com_entrada}", headers=headers).status_code == 400
+    assert client.delete(f"/api/produtos/{livre}", headers=headers).status_code == 200
+
+
+def test_uso_ids_vazios(client, headers, dados):
+    resposta = client.post("/api/produtos/usage", json={"ids": []}, headers=headers)
+    assert resposta.status_code == 422
+
+    db = SessionLocal()
+    try:
+        assert UsoReferencialService(db).usos_produtos([]) == {}
+    finally:
+        db.close()
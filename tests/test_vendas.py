@@ -0,0 +1,46 @@
+"""
+Criação de vendas e saldo pendente por cliente
+"""
+
+from app.core.database import SessionLocal
+from app.models.venda import SaldoCliente
+from tests.conftest import _criar
+
+
+def test_criar_venda_sem_itens(client, headers, dados):
+    resposta = client.post(
+        "/api/vendas/", json={"cliente_id": dados["clientes"][0], "itens": []}, headers=headers
+    )
+    assert resposta.status_code == 422, resposta.text
+
+
+def _saldo(cliente_id):
+    db = SessionLocal()
+    try:
+        return db.get(SaldoCliente, cliente_id)
+    finally:
+        db.close()
+
+
+def test_saldo_removido_com_a_ultima_venda_pendente(client, headers, dados):
+    cliente_id = _criar(client, headers, "/api/clientes/", {
+        "nome": "Cliente Saldo", "cpf_ou_cnpj": "99999999999", "endereco": "Rua B", "telefone1": "2"
+    })
+    item = {
+        "produto_id": dados["produtos"][0], "quantidade": "1", "tipo_medida": "kg",
+        "valor_unitario": "5", "custo": "3", "lucro_bruto": "2"
+    }
+    vendas = [
+        _criar(client, headers, "/api/vendas/", {"cliente_id": cliente_id, "itens": [item]})
+        for _ in range(2)
+    ]
+    assert _saldo(cliente_id).vendas_pendentes == 2
+
+    resposta = client.put(f"/api/vendas/{vendas[0]}/pagamento", headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    assert _saldo(cliente_id).vendas_pendentes == 1
+
+    resposta = client.delete(f"/api/vendas/{vendas[1]}", headers=headers)
+    assert resposta.status_code == 200, resposta.text
+    # Sem vendas pendentes a linha sai de saldos_clientes (a FK impediria excluir o cliente)
+    assert _saldo(cliente_id) is None